@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Request
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import cv2
 import numpy as np
@@ -8,11 +9,12 @@ import os
 import uuid
 import json
 import asyncio
+import time
 from datetime import datetime
 from typing import List, Optional
 
-from app.database import get_db
-from app.models.detection import DetectionHistory, DetectionAlert
+from app.database import get_db, SessionLocal
+from app.models.detection import DetectionHistory, DetectionAlert, VideoDetectionJob
 from app.models.user import User, UserPreferences
 from app.schemas.detection import (
     DetectionRequest, DetectionResponse, DetectionHistoryResponse, DetectionHistoryItem,
@@ -20,12 +22,18 @@ from app.schemas.detection import (
 )
 from app.services.detection_service import PlantDiseaseDetector
 from app.services.video_detection_service import VideoPlantDiseaseDetector
+from app.services.model_registry import model_registry
+from app.services.detection_cache import detection_cache, image_content_hash, CachedDetection
+from app.services.detection_executor import detection_executor, StageTimer, ExecutorSaturatedError
+from app.services.camera_stream_service import LatestFrameSlot, pack_frame_message
+from app.services.video_job_service import video_job_manager, job_to_dict, JobQueueFullError, TERMINAL_STATUSES
 from app.auth.dependencies import get_current_active_user
+from app.core.config import DETECTION_MODEL_PATH
 
 router = APIRouter()
 
 # Model path
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "visionmodels", "plantvillage.pt")
+MODEL_PATH = DETECTION_MODEL_PATH
 
 
 def create_detection_alert(
@@ -121,6 +129,86 @@ def create_detection_alert(
         print(f"Error creating detection alert: {e}")
         return None
 
+def _path_to_url(path: str) -> str:
+    return "/" + path.replace("\\", "/").lstrip("/") if path else ""
+
+
+def _get_cached_detection(db: Session, cache_key: str) -> Optional[DetectionResponse]:
+    """Build a response from the detection cache, dropping entries whose record or files are gone."""
+    cached = detection_cache.get(cache_key)
+    if cached is None:
+        return None
+    
+    record = db.query(DetectionHistory).filter(DetectionHistory.id == cached.detection_history_id).first()
+    if record is None or not os.path.exists(cached.processed_image_path):
+        detection_cache.invalidate(cache_key)
+        return None
+    
+    return DetectionResponse(
+        success=True,
+        message="Plant disease detection completed successfully (cached result)",
+        detection_id=record.id,
+        detections=cached.detections,
+        detection_count=len(cached.detections),
+        original_image_url=_path_to_url(cached.original_image_path),
+        processed_image_url=_path_to_url(cached.processed_image_path),
+        processing_time=cached.processing_time,
+        cached=True
+    )
+
+def _decode_image(file_content: bytes):
+    """Decode uploaded bytes and hash the pixels; runs on the detection executor."""
+    nparr = np.frombuffer(file_content, np.uint8)
+    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if image is None:
+        return None, None
+    return image, image_content_hash(image)
+
+
+def _save_detection(db: Session, current_user: User, detection_history: DetectionHistory) -> DetectionHistory:
+    """Persist a successful detection and raise an alert if the user wants one."""
+    db.add(detection_history)
+    db.commit()
+    db.refresh(detection_history)
+    
+    # Check if user has preferences and pest_alerts is enabled (default to True if preferences don't exist)
+    pest_alerts_enabled = True  # Default value
+    if current_user.preferences:
+        pest_alerts_enabled = current_user.preferences.pest_alerts
+    
+    if pest_alerts_enabled:
+        create_detection_alert(
+            db=db,
+            user_id=current_user.id,
+            detection_history_id=detection_history.id,
+            detections=detection_history.detections
+        )
+    
+    return detection_history
+
+
+def _save_failed_detection(db: Session, user_id: int, original_path: str,
+                           confidence_threshold: float, error_message: str):
+    detection_history = DetectionHistory(
+        user_id=user_id,
+        original_image_path=original_path,
+        processed_image_path="",
+        detections=[],
+        detection_count=0,
+        processing_time=0,
+        confidence_threshold=confidence_threshold,
+        success=False,
+        error_message=error_message
+    )
+    
+    db.add(detection_history)
+    db.commit()
+
+
+def _busy_exception(error: ExecutorSaturatedError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
+
 @router.post("/detect", response_model=DetectionResponse)
 async def detect_plant_disease(
     file: UploadFile = File(...),
@@ -130,84 +218,98 @@ async def detect_plant_disease(
 ):
     """
     Detect plant diseases in uploaded image.
+    
+    Decoding, inference and encoding run on the bounded detection executor and
+    database work on the threadpool, so the event loop stays free for other requests.
     """
     try:
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="Please upload a valid image file")
         
-        # Initialize detector
-        detector = PlantDiseaseDetector(
-            model_path=MODEL_PATH,
-            conf_threshold=confidence_threshold
-        )
-        
         # Create directories if they don't exist
         upload_dir = "uploads/images/detection"
         os.makedirs(upload_dir, exist_ok=True)
         
-        # Generate unique filenames
-        file_id = str(uuid.uuid4())
-        original_filename = f"original_{file_id}_{file.filename}"
-        processed_filename = f"processed_{file_id}_{file.filename}"
-        
-        original_path = os.path.join(upload_dir, original_filename)
-        processed_path = os.path.join(upload_dir, processed_filename)
+        file_content = await file.read()
+        timer = StageTimer()
         
-        # Read and save original image
-        try:
-            # Read file content
-            file_content = await file.read()
+        with detection_executor.admit():
+            # Initialize detector (the model itself is shared via the registry)
+            detector = await detection_executor.run(PlantDiseaseDetector, model_path=MODEL_PATH)
             
-            # Convert to numpy array and decode image
-            nparr = np.frombuffer(file_content, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decode the uploaded image
+            with timer.stage("decode"):
+                try:
+                    image, image_hash = await detection_executor.run(_decode_image, file_content)
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+                if image is None:
+                    raise HTTPException(status_code=400, detail="Invalid image data")
             
-            if image is None:
-                raise HTTPException(status_code=400, detail="Invalid image data")
-                
-            cv2.imwrite(original_path, image)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
-        
-        # Process image for detection
-        start_time = datetime.now()
-        processed_image, detections = detector.predict(original_path)
-        processing_time = (datetime.now() - start_time).total_seconds()
-        
-        # Save processed image
-        cv2.imwrite(processed_path, processed_image)
+            # Return the stored result if this exact image was already analysed
+            cache_key = detection_cache.make_key(
+                current_user.id,
+                image_hash,
+                detector.loaded_model.version,
+                confidence_threshold
+            )
+            with timer.stage("cache_lookup"):
+                cached_response = await run_in_threadpool(_get_cached_detection, db, cache_key)
+            if cached_response is not None:
+                cached_response.stage_timings = timer.timings
+                detection_executor.record_timings(timer)
+                return cached_response
+            
+            # Generate unique filenames
+            file_id = str(uuid.uuid4())
+            original_filename = f"original_{file_id}_{file.filename}"
+            processed_filename = f"processed_{file_id}_{file.filename}"
+            
+            original_path = os.path.join(upload_dir, original_filename)
+            processed_path = os.path.join(upload_dir, processed_filename)
+            
+            # Save original image (before inference draws on it)
+            with timer.stage("encode"):
+                await detection_executor.run(cv2.imwrite, original_path, image)
+            
+            # Process image for detection
+            with timer.stage("inference"):
+                processed_image, detections = await detection_executor.run(
+                    detector.predict_frame, image, confidence_threshold
+                )
+            processing_time = timer.timings["inference"] / 1000
+            
+            # Save processed image
+            with timer.stage("encode"):
+                await detection_executor.run(cv2.imwrite, processed_path, processed_image)
+        
+        # Save detection history to database (and alert if diseases are detected)
+        with timer.stage("database"):
+            detection_history = await run_in_threadpool(
+                _save_detection,
+                db,
+                current_user,
+                DetectionHistory(
+                    user_id=current_user.id,
+                    original_image_path=original_path,
+                    processed_image_path=processed_path,
+                    detections=detections,
+                    detection_count=len(detections),
+                    processing_time=processing_time,
+                    confidence_threshold=confidence_threshold,
+                    success=True
+                )
+            )
         
-        # Save detection history to database
-        detection_history = DetectionHistory(
-            user_id=current_user.id,
+        detection_cache.put(cache_key, CachedDetection(
+            detection_history_id=detection_history.id,
+            detections=detections,
             original_image_path=original_path,
             processed_image_path=processed_path,
-            detections=detections,
-            detection_count=len(detections),
-            processing_time=processing_time,
-            confidence_threshold=confidence_threshold,
-            success=True
-        )
-        
-        db.add(detection_history)
-        db.commit()
-        db.refresh(detection_history)
-        
-        # Create alert if diseases are detected and user has pest_alerts enabled
-        alert_created = None
-        # Check if user has preferences and pest_alerts is enabled (default to True if preferences don't exist)
-        pest_alerts_enabled = True  # Default value
-        if current_user.preferences:
-            pest_alerts_enabled = current_user.preferences.pest_alerts
-        
-        if pest_alerts_enabled:
-            alert_created = create_detection_alert(
-                db=db,
-                user_id=current_user.id,
-                detection_history_id=detection_history.id,
-                detections=detections
-            )
+            processing_time=processing_time
+        ))
+        detection_executor.record_timings(timer)
         
         return DetectionResponse(
             success=True,
@@ -217,28 +319,25 @@ async def detect_plant_disease(
             detection_count=len(detections),
             original_image_url=f"/uploads/images/detection/{original_filename}",
             processed_image_url=f"/uploads/images/detection/{processed_filename}",
-            processing_time=processing_time
+            processing_time=processing_time,
+            stage_timings=timer.timings
         )
         
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise _busy_exception(e)
     except Exception as e:
         # Save error to database
-        detection_history = DetectionHistory(
-            user_id=current_user.id,
-            original_image_path=original_path if 'original_path' in locals() else "",
-            processed_image_path="",
-            detections=[],
-            detection_count=0,
-            processing_time=0,
-            confidence_threshold=confidence_threshold,
-            success=False,
-            error_message=str(e)
+        await run_in_threadpool(
+            _save_failed_detection,
+            db,
+            current_user.id,
+            original_path if 'original_path' in locals() else "",
+            confidence_threshold,
+            str(e)
         )
         
-        db.add(detection_history)
-        db.commit()
-        
         raise HTTPException(status_code=500, detail=f"Error processing detection: {str(e)}")
 
 @router.get("/history", response_model=DetectionHistoryResponse)
@@ -353,6 +452,7 @@ async def delete_detection(
         # Delete database record
         db.delete(detection)
         db.commit()
+        detection_cache.invalidate_history(detection_id)
         
         return {"success": True, "message": "Detection deleted successfully"}
         
@@ -366,23 +466,26 @@ async def detect_plant_disease_video(
     file: UploadFile = File(...),
     confidence_threshold: Optional[float] = Form(0.25),
     frame_skip: Optional[int] = Form(5),
+    adaptive_sampling: Optional[bool] = Form(None),
+    stream: bool = Form(True),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Process a video file for plant disease detection.
-    Returns streaming response with progress updates.
+    Queue a video file for plant disease detection.
+
+    The video is processed by the background job pool. By default the
+    response streams the job's progress events; with stream=false it returns
+    the job id immediately so the client can poll /video-jobs/{job_id}.
+    Closing the stream does not stop the job.
     """
     try:
         # Validate file type
         if not file.content_type or not file.content_type.startswith('video/'):
             raise HTTPException(status_code=400, detail="Please upload a valid video file")
         
-        # Initialize video detector
-        detector = VideoPlantDiseaseDetector(
-            model_path=MODEL_PATH,
-            conf_threshold=confidence_threshold
-        )
+        if not os.path.exists(MODEL_PATH):
+            raise HTTPException(status_code=500, detail=f"Model file not found: {MODEL_PATH}")
         
         # Create directories
         upload_dir = "uploads/videos/detection"
@@ -403,29 +506,170 @@ async def detect_plant_disease_video(
         with open(input_path, "wb") as f:
             f.write(file_content)
         
-        async def generate_progress():
-            try:
-                for progress_update in detector.process_video_file(input_path, output_path, frame_skip):
-                    yield f"data: {json.dumps(progress_update)}\n\n"
-                    await asyncio.sleep(0.1)  # Allow other tasks to run
-            except Exception as e:
-                error_update = {"status": "error", "error": str(e)}
-                yield f"data: {json.dumps(error_update)}\n\n"
-        
-        return StreamingResponse(
-            generate_progress(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
+        try:
+            job = video_job_manager.submit(
+                db,
+                user_id=current_user.id,
+                input_path=input_path,
+                output_path=output_path,
+                original_filename=file.filename,
+                confidence_threshold=confidence_threshold,
+                frame_skip=frame_skip,
+                adaptive_sampling=adaptive_sampling
+            )
+        except JobQueueFullError as e:
+            os.remove(input_path)
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        if not stream:
+            return {
+                "success": True,
+                "message": "Video queued for processing",
+                "job": job_to_dict(job),
+                "status_url": f"/api/detection/video-jobs/{job.id}",
+                "events_url": f"/api/detection/video-jobs/{job.id}/events"
             }
-        )
+        
+        return _job_event_response(job.id, after=0)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
 
+
+def _job_event_response(job_id: str, after: int) -> StreamingResponse:
+    """Stream a video job's progress events as server-sent events."""
+    async def generate_progress():
+        streamed = False
+        async for seq, event in video_job_manager.subscribe(job_id, after):
+            streamed = True
+            yield f"id: {seq}\ndata: {json.dumps(event)}\n\n"
+        
+        if not streamed:
+            # No live event log (job finished long ago or the server restarted),
+            # so replay the persisted state instead
+            db = SessionLocal()
+            try:
+                job = db.query(VideoDetectionJob).filter(VideoDetectionJob.id == job_id).first()
+                if job is not None:
+                    event = job_to_dict(job)
+                    if job.status == "completed" and job.result:
+                        event = dict(job.result, job_id=job_id, detection_history=job.partial_detections or [])
+                    elif job.status == "failed":
+                        event["error"] = job.error_message
+                        event["status"] = "error"
+                    yield f"data: {json.dumps(event)}\n\n"
+            finally:
+                db.close()
+    
+    return StreamingResponse(
+        generate_progress(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+def _get_user_video_job(db: Session, job_id: str, user_id: int) -> VideoDetectionJob:
+    job = db.query(VideoDetectionJob).filter(
+        VideoDetectionJob.id == job_id,
+        VideoDetectionJob.user_id == user_id
+    ).first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Video job not found")
+    
+    return job
+
+
+@router.get("/video-jobs")
+async def list_video_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    List the current user's video detection jobs.
+    """
+    jobs = db.query(VideoDetectionJob).filter(
+        VideoDetectionJob.user_id == current_user.id
+    ).order_by(VideoDetectionJob.created_at.desc()).offset(skip).limit(limit).all()
+    
+    return {
+        "success": True,
+        "jobs": [job_to_dict(job) for job in jobs],
+        "queue": video_job_manager.stats()
+    }
+
+
+@router.get("/video-jobs/{job_id}")
+async def get_video_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Poll a video detection job for its progress, partial detections and result.
+    """
+    job = _get_user_video_job(db, job_id, current_user.id)
+    return {
+        "success": True,
+        "job": job_to_dict(job, include_detections=True)
+    }
+
+
+@router.get("/video-jobs/{job_id}/events")
+async def subscribe_video_job(
+    job_id: str,
+    request: Request,
+    after: int = 0,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Subscribe to a video job's progress events (server-sent events).
+    Reconnecting clients resume from `after` or the Last-Event-ID header.
+    """
+    _get_user_video_job(db, job_id, current_user.id)
+    
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    
+    return _job_event_response(job_id, after)
+
+
+@router.post("/video-jobs/{job_id}/cancel")
+async def cancel_video_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Cancel a queued or running video detection job.
+    """
+    job = _get_user_video_job(db, job_id, current_user.id)
+    
+    if job.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Job is already {job.status}")
+    
+    video_job_manager.cancel(job_id)
+    return {"success": True, "message": "Cancellation requested"}
+
+def _write_camera_files(original_path: str, original_bytes: bytes,
+                        processed_path: str, processed_bytes: bytes) -> str:
+    """Save a camera snapshot pair and return the processed frame as base64."""
+    with open(original_path, "wb") as f:
+        f.write(original_bytes)
+    with open(processed_path, "wb") as f:
+        f.write(processed_bytes)
+    return base64.b64encode(processed_bytes).decode('utf-8')
+
+
 @router.post("/detect-camera-frame")
 async def detect_camera_frame(
     file: UploadFile = File(...),
@@ -441,26 +685,14 @@ async def detect_camera_frame(
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="Please upload a valid image file")
         
-        # Initialize video detector for frame processing
-        detector = VideoPlantDiseaseDetector(
-            model_path=MODEL_PATH,
-            conf_threshold=confidence_threshold
-        )
-        
         # Read file content
         file_content = await file.read()
-        
-        # Process frame
-        processed_bytes, detections = detector.process_frame_from_bytes(file_content)
-        
-        # Convert processed image to base64 for response
-        processed_b64 = base64.b64encode(processed_bytes).decode('utf-8')
+        timer = StageTimer()
         
         # Create directories for saving (optional)
         upload_dir = "uploads/images/camera"
         os.makedirs(upload_dir, exist_ok=True)
         
-        # Save to database (optional - for camera snapshots)
         file_id = str(uuid.uuid4())
         original_filename = f"camera_{file_id}_{file.filename}"
         processed_filename = f"processed_camera_{file_id}_{file.filename}"
@@ -468,42 +700,40 @@ async def detect_camera_frame(
         original_path = os.path.join(upload_dir, original_filename)
         processed_path = os.path.join(upload_dir, processed_filename)
         
-        # Save files
-        with open(original_path, "wb") as f:
-            f.write(file_content)
-        with open(processed_path, "wb") as f:
-            f.write(processed_bytes)
-        
-        # Save to database
-        detection_history = DetectionHistory(
-            user_id=current_user.id,
-            original_image_path=original_path,
-            processed_image_path=processed_path,
-            detections=detections,
-            detection_count=len(detections),
-            processing_time=0.0,  # Real-time, so minimal time
-            confidence_threshold=confidence_threshold,
-            success=True
-        )
-        
-        db.add(detection_history)
-        db.commit()
-        db.refresh(detection_history)
-        
-        # Create alert if diseases are detected and user has pest_alerts enabled
-        alert_created = None
-        # Check if user has preferences and pest_alerts is enabled (default to True if preferences don't exist)
-        pest_alerts_enabled = True  # Default value
-        if current_user.preferences:
-            pest_alerts_enabled = current_user.preferences.pest_alerts
-        
-        if pest_alerts_enabled:
-            alert_created = create_detection_alert(
-                db=db,
-                user_id=current_user.id,
-                detection_history_id=detection_history.id,
-                detections=detections
+        with detection_executor.admit():
+            # Initialize video detector for frame processing
+            detector = await detection_executor.run(VideoPlantDiseaseDetector, model_path=MODEL_PATH)
+            
+            # Decode, detect and re-encode the frame
+            with timer.stage("inference"):
+                processed_bytes, detections = await detection_executor.run(
+                    detector.process_frame_from_bytes, file_content, confidence_threshold
+                )
+            
+            # Save files and convert processed image to base64 for response
+            with timer.stage("encode"):
+                processed_b64 = await detection_executor.run(
+                    _write_camera_files, original_path, file_content, processed_path, processed_bytes
+                )
+        
+        # Save to database (and alert if diseases are detected)
+        with timer.stage("database"):
+            detection_history = await run_in_threadpool(
+                _save_detection,
+                db,
+                current_user,
+                DetectionHistory(
+                    user_id=current_user.id,
+                    original_image_path=original_path,
+                    processed_image_path=processed_path,
+                    detections=detections,
+                    detection_count=len(detections),
+                    processing_time=0.0,  # Real-time, so minimal time
+                    confidence_threshold=confidence_threshold,
+                    success=True
+                )
             )
+        detection_executor.record_timings(timer)
         
         return {
             "success": True,
@@ -513,11 +743,14 @@ async def detect_camera_frame(
             "detection_count": len(detections),
             "processed_image_b64": processed_b64,
             "original_image_url": f"/uploads/images/camera/{original_filename}",
-            "processed_image_url": f"/uploads/images/camera/{processed_filename}"
+            "processed_image_url": f"/uploads/images/camera/{processed_filename}",
+            "stage_timings": timer.timings
         }
         
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise _busy_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing camera frame: {str(e)}")
 
@@ -525,22 +758,67 @@ async def detect_camera_frame(
 async def websocket_camera_stream(
     websocket: WebSocket,
     confidence_threshold: float = 0.25,
-    camera_index: int = 0
+    camera_index: int = 0,
+    mode: str = "server"
 ):
     """
     WebSocket endpoint for real-time camera stream with disease detection.
+    
+    mode=server reads frames from a camera attached to the server and sends
+    JSON messages with base64 frames. mode=push accepts binary JPEG frames from
+    the client and replies with binary messages (see camera_stream_service).
     """
     await websocket.accept()
     
     try:
-        # Initialize video detector
-        detector = VideoPlantDiseaseDetector(
-            model_path=MODEL_PATH,
-            conf_threshold=confidence_threshold
-        )
-        
-        # Start real-time processing
-        for stream_update in detector.process_realtime_stream(camera_index):
+        if mode == "push":
+            await _stream_pushed_frames(websocket, confidence_threshold)
+        else:
+            await _stream_server_camera(websocket, confidence_threshold, camera_index)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        try:
+            await websocket.send_text(json.dumps({
+                "status": "error",
+                "error": str(e)
+            }))
+        except Exception:
+            pass
+    finally:
+        try:
+            await websocket.close()
+        except Exception:
+            pass  # Already closed by the client
+
+
+async def _receive_until_stop(websocket: WebSocket, on_frame=None):
+    """Read client messages until "stop" or disconnect, passing binary frames to on_frame."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes") is not None:
+            if on_frame is not None:
+                on_frame(message["bytes"])
+        elif message.get("text") == "stop":
+            return
+
+
+async def _stream_server_camera(websocket: WebSocket, confidence_threshold: float, camera_index: int):
+    # Initialize video detector
+    detector = await run_in_threadpool(VideoPlantDiseaseDetector, model_path=MODEL_PATH)
+    stream = detector.process_realtime_stream(camera_index, confidence_threshold)
+    receiver = asyncio.create_task(_receive_until_stop(websocket))
+    receiver.add_done_callback(lambda _: detector.stop_stream())
+    
+    try:
+        while True:
+            # The capture loop blocks, so each step runs on the threadpool
+            stream_update = await run_in_threadpool(next, stream, None)
+            if stream_update is None:
+                break
+            
             if stream_update["status"] == "detection":
                 # Convert frame bytes to base64 for transmission
                 frame_b64 = base64.b64encode(stream_update["frame_data"]).decode('utf-8')
@@ -548,28 +826,95 @@ async def websocket_camera_stream(
                 del stream_update["frame_data"]  # Remove binary data
             
             await websocket.send_text(json.dumps(stream_update))
+    finally:
+        detector.stop_stream()
+        receiver.cancel()
+        # Runs the generator's cleanup, which releases the camera
+        await run_in_threadpool(stream.close)
+
+
+async def _stream_pushed_frames(websocket: WebSocket, confidence_threshold: float):
+    detector = await detection_executor.run(VideoPlantDiseaseDetector, model_path=MODEL_PATH)
+    slot = LatestFrameSlot()
+    receiver = asyncio.create_task(_receive_until_stop(websocket, slot.put))
+    receiver.add_done_callback(lambda _: slot.close())
+    
+    await websocket.send_text(json.dumps({
+        "status": "stream_started",
+        "mode": "push"
+    }))
+    
+    try:
+        while True:
+            frame = await slot.get()
+            if frame is None:
+                break
+            frame_number, frame_bytes = frame
+            started_at = time.perf_counter()
             
-            # Check for client disconnect
+            header = {"status": "detection", "frame_number": frame_number}
+            processed_bytes = b""
+            detections = []
             try:
-                message = await asyncio.wait_for(websocket.receive_text(), timeout=0.01)
-                if message == "stop":
-                    detector.stop_stream()
-                    break
-            except asyncio.TimeoutError:
-                pass  # No message received, continue
-            except WebSocketDisconnect:
-                detector.stop_stream()
-                break
-                
-    except WebSocketDisconnect:
-        detector.stop_stream()
-    except Exception as e:
-        await websocket.send_text(json.dumps({
-            "status": "error",
-            "error": str(e)
-        }))
+                with detection_executor.admit():
+                    processed_bytes, detections = await detection_executor.run(
+                        detector.process_frame_from_bytes, frame_bytes, confidence_threshold
+                    )
+            except ExecutorSaturatedError:
+                # Tell the client so it keeps sending; the next frame gets a fresh try
+                header["status"] = "busy"
+            except Exception as e:
+                header["error"] = str(e)
+            
+            header.update({
+                "timestamp": time.time(),
+                "detections": detections,
+                "detection_count": len(detections),
+                "dropped_frames": slot.dropped,
+                "latency_ms": round((time.perf_counter() - started_at) * 1000, 2)
+            })
+            await websocket.send_bytes(pack_frame_message(header, processed_bytes))
     finally:
-        await websocket.close()
+        receiver.cancel()
+
+
+@router.get("/cache/stats")
+async def get_detection_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get hit-rate statistics for the detection result cache.
+    """
+    return {
+        "success": True,
+        "stats": detection_cache.stats()
+    }
+
+
+@router.get("/models/stats")
+async def get_model_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get load time and memory statistics for the shared detection models.
+    """
+    return {
+        "success": True,
+        "stats": model_registry.stats()
+    }
+
+
+@router.get("/executor/stats")
+async def get_executor_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get queue depth, rejections and average per-stage timings of the detection executor.
+    """
+    return {
+        "success": True,
+        "stats": detection_executor.stats()
+    }
 
 
 @router.get("/alerts", response_model=DetectionAlertResponse)
@@ -1,32 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 import random
-from pydantic import BaseModel
+import json
+import asyncio
+import logging
 
 from app.database import get_db
-from app.models.sensor import SensorConfig, SensorData
+from app.models.sensor import SensorConfig, SensorData, SensorAlertEvent, SensorRetentionPolicy
 from app.models.user import User
 from app.schemas.sensor import (
     SensorConfigCreate, SensorConfigUpdate, SensorConfig as SensorConfigSchema,
     SensorDataCreate, SensorData as SensorDataSchema, SensorDataBatch,
-    SensorAlert, SensorSummary
+    SensorAlert, SensorAlertEvent as SensorAlertEventSchema, SensorSummary, ESP32SensorData,
+    SensorRetention, SensorRetentionUpdate
+)
+from app.auth.dependencies import get_current_user, get_current_user_from_query
+from app.services.sensor_ingest_service import sensor_ingest_service, SensorNotFoundError
+from app.services.sensor_config_cache import sensor_config_cache
+from app.services.sensor_dedup_cache import sensor_dedup_cache, reading_key
+from app.services.sensor_rollup_service import sensor_rollup_service, RESOLUTIONS, ROLLUP_METRICS
+from app.services.sensor_series_service import sensor_series_service, DOWNSAMPLING_METHODS
+from app.services.sensor_latest_store import sensor_latest_store, reading_to_esp32_format
+from app.services.sensor_live_hub import sensor_live_hub, LiveHubFullError
+from app.services.sensor_alert_engine import sensor_alert_engine
+from app.services.sensor_archive_service import sensor_archive_service
+from app.services.sensor_analytics_service import sensor_analytics_service
+from app.services.sensor_retention_service import sensor_retention_service, resolve_policy, RETENTION_FIELDS
+from app.services.sensor_ingest_buffer import sensor_ingest_buffer, IngestBufferFullError
+from app.core.config import (
+    IOT_BATCH_MAX_ROWS, IOT_INGEST_BUFFER_ENABLED, IOT_SERIES_MAX_POINTS, IOT_LIVE_HEARTBEAT_SECONDS
 )
-from app.auth.dependencies import get_current_user
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# ESP32 specific data model to match your exact format
-class ESP32SensorData(BaseModel):
-    timestamp: str
-    temperature_c: float
-    humidity_percent: float
-    heat_index_c: float
-    water_level_raw: int
-    water_level_percent: int
-    soil_moisture_raw: int
-    soil_moisture_percent: int
+router = APIRouter()
 
 # Dummy data generators for testing
 def generate_dht22_data():
@@ -87,13 +98,14 @@ async def create_sensor_config(
         longitude=sensor_data.longitude,
         elevation=sensor_data.elevation,
         update_interval=sensor_data.update_interval,
-        alert_thresholds=sensor_data.alert_thresholds,
+        alert_thresholds=json.dumps(sensor_data.dict()["alert_thresholds"]) if sensor_data.alert_thresholds else None,
         is_active=True
     )
     
     db.add(new_sensor)
     db.commit()
     db.refresh(new_sensor)
+    sensor_config_cache.invalidate(new_sensor.sensor_id)
     
     return new_sensor
 
@@ -156,11 +168,15 @@ async def update_sensor_config(
     
     # Update fields
     for field, value in update_data.dict(exclude_unset=True).items():
+        if field == "alert_thresholds":
+            # Stored as JSON text
+            value = json.dumps(value) if value else None
         setattr(sensor, field, value)
     
     sensor.updated_at = datetime.now()
     db.commit()
     db.refresh(sensor)
+    sensor_config_cache.invalidate(sensor_id)
     
     return sensor
 
@@ -183,8 +199,15 @@ async def delete_sensor_config(
             detail="Sensor not found"
         )
     
+    sensor_config_id = sensor.id
+    db.query(SensorRetentionPolicy).filter(
+        SensorRetentionPolicy.sensor_config_id == sensor_config_id
+    ).delete(synchronize_session=False)
     db.delete(sensor)
     db.commit()
+    sensor_config_cache.invalidate(sensor_id)
+    sensor_latest_store.invalidate(sensor_config_id)
+    sensor_alert_engine.forget(sensor_config_id)
     
     return {"message": "Sensor deleted successfully"}
 
@@ -197,43 +220,57 @@ async def submit_sensor_data(
     """Submit new sensor data (called by IoT devices)"""
     
     # Find sensor config
-    sensor_config = db.query(SensorConfig).filter(
-        SensorConfig.sensor_id == sensor_id,
-        SensorConfig.is_active == True
-    ).first()
+    sensor_config = sensor_config_cache.get(db, sensor_id)
     
-    if not sensor_config:
+    if not sensor_config or not sensor_config.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Active sensor not found"
         )
     
-    # Create sensor data entry
-    new_data = SensorData(
-        sensor_config_id=sensor_config.id,
-        temperature=sensor_data.temperature,
-        humidity=sensor_data.humidity,
-        light_intensity=sensor_data.light_intensity,
-        soil_moisture=sensor_data.soil_moisture,
-        soil_ph=sensor_data.soil_ph,
-        water_level=sensor_data.water_level,
-        water_flow_rate=sensor_data.water_flow_rate,
-        atmospheric_pressure=sensor_data.atmospheric_pressure,
-        uv_index=sensor_data.uv_index,
-        battery_level=sensor_data.battery_level,
-        signal_strength=sensor_data.signal_strength,
-        device_status=sensor_data.device_status,
-        data_quality=sensor_data.data_quality,
-        error_message=sensor_data.error_message,
-        recorded_at=sensor_data.recorded_at,
-        received_at=datetime.now()
-    )
+    # Create sensor data entry (calibration offset applied, rollups updated);
+    # a resent reading returns the row already stored for it
+    row = sensor_ingest_service.prepare_row(sensor_data, sensor_config, datetime.now())
+    ids = sensor_ingest_service.insert_rows(db, [row])
+    
+    if ids[0] is None:
+        # The stored copy may have been moved to an archive block since
+        stored = sensor_ingest_service.stored_reading(db, row) or next(iter(sensor_archive_service.read_rows(
+            db, row["recorded_at"], row["recorded_at"], sensor_config.id
+        )), None)
+        if stored is None:
+            # Already received, then removed by retention
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Reading was already received and is no longer stored"
+            )
+        return stored
+    return db.get(SensorData, ids[0])
+
+@router.post("/sensors/{sensor_id}/data/batch")
+async def submit_sensor_data_batch(
+    sensor_id: str,
+    batch: SensorDataBatch,
+    db: Session = Depends(get_db)
+):
+    """Submit many readings for one sensor in a single transaction (called by IoT devices)"""
     
-    db.add(new_data)
-    db.commit()
-    db.refresh(new_data)
+    if len(batch.readings) > IOT_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {IOT_BATCH_MAX_ROWS} readings per batch"
+        )
+    
+    sensor_config = sensor_config_cache.get(db, sensor_id)
     
-    return new_data
+    if not sensor_config or not sensor_config.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Active sensor not found"
+        )
+    
+    payloads = [reading.dict() for reading in batch.readings]
+    return await run_in_threadpool(sensor_ingest_service.ingest, db, payloads, sensor_id)
 
 @router.get("/sensors/{sensor_id}/data", response_model=List[SensorDataSchema])
 async def get_sensor_data(
@@ -257,23 +294,30 @@ async def get_sensor_data(
             detail="Sensor not found"
         )
     
-    # Get data for specified time period
+    # Get data for specified time period (older days may come from the archive blocks)
     start_time = datetime.now() - timedelta(hours=hours)
     
-    data = db.query(SensorData).filter(
-        SensorData.sensor_config_id == sensor_config.id,
-        SensorData.recorded_at >= start_time
-    ).order_by(SensorData.recorded_at.desc()).limit(limit).all()
-    
-    return data
+    return sensor_archive_service.read_rows(
+        db, start_time, datetime.max, sensor_config.id, limit=limit, newest_first=True
+    )
 
-@router.get("/sensors/{sensor_id}/latest", response_model=SensorDataSchema)
-async def get_latest_sensor_data(
+@router.get("/sensors/{sensor_id}/aggregates")
+async def get_sensor_aggregates(
     sensor_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    hours: int = 24,
+    resolution: Optional[str] = None,
+    max_points: int = 500,
+    metrics: Optional[str] = None
 ):
-    """Get latest sensor data"""
+    """
+    Get time-bucketed aggregates (count/min/max/mean/last) from the rollup tables.
+    
+    resolution is one of 1m, 1h, 1d; when omitted the finest bucket that keeps the
+    requested hours within max_points buckets is used. metrics is a
+    comma-separated list of sensor_data columns (all numeric columns by default).
+    """
     
     # Verify sensor ownership
     sensor_config = db.query(SensorConfig).filter(
@@ -287,10 +331,52 @@ async def get_latest_sensor_data(
             detail="Sensor not found"
         )
     
-    # Get latest data
-    latest_data = db.query(SensorData).filter(
-        SensorData.sensor_config_id == sensor_config.id
-    ).order_by(SensorData.recorded_at.desc()).first()
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"resolution must be one of: {', '.join(RESOLUTIONS)}"
+        )
+    
+    metric_list = [metric.strip() for metric in metrics.split(",") if metric.strip()] if metrics else None
+    unknown = [metric for metric in metric_list or [] if metric not in ROLLUP_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metrics: {', '.join(unknown)}"
+        )
+    
+    end_time = datetime.now()
+    start_time = end_time - timedelta(hours=hours)
+    
+    result = sensor_rollup_service.query(
+        db, start_time, end_time,
+        sensor_config_ids=[sensor_config.id],
+        metrics=metric_list,
+        resolution=resolution,
+        max_points=max_points
+    )
+    result["sensor_id"] = sensor_id
+    return result
+
+@router.get("/sensors/{sensor_id}/latest", response_model=SensorDataSchema)
+async def get_latest_sensor_data(
+    sensor_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get latest sensor data"""
+    
+    # Verify sensor ownership
+    sensor_config = sensor_config_cache.get(db, sensor_id)
+    
+    if not sensor_config or sensor_config.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sensor not found"
+        )
+    
+    # Get latest data (served from memory once the sensor is loaded)
+    latest_data = sensor_latest_store.latest(db, sensor_config.id)
     
     if not latest_data:
         raise HTTPException(
@@ -304,9 +390,10 @@ async def get_latest_sensor_data(
 async def get_sensor_summary(
     sensor_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    hours: int = 24
 ):
-    """Get sensor summary with latest data and statistics"""
+    """Get sensor summary with latest data and statistics over the last `hours` hours"""
     
     # Verify sensor ownership
     sensor_config = db.query(SensorConfig).filter(
@@ -320,31 +407,150 @@ async def get_sensor_summary(
             detail="Sensor not found"
         )
     
-    # Get latest data
-    latest_data = db.query(SensorData).filter(
-        SensorData.sensor_config_id == sensor_config.id
-    ).order_by(SensorData.recorded_at.desc()).first()
-    
-    # Get data count for last 24 hours
-    start_time = datetime.now() - timedelta(hours=24)
-    data_count_24h = db.query(SensorData).filter(
-        SensorData.sensor_config_id == sensor_config.id,
-        SensorData.recorded_at >= start_time
-    ).count()
-    
-    # Get last online time
-    last_online = db.query(SensorData).filter(
-        SensorData.sensor_config_id == sensor_config.id,
-        SensorData.device_status == "online"
-    ).order_by(SensorData.recorded_at.desc()).first()
+    # Latest data, 24h count and last online time come from the latest-reading store
+    latest_data = sensor_latest_store.latest(db, sensor_config.id)
+    data_count_24h = sensor_latest_store.count_24h(db, sensor_config.id)
+    last_online = sensor_latest_store.last_online(db, sensor_config.id)
+    alerts_count = sensor_alert_engine.active_counts(db, [sensor_config.id])[sensor_config.id]
+    statistics = sensor_analytics_service.recent(db, hours, sensor_config.id)
     
     return SensorSummary(
         sensor_config=sensor_config,
         latest_data=latest_data,
         data_count_24h=data_count_24h,
-        last_online=last_online.recorded_at if last_online else None,
-        alerts_count=0  # TODO: Implement alerts counting
+        last_online=last_online,
+        alerts_count=alerts_count,
+        statistics=dict(statistics, period_hours=hours) if statistics else None
+    )
+
+def _alert_response(alert, sensor_id: str) -> SensorAlert:
+    return SensorAlert(
+        sensor_id=sensor_id,
+        alert_type=alert.alert_type,
+        message=alert.describe(),
+        severity=alert.severity,
+        value=alert.value,
+        threshold=alert.threshold,
+        timestamp=alert.raised_at
+    )
+
+@router.get("/alerts", response_model=List[SensorAlert])
+async def get_active_alerts(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the threshold alerts currently active on the user's sensors"""
+    
+    sensors = db.query(SensorConfig).filter(SensorConfig.user_id == current_user.id).all()
+    sensor_ids = {sensor.id: sensor.sensor_id for sensor in sensors}
+    
+    return [
+        _alert_response(alert, sensor_ids[alert.sensor_config_id])
+        for alert in sensor_alert_engine.active_alerts(db, sensor_ids)
+    ]
+
+@router.get("/sensors/{sensor_id}/alerts/history", response_model=List[SensorAlertEventSchema])
+async def get_sensor_alert_history(
+    sensor_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    limit: int = 100
+):
+    """Get the raise/clear transitions of a sensor's alerts, newest first"""
+    
+    sensor_config = db.query(SensorConfig).filter(
+        SensorConfig.sensor_id == sensor_id,
+        SensorConfig.user_id == current_user.id
+    ).first()
+    
+    if not sensor_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sensor not found"
+        )
+    
+    return db.query(SensorAlertEvent).filter(
+        SensorAlertEvent.sensor_config_id == sensor_config.id
+    ).order_by(SensorAlertEvent.id.desc()).limit(limit).all()
+
+def _owned_sensor(db: Session, sensor_id: str, user: User) -> SensorConfig:
+    sensor_config = db.query(SensorConfig).filter(
+        SensorConfig.sensor_id == sensor_id,
+        SensorConfig.user_id == user.id
+    ).first()
+    
+    if not sensor_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sensor not found"
+        )
+    return sensor_config
+
+def _retention_response(sensor_config: SensorConfig, policy: Optional[SensorRetentionPolicy]) -> SensorRetention:
+    overrides = {
+        field: getattr(policy, field)
+        for field in RETENTION_FIELDS
+        if policy is not None and getattr(policy, field) is not None
+    }
+    return SensorRetention(sensor_id=sensor_config.sensor_id, overrides=overrides, **resolve_policy(policy))
+
+@router.get("/sensors/{sensor_id}/retention", response_model=SensorRetention)
+async def get_sensor_retention(
+    sensor_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get how long the sensor's raw readings and rollups are kept"""
+    
+    sensor_config = _owned_sensor(db, sensor_id, current_user)
+    policy = db.query(SensorRetentionPolicy).filter(
+        SensorRetentionPolicy.sensor_config_id == sensor_config.id
+    ).first()
+    return _retention_response(sensor_config, policy)
+
+@router.put("/sensors/{sensor_id}/retention", response_model=SensorRetention)
+async def update_sensor_retention(
+    sensor_id: str,
+    update_data: SensorRetentionUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Set the sensor's retention tier or override single values (null falls back to the tier)"""
+    
+    sensor_config = _owned_sensor(db, sensor_id, current_user)
+    policy = db.query(SensorRetentionPolicy).filter(
+        SensorRetentionPolicy.sensor_config_id == sensor_config.id
+    ).first()
+    if policy is None:
+        policy = SensorRetentionPolicy(sensor_config_id=sensor_config.id)
+        db.add(policy)
+    
+    for field, value in update_data.dict(exclude_unset=True).items():
+        setattr(policy, field, value)
+    
+    db.commit()
+    db.refresh(policy)
+    return _retention_response(sensor_config, policy)
+
+@router.post("/sensors/{sensor_id}/retention/run")
+async def run_sensor_retention(
+    sensor_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    dry_run: bool = True
+):
+    """Apply the sensor's retention now; by default only reports what would be deleted and archived"""
+    
+    sensor_config = _owned_sensor(db, sensor_id, current_user)
+    result = await run_in_threadpool(
+        sensor_retention_service.run, db, dry_run=dry_run, sensor_config_id=sensor_config.id
     )
+    if result["status"] == "busy":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A retention pass is already running, please retry shortly"
+        )
+    return result
 
 # Dummy routes for testing IoT integration
 @router.post("/sensors/{sensor_id}/simulate", response_model=SensorDataSchema)
@@ -391,13 +597,10 @@ async def simulate_sensor_data(
     })
     
     # Create sensor data entry
-    new_data = SensorData(**dummy_data, received_at=datetime.now())
-    
-    db.add(new_data)
-    db.commit()
-    db.refresh(new_data)
+    dummy_data["received_at"] = datetime.now()
+    ids = sensor_ingest_service.insert_rows(db, [dummy_data])
     
-    return new_data
+    return db.get(SensorData, ids[0])
 
 @router.get("/dashboard/sensors", response_model=List[SensorSummary])
 async def get_dashboard_sensors(
@@ -411,26 +614,19 @@ async def get_dashboard_sensors(
         SensorConfig.is_active == True
     ).all()
     
+    # Load every sensor the store doesn't hold yet in one round of set-based
+    # queries; the loop below then reads from memory only
+    sensor_latest_store.preload(db, [sensor.id for sensor in sensors])
+    alerts_counts = sensor_alert_engine.active_counts(db, [sensor.id for sensor in sensors])
+    
     summaries = []
     for sensor in sensors:
-        # Get latest data
-        latest_data = db.query(SensorData).filter(
-            SensorData.sensor_config_id == sensor.id
-        ).order_by(SensorData.recorded_at.desc()).first()
-        
-        # Get data count for last 24 hours
-        start_time = datetime.now() - timedelta(hours=24)
-        data_count_24h = db.query(SensorData).filter(
-            SensorData.sensor_config_id == sensor.id,
-            SensorData.recorded_at >= start_time
-        ).count()
-        
         summaries.append(SensorSummary(
             sensor_config=sensor,
-            latest_data=latest_data,
-            data_count_24h=data_count_24h,
-            last_online=latest_data.recorded_at if latest_data else None,
-            alerts_count=0
+            latest_data=sensor_latest_store.latest(db, sensor.id),
+            data_count_24h=sensor_latest_store.count_24h(db, sensor.id),
+            last_online=sensor_latest_store.last_online(db, sensor.id),
+            alerts_count=alerts_counts[sensor.id]
         ))
     
     return summaries
@@ -438,45 +634,100 @@ async def get_dashboard_sensors(
 # New ESP32 specific endpoints
 @router.post("/sensor-data")
 async def receive_esp32_sensor_data(data: ESP32SensorData, db: Session = Depends(get_db)):
-    """Receive sensor data from ESP32 device (no authentication required for IoT devices)"""
-    print("--- New Sensor Data Received ---")
-    print(f"  Timestamp: {data.timestamp}")
-    print(f"  Temperature: {data.temperature_c}°C")
-    print(f"  Humidity: {data.humidity_percent}%")
-    print(f"  Heat Index: {data.heat_index_c}°C")
-    print(f"  Water Level: {data.water_level_percent}% (Raw: {data.water_level_raw})")
-    print(f"  Soil Moisture: {data.soil_moisture_percent}% (Raw: {data.soil_moisture_raw})")
-    
-    # Convert timestamp string to datetime
-    try:
-        recorded_at = datetime.fromisoformat(data.timestamp.replace('Z', '+00:00'))
-    except:
-        recorded_at = datetime.now()
-    
-    # Create sensor data entry (using a default sensor_config_id = 1 for now)
-    # In production, you might want to create a sensor config first or use device ID
-    new_data = SensorData(
-        sensor_config_id=1,  # You may need to create a default sensor config
-        temperature=data.temperature_c,
-        humidity=data.humidity_percent,
-        soil_moisture=data.soil_moisture_percent,
-        water_level=data.water_level_percent,
-        device_status="online",
-        data_quality="good",
-        recorded_at=recorded_at,
-        received_at=datetime.now()
+    """
+    Receive sensor data from ESP32 device (no authentication required for IoT devices).
+    
+    The payload's device_id selects the SensorConfig (the default device when
+    omitted). With the ingest buffer running the reading is journaled and
+    acknowledged immediately; it reaches sensor_data with the next batch flush.
+    A reading that was already received (same device and timestamp, e.g. a
+    retry after a timeout) is acknowledged with "duplicate": true and not stored again.
+    """
+    logger.debug(
+        f"ESP32 reading from {data.device_id or 'default device'} at {data.timestamp}: {data.temperature_c}°C, {data.humidity_percent}% humidity, "
+        f"water {data.water_level_percent}%, soil {data.soil_moisture_percent}%"
     )
     
-    db.add(new_data)
-    db.commit()
-    db.refresh(new_data)
+    # A device missing from the config cache is looked up in the database;
+    # off the event loop so a busy connection pool can't stall every request
+    try:
+        row = await run_in_threadpool(sensor_ingest_service.build_esp32_row, db, data)
+    except SensorNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    if sensor_dedup_cache.seen(reading_key(row)):
+        return {"status": "success", "message": "Duplicate reading ignored", "id": None, "duplicate": True}
+    
+    if IOT_INGEST_BUFFER_ENABLED and sensor_ingest_buffer.running:
+        try:
+            sensor_ingest_buffer.enqueue([row])
+        except IngestBufferFullError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "1"}
+            )
+        # Retries that arrive before the next flush are answered from the cache
+        sensor_dedup_cache.add([reading_key(row)])
+        return {"status": "success", "message": "Data received", "id": None, "queued": True}
+    
+    ids = await run_in_threadpool(sensor_ingest_service.insert_rows, db, [row])
+    if ids[0] is None:
+        return {"status": "success", "message": "Duplicate reading ignored", "id": None, "duplicate": True}
+    return {"status": "success", "message": "Data received", "id": ids[0]}
+
+@router.get("/ingest/stats")
+async def get_ingest_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get queue depth and flush latency of the sensor ingest buffer"""
+    return {
+        "enabled": IOT_INGEST_BUFFER_ENABLED,
+        "stats": sensor_ingest_buffer.stats(),
+        "sensor_config_cache": sensor_config_cache.stats(),
+        "dedup": dict(sensor_dedup_cache.stats(), timestamp_fallbacks=sensor_ingest_service.timestamp_fallbacks),
+        "latest_store": sensor_latest_store.stats(),
+        "alerts": sensor_alert_engine.stats(),
+        "archive": sensor_archive_service.stats(db),
+        "retention": sensor_retention_service.stats()
+    }
+
+@router.post("/sensor-data/batch")
+async def receive_sensor_data_batch(request: Request, db: Session = Depends(get_db)):
+    """
+    Receive many readings from many devices in one request (no authentication required for IoT devices).
+    
+    The body is a JSON array or NDJSON (one reading per line). Each reading is
+    either the ESP32 format or a generic reading with sensor_id and recorded_at.
+    Valid readings are written with one multi-row insert; the response carries
+    a per-row status in input order. Readings already stored for the same
+    device and timestamp are reported as "duplicate" and not written again.
+    """
+    body = await request.body()
+    try:
+        payloads = sensor_ingest_service.parse_body(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid batch body: {str(e)}"
+        )
+    
+    if len(payloads) > IOT_BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {IOT_BATCH_MAX_ROWS} readings per batch"
+        )
     
-    return {"status": "success", "message": "Data received", "id": new_data.id}
+    return await run_in_threadpool(sensor_ingest_service.ingest, db, payloads)
 
 @router.get("/get-latest-data")
 async def get_latest_sensor_reading(db: Session = Depends(get_db)):
-    """Get the most recent sensor reading from the database"""
-    latest_data = db.query(SensorData).order_by(SensorData.recorded_at.desc()).first()
+    """Get the most recent sensor reading (kept in memory by the ingest path)"""
+    latest_data = sensor_latest_store.latest_overall(db)
     
     if not latest_data:
         raise HTTPException(
@@ -484,18 +735,7 @@ async def get_latest_sensor_reading(db: Session = Depends(get_db)):
             detail="No sensor data found"
         )
     
-    return {
-        "id": latest_data.id,
-        "timestamp": latest_data.recorded_at.isoformat(),
-        "temperature_c": latest_data.temperature,
-        "humidity_percent": latest_data.humidity,
-        "heat_index_c": latest_data.temperature + 2 if latest_data.temperature else None,  # Approximate heat index
-        "water_level_percent": latest_data.water_level,
-        "soil_moisture_percent": latest_data.soil_moisture,
-        "device_status": latest_data.device_status,
-        "data_quality": latest_data.data_quality,
-        "received_at": latest_data.received_at.isoformat()
-    }
+    return reading_to_esp32_format(latest_data)
 
 @router.get("/get-data-history")
 async def get_sensor_data_history(limit: int = 50, db: Session = Depends(get_db)):
@@ -507,23 +747,189 @@ async def get_sensor_data_history(limit: int = 50, db: Session = Depends(get_db)
     if not data_history:
         return {"data": [], "count": 0}
     
-    formatted_data = []
-    for data in reversed(data_history):  # Reverse to get chronological order
-        formatted_data.append({
-            "id": data.id,
-            "timestamp": data.recorded_at.isoformat(),
-            "temperature_c": data.temperature,
-            "humidity_percent": data.humidity,
-            "heat_index_c": data.temperature + 2 if data.temperature else None,
-            "water_level_percent": data.water_level,
-            "soil_moisture_percent": data.soil_moisture,
-            "device_status": data.device_status,
-            "data_quality": data.data_quality,
-            "received_at": data.received_at.isoformat()
-        })
+    # Reverse to get chronological order
+    formatted_data = [reading_to_esp32_format(data) for data in reversed(data_history)]
     
     return {
         "data": formatted_data,
         "count": len(formatted_data),
         "latest_timestamp": formatted_data[-1]["timestamp"] if formatted_data else None
-    }
\ No newline at end of file
+    }
+
+def _owned_sensor_ids(db: Session, user: User, sensor_id: Optional[str]) -> List[int]:
+    """Sensor config ids the user may read: one owned sensor, or all of the user's sensors."""
+    if sensor_id:
+        sensor_config = sensor_config_cache.get(db, sensor_id)
+        if not sensor_config or sensor_config.user_id != user.id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sensor not found"
+            )
+        return [sensor_config.id]
+    
+    return [sensor.id for sensor in db.query(SensorConfig.id).filter(SensorConfig.user_id == user.id).all()]
+
+@router.get("/series")
+async def get_sensor_series(
+    sensor_id: Optional[str] = None,
+    hours: int = 24,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = 500,
+    metrics: Optional[str] = None,
+    method: str = "lttb",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get chart-ready sensor series downsampled server-side.
+    
+    The range is start..end, or the last `hours` when they are omitted. Each
+    metric is reduced to at most `points` points with LTTB (`method=lttb`) or
+    min/max per bucket (`method=minmax`) and returned as parallel arrays of
+    epoch-millisecond timestamps ("t") and values ("v"). Without sensor_id
+    the series covers all of the user's sensors.
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"method must be one of: {', '.join(DOWNSAMPLING_METHODS)}"
+        )
+    
+    if points < 3 or points > IOT_SERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"points must be between 3 and {IOT_SERIES_MAX_POINTS}"
+        )
+    
+    metric_list = [metric.strip() for metric in metrics.split(",") if metric.strip()] if metrics else None
+    unknown = [metric for metric in metric_list or [] if metric not in ROLLUP_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metrics: {', '.join(unknown)}"
+        )
+    
+    end_time = end or datetime.now()
+    start_time = start or end_time - timedelta(hours=hours)
+    if start_time >= end_time:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    sensor_ids = _owned_sensor_ids(db, current_user, sensor_id)
+    
+    result = await run_in_threadpool(
+        sensor_series_service.build, db, start_time, end_time,
+        sensor_ids, metric_list, points, method
+    )
+    result["sensor_id"] = sensor_id
+    return result
+
+def _live_snapshot(db: Session, sensor_ids: List[int]) -> List[dict]:
+    """Latest known reading of each sensor, sent when a subscriber connects."""
+    readings = [sensor_latest_store.latest(db, sensor_config_id) for sensor_config_id in sensor_ids]
+    return [reading_to_esp32_format(reading) for reading in readings if reading is not None]
+
+def _live_subscribe(sensor_ids: List[int]):
+    try:
+        return sensor_live_hub.subscribe(sensor_ids)
+    except LiveHubFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+
+@router.get("/live")
+async def stream_live_readings(
+    request: Request,
+    sensor_id: Optional[str] = None,
+    interval: float = 0,
+    current_user: User = Depends(get_current_user_from_query),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events feed of new readings for one sensor or all of the user's sensors.
+    
+    Authenticate with ?token=<access token>. Each new reading is a "reading"
+    event in the /get-latest-data format; the current values are sent first. A
+    comment line is sent as a heartbeat when nothing arrives for a while.
+    `interval` (seconds) caps how often this client is sent data; readings in
+    between are coalesced to the newest one per sensor.
+    """
+    sensor_ids = _owned_sensor_ids(db, current_user, sensor_id)
+    snapshot = _live_snapshot(db, sensor_ids)
+    # Release the connection; the feed doesn't touch the database again
+    db.close()
+    subscription = _live_subscribe(sensor_ids)
+    
+    async def generate_events():
+        try:
+            for payload in snapshot:
+                yield f"event: reading\ndata: {json.dumps(payload)}\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(IOT_LIVE_HEARTBEAT_SECONDS)
+                if not batch:
+                    yield ": heartbeat\n\n"
+                    continue
+                for payload in batch:
+                    yield f"id: {payload['id']}\nevent: reading\ndata: {json.dumps(payload)}\n\n"
+                if interval > 0:
+                    await asyncio.sleep(interval)
+        finally:
+            sensor_live_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@router.websocket("/live/ws")
+async def websocket_live_readings(
+    websocket: WebSocket,
+    sensor_id: Optional[str] = None,
+    interval: float = 0,
+    current_user: User = Depends(get_current_user_from_query),
+    db: Session = Depends(get_db)
+):
+    """
+    WebSocket feed of new readings, same scope and options as GET /live.
+    
+    Messages are JSON objects: {"type": "reading", "data": {...}} for readings and
+    {"type": "heartbeat"} when nothing arrived for a while.
+    """
+    sensor_ids = _owned_sensor_ids(db, current_user, sensor_id)
+    snapshot = _live_snapshot(db, sensor_ids)
+    # Release the connection; the feed doesn't touch the database again
+    db.close()
+    subscription = _live_subscribe(sensor_ids)
+    
+    await websocket.accept()
+    try:
+        for payload in snapshot:
+            await websocket.send_json({"type": "reading", "data": payload})
+        while True:
+            batch = await subscription.next_batch(IOT_LIVE_HEARTBEAT_SECONDS)
+            if not batch:
+                await websocket.send_json({"type": "heartbeat"})
+                continue
+            for payload in batch:
+                await websocket.send_json({"type": "reading", "data": payload})
+            if interval > 0:
+                await asyncio.sleep(interval)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sensor_live_hub.unsubscribe(subscription)
+
+@router.get("/live/stats")
+async def get_live_stats(current_user: User = Depends(get_current_user)):
+    """Subscriber and fan-out counters of the live feed"""
+    return sensor_live_hub.stats()
@@ -9,14 +9,11 @@ from app.auth.security import verify_token
 # Security scheme
 security = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
+def get_user_from_token(token: str, db: Session) -> User:
+    """Resolve an access token to an active user"""
     try:
         # Verify token
-        payload = verify_token(credentials.credentials)
+        payload = verify_token(token)
         user_id: int = payload.get("sub")
         if user_id is None:
             raise HTTPException(
@@ -45,6 +42,20 @@ def get_current_user(
     
     return user
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current authenticated user"""
+    return get_user_from_token(credentials.credentials, db)
+
+def get_current_user_from_query(
+    token: str,
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current user from a ?token= query parameter (EventSource and WebSocket clients can't set headers)"""
+    return get_user_from_token(token, db)
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user"""
     if not current_user.is_active:
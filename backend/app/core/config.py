@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 from typing import Optional
 
@@ -43,3 +44,82 @@ ALLOWED_FILE_TYPES = ["image/jpeg", "image/png", "image/jpg"]
 # IoT Settings
 IOT_UPDATE_INTERVAL = 300  # 5 minutes
 SENSOR_TIMEOUT = 30  # seconds
+IOT_BATCH_MAX_ROWS = int(os.getenv("IOT_BATCH_MAX_ROWS", "5000"))  # readings accepted per batch request
+IOT_SENSOR_CONFIG_CACHE_TTL = float(os.getenv("IOT_SENSOR_CONFIG_CACHE_TTL", "60"))  # seconds
+IOT_DEFAULT_DEVICE_ID = os.getenv("IOT_DEFAULT_DEVICE_ID", "ESP32_DEFAULT")  # used when an ESP32 payload has no device_id
+IOT_DEDUP_CACHE_SIZE = int(os.getenv("IOT_DEDUP_CACHE_SIZE", "100000"))  # recent (sensor, recorded_at) keys remembered to reject retries
+IOT_MAX_CLOCK_SKEW_SECONDS = float(os.getenv("IOT_MAX_CLOCK_SKEW_SECONDS", "300"))  # device timestamps further ahead are not trusted
+IOT_SERIES_MAX_POINTS = int(os.getenv("IOT_SERIES_MAX_POINTS", "5000"))  # upper bound for /series downsampling
+IOT_ARCHIVE_AFTER_DAYS = int(os.getenv("IOT_ARCHIVE_AFTER_DAYS", "30"))  # raw readings older than this move to archive blocks
+
+# Retention: days each tier keeps raw readings (sensor_data and archive blocks)
+# and each rollup resolution; 0 keeps forever. Sensors can pick a tier or
+# override single values (PUT /api/iot/sensors/{id}/retention).
+IOT_RETENTION_TIERS = json.loads(os.getenv("IOT_RETENTION_TIERS", json.dumps({
+    "short": {"raw_days": 30, "rollup_1m_days": 3, "rollup_1h_days": 180, "rollup_1d_days": 730},
+    "standard": {"raw_days": 365, "rollup_1m_days": 14, "rollup_1h_days": 730, "rollup_1d_days": 0},
+    "long": {"raw_days": 0, "rollup_1m_days": 30, "rollup_1h_days": 0, "rollup_1d_days": 0}
+})))
+IOT_RETENTION_DEFAULT_TIER = os.getenv("IOT_RETENTION_DEFAULT_TIER", "standard")
+IOT_RETENTION_ENABLED = os.getenv("IOT_RETENTION_ENABLED", "True").lower() == "true"  # background retention passes
+IOT_RETENTION_INTERVAL_HOURS = float(os.getenv("IOT_RETENTION_INTERVAL_HOURS", "6"))
+IOT_RETENTION_CHUNK_SIZE = int(os.getenv("IOT_RETENTION_CHUNK_SIZE", "500"))  # rows per delete transaction
+IOT_RETENTION_CHUNK_PAUSE = float(os.getenv("IOT_RETENTION_CHUNK_PAUSE", "0.05"))  # seconds between chunks, lets writers in
+IOT_RETENTION_VACUUM_PAGES = int(os.getenv("IOT_RETENTION_VACUUM_PAGES", "2000"))  # incremental vacuum per pass, 0 disables
+
+# Write-behind ingest buffer: readings are journaled, acknowledged and flushed in batches
+IOT_INGEST_BUFFER_ENABLED = os.getenv("IOT_INGEST_BUFFER_ENABLED", "True").lower() == "true"
+IOT_INGEST_MAX_PENDING = int(os.getenv("IOT_INGEST_MAX_PENDING", "10000"))
+IOT_INGEST_FLUSH_BATCH_SIZE = int(os.getenv("IOT_INGEST_FLUSH_BATCH_SIZE", "500"))
+IOT_INGEST_FLUSH_INTERVAL = float(os.getenv("IOT_INGEST_FLUSH_INTERVAL", "1.0"))  # seconds
+IOT_INGEST_JOURNAL_DIR = os.getenv("IOT_INGEST_JOURNAL_DIR", "data/ingest_journal")
+IOT_INGEST_JOURNAL_FSYNC = os.getenv("IOT_INGEST_JOURNAL_FSYNC", "False").lower() == "true"
+IOT_INGEST_MAX_FLUSH_ATTEMPTS = int(os.getenv("IOT_INGEST_MAX_FLUSH_ATTEMPTS", "5"))  # then rows are written one by one, failures dead-lettered
+
+# Live feed (/api/iot/live SSE and WebSocket)
+IOT_LIVE_HEARTBEAT_SECONDS = float(os.getenv("IOT_LIVE_HEARTBEAT_SECONDS", "15"))
+IOT_LIVE_MAX_SUBSCRIBERS = int(os.getenv("IOT_LIVE_MAX_SUBSCRIBERS", "1000"))
+
+# Plant Disease Detection Settings
+DETECTION_MODEL_PATH = os.getenv(
+    "DETECTION_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "visionmodels", "plantvillage.pt")
+)
+DETECTION_WARM_MODELS = os.getenv("DETECTION_WARM_MODELS", "True").lower() == "true"
+
+# Inference backend: "ultralytics" runs the .pt weights, "onnxruntime" runs an
+# exported graph (see export_detection_model.py) on CPU
+DETECTION_BACKEND = os.getenv("DETECTION_BACKEND", "ultralytics").lower()
+DETECTION_ONNX_MODEL_PATH = os.getenv(
+    "DETECTION_ONNX_MODEL_PATH",
+    os.path.splitext(DETECTION_MODEL_PATH)[0] + ".onnx"
+)
+DETECTION_ONNX_INTRA_OP_THREADS = int(os.getenv("DETECTION_ONNX_INTRA_OP_THREADS", "0"))  # 0 = all cores
+DETECTION_ONNX_INTER_OP_THREADS = int(os.getenv("DETECTION_ONNX_INTER_OP_THREADS", "1"))
+DETECTION_NMS_IOU_THRESHOLD = float(os.getenv("DETECTION_NMS_IOU_THRESHOLD", "0.7"))
+
+# Micro-batching: concurrent predictions are grouped into one forward pass
+DETECTION_BATCHING_ENABLED = os.getenv("DETECTION_BATCHING_ENABLED", "True").lower() == "true"
+DETECTION_BATCH_MAX_SIZE = int(os.getenv("DETECTION_BATCH_MAX_SIZE", "8"))
+DETECTION_BATCH_MAX_WAIT_MS = float(os.getenv("DETECTION_BATCH_MAX_WAIT_MS", "5"))
+
+# Video detection pipeline (decode -> infer -> encode stages joined by bounded queues)
+DETECTION_VIDEO_QUEUE_SIZE = int(os.getenv("DETECTION_VIDEO_QUEUE_SIZE", "32"))
+DETECTION_VIDEO_BATCH_SIZE = int(os.getenv("DETECTION_VIDEO_BATCH_SIZE", "4"))
+
+# Adaptive frame sampling: only run YOLO on frames that changed meaningfully
+DETECTION_ADAPTIVE_SAMPLING = os.getenv("DETECTION_ADAPTIVE_SAMPLING", "True").lower() == "true"
+DETECTION_SAMPLER_CHANGE_THRESHOLD = float(os.getenv("DETECTION_SAMPLER_CHANGE_THRESHOLD", "6.0"))
+DETECTION_SAMPLER_MIN_INTERVAL = int(os.getenv("DETECTION_SAMPLER_MIN_INTERVAL", "2"))
+DETECTION_SAMPLER_MAX_INTERVAL = int(os.getenv("DETECTION_SAMPLER_MAX_INTERVAL", "30"))
+
+# Background video detection jobs
+VIDEO_JOB_MAX_WORKERS = int(os.getenv("VIDEO_JOB_MAX_WORKERS", "2"))
+VIDEO_JOB_MAX_PENDING = int(os.getenv("VIDEO_JOB_MAX_PENDING", "20"))
+
+# Detection result cache (keyed by decoded image hash, model version and threshold)
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "512"))
+
+# Bounded executor for CPU-bound detection work (decode, inference, encode)
+DETECTION_EXECUTOR_WORKERS = int(os.getenv("DETECTION_EXECUTOR_WORKERS", "4"))
+DETECTION_EXECUTOR_MAX_QUEUE = int(os.getenv("DETECTION_EXECUTOR_MAX_QUEUE", "16"))
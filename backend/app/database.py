@@ -30,10 +30,10 @@ def create_tables():
     from app.models.user import User
     from app.models.chat import ChatSession, ChatMessage
     from app.models.weather import WeatherCache
-    from app.models.sensor import SensorConfig, SensorData
+    from app.models.sensor import SensorConfig, SensorData, SensorRollup, SensorArchiveBlock, SensorAlertEvent, SensorRetentionPolicy
     from app.models.farm import Farm
     from app.models.market import MarketPrice
-    from app.models.detection import DetectionHistory
+    from app.models.detection import DetectionHistory, VideoDetectionJob
     from app.models.form_data import FarmData
     Base.metadata.create_all(bind=engine)
 
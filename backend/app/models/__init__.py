@@ -1,10 +1,10 @@
 from .user import User, UserPreferences
-from .sensor import SensorData, SensorConfig
+from .sensor import SensorData, SensorConfig, SensorRollup, SensorArchiveBlock, SensorAlertEvent, SensorRetentionPolicy
 from .chat import ChatSession, ChatMessage, CommunityMessage, CommunityMessageType, MessageType
 from .farm import Farm, Crop, CropCalendar
 from .market import MarketPrice, MarketAlert
 from .weather import WeatherCache
-from .detection import DetectionHistory, DetectionAlert
+from .detection import DetectionHistory, DetectionAlert, VideoDetectionJob
 from .store import StoreProduct, StoreListing, StoreOrder, StoreOrderItem, StorePayment, StorePriceHistory
 from .community import (
     Community, 
@@ -32,6 +32,10 @@ __all__ = [
     "UserPreferences", 
     "SensorData",
     "SensorConfig",
+    "SensorRollup",
+    "SensorArchiveBlock",
+    "SensorAlertEvent",
+    "SensorRetentionPolicy",
     "ChatSession",
     "ChatMessage",
     "CommunityMessage",
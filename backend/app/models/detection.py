@@ -67,3 +67,38 @@ class DetectionAlert(Base):
     # Relationships
     user = relationship("User")
     detection_history = relationship("DetectionHistory")
+
+
+class VideoDetectionJob(Base):
+    __tablename__ = "video_detection_jobs"
+    
+    id = Column(String, primary_key=True, index=True)  # UUID
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Input / output
+    original_filename = Column(String)
+    input_path = Column(String, nullable=False)
+    output_path = Column(String, nullable=False)
+    
+    # Processing parameters
+    confidence_threshold = Column(Float, default=0.25)
+    frame_skip = Column(Integer, default=5)
+    adaptive_sampling = Column(Boolean)
+    
+    # Progress
+    status = Column(String, default="queued")  # queued, running, completed, failed, cancelled
+    progress = Column(Float, default=0.0)
+    total_frames = Column(Integer, default=0)
+    processed_frames = Column(Integer, default=0)
+    partial_detections = Column(JSON)  # Detection history collected so far
+    result = Column(JSON)  # Final summary event
+    error_message = Column(Text)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    user = relationship("User")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -41,6 +41,13 @@ class SensorConfig(Base):
 
 class SensorData(Base):
     __tablename__ = "sensor_data"
+    __table_args__ = (
+        # Per-sensor latest/range reads: WHERE sensor_config_id = ? ORDER BY recorded_at DESC.
+        # Unique: a reading is stored once however often a device resends it
+        Index("ix_sensor_data_config_recorded_at", "sensor_config_id", "recorded_at", unique=True),
+        # Fleet-wide latest/range reads (/get-latest-data, /get-data-history, agent tools)
+        Index("ix_sensor_data_recorded_at", "recorded_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     sensor_config_id = Column(Integer, ForeignKey("sensor_configs.id"))
@@ -78,4 +85,87 @@ class SensorData(Base):
     received_at = Column(DateTime(timezone=True), server_default=func.now())  # When server received
     
     # Relationships
-    sensor_config = relationship("SensorConfig", back_populates="sensor_data")
\ No newline at end of file
+    sensor_config = relationship("SensorConfig", back_populates="sensor_data")
+
+class SensorRollup(Base):
+    """Per-metric aggregate of a sensor's readings over one time bucket (1m, 1h or 1d)"""
+    __tablename__ = "sensor_rollups"
+    __table_args__ = (
+        UniqueConstraint("sensor_config_id", "resolution", "metric", "bucket_start", name="uq_sensor_rollup_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sensor_config_id = Column(Integer, ForeignKey("sensor_configs.id"), nullable=False)
+    resolution = Column(String, nullable=False)  # 1m, 1h, 1d
+    metric = Column(String, nullable=False)  # SensorData column name, e.g. temperature
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    
+    # Aggregates (mean = sum_value / count)
+    count = Column(Integer, nullable=False, default=0)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    sum_value = Column(Float)
+    last_value = Column(Float)
+    last_recorded_at = Column(DateTime(timezone=True))
+
+class SensorArchiveBlock(Base):
+    """One sensor's readings for one day, moved out of sensor_data into a compressed columnar block"""
+    __tablename__ = "sensor_archive_blocks"
+    __table_args__ = (
+        UniqueConstraint("sensor_config_id", "day", name="uq_sensor_archive_block_day"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sensor_config_id = Column(Integer, ForeignKey("sensor_configs.id"), nullable=False)
+    day = Column(DateTime(timezone=True), nullable=False)  # Local midnight the block starts at
+    
+    # Block contents (see sensor_archive_service for the encoding)
+    format_version = Column(Integer, nullable=False, default=1)
+    row_count = Column(Integer, nullable=False)
+    first_recorded_at = Column(DateTime(timezone=True))
+    last_recorded_at = Column(DateTime(timezone=True))
+    data = Column(LargeBinary, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class SensorAlertEvent(Base):
+    """A threshold alert being raised or cleared for one sensor metric"""
+    __tablename__ = "sensor_alert_events"
+    __table_args__ = (
+        Index("ix_sensor_alert_events_config_metric", "sensor_config_id", "metric", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sensor_config_id = Column(Integer, ForeignKey("sensor_configs.id"), nullable=False)
+    metric = Column(String, nullable=False)  # SensorData column name, e.g. temperature
+    alert_type = Column(String, nullable=False)  # <metric>_high or <metric>_low
+    transition = Column(String, nullable=False)  # raised, cleared
+    severity = Column(String, default="warning")  # info, caution, warning, critical
+    
+    # Reading that caused the transition
+    value = Column(Float)
+    threshold = Column(Float)
+    recorded_at = Column(DateTime(timezone=True))
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    sensor_config = relationship("SensorConfig")
+
+class SensorRetentionPolicy(Base):
+    """Retention of one sensor's history: a tier from IOT_RETENTION_TIERS plus optional per-sensor overrides"""
+    __tablename__ = "sensor_retention_policies"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sensor_config_id = Column(Integer, ForeignKey("sensor_configs.id"), unique=True, nullable=False)
+    tier = Column(String)  # None = IOT_RETENTION_DEFAULT_TIER
+    
+    # Overrides in days (None = the tier's value, 0 = keep forever)
+    raw_days = Column(Integer)
+    rollup_1m_days = Column(Integer)
+    rollup_1h_days = Column(Integer)
+    rollup_1d_days = Column(Integer)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
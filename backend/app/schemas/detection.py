@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class DetectionRequest(BaseModel):
@@ -23,6 +23,8 @@ class DetectionResponse(BaseModel):
     original_image_url: str
     processed_image_url: str
     processing_time: float
+    cached: bool = False
+    stage_timings: Optional[Dict[str, float]] = None  # milliseconds per processing stage
 
 class DetectionHistoryItem(BaseModel):
     id: int
@@ -1,8 +1,11 @@
+import json
 from pydantic import BaseModel, validator
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 from enum import Enum
 
+from app.core.config import IOT_RETENTION_TIERS
+
 class SensorTypeEnum(str, Enum):
     DHT22 = "DHT22"
     GY30 = "GY30"
@@ -20,6 +23,54 @@ class DataQualityEnum(str, Enum):
     warning = "warning"
     error = "error"
 
+class AlertSeverityEnum(str, Enum):
+    info = "info"
+    caution = "caution"
+    warning = "warning"
+    critical = "critical"
+
+# Reading columns an alert threshold can watch
+ALERT_METRICS = (
+    "temperature", "humidity", "light_intensity", "soil_moisture", "soil_ph",
+    "water_level", "water_flow_rate", "atmospheric_pressure", "uv_index",
+    "battery_level", "signal_strength"
+)
+
+class AlertThreshold(BaseModel):
+    """Limits for one reading column, as stored in SensorConfig.alert_thresholds"""
+    min: Optional[float] = None
+    max: Optional[float] = None
+    hysteresis: float = 0.0  # An alert clears only once the value is back inside the limit by this margin
+    debounce: int = 1  # Consecutive readings needed to raise an alert, and again to clear it
+    severity: AlertSeverityEnum = AlertSeverityEnum.warning
+    
+    @validator('max', always=True)
+    def validate_limits(cls, v, values, **kwargs):
+        if v is None and values.get('min') is None:
+            raise ValueError('Set at least one of min and max')
+        if v is not None and values.get('min') is not None and values['min'] >= v:
+            raise ValueError('min must be lower than max')
+        return v
+    
+    @validator('hysteresis')
+    def validate_hysteresis(cls, v):
+        if v < 0:
+            raise ValueError('hysteresis cannot be negative')
+        return v
+    
+    @validator('debounce')
+    def validate_debounce(cls, v):
+        if v < 1:
+            raise ValueError('debounce must be at least 1 reading')
+        return v
+
+def validate_alert_metrics(thresholds: Optional[Dict[str, AlertThreshold]]):
+    if thresholds:
+        unknown = sorted(set(thresholds) - set(ALERT_METRICS))
+        if unknown:
+            raise ValueError(f"Unknown alert metrics: {', '.join(unknown)}")
+    return thresholds
+
 class SensorConfigCreate(BaseModel):
     sensor_id: str
     sensor_name: str
@@ -30,7 +81,9 @@ class SensorConfigCreate(BaseModel):
     longitude: Optional[float] = None
     elevation: Optional[float] = None
     update_interval: int = 300
-    alert_thresholds: Optional[Dict[str, Any]] = None
+    alert_thresholds: Optional[Dict[str, AlertThreshold]] = None
+    
+    _check_alert_metrics = validator('alert_thresholds', allow_reuse=True)(validate_alert_metrics)
 
 class SensorConfigUpdate(BaseModel):
     sensor_name: Optional[str] = None
@@ -40,7 +93,9 @@ class SensorConfigUpdate(BaseModel):
     elevation: Optional[float] = None
     is_active: Optional[bool] = None
     update_interval: Optional[int] = None
-    alert_thresholds: Optional[Dict[str, Any]] = None
+    alert_thresholds: Optional[Dict[str, AlertThreshold]] = None
+    
+    _check_alert_metrics = validator('alert_thresholds', allow_reuse=True)(validate_alert_metrics)
 
 class SensorConfig(BaseModel):
     id: int
@@ -61,6 +116,13 @@ class SensorConfig(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
+    @validator('alert_thresholds', pre=True)
+    def parse_alert_thresholds(cls, v):
+        # Stored as JSON text on the model
+        if isinstance(v, str):
+            return json.loads(v) if v else None
+        return v
+    
     class Config:
         from_attributes = True
 
@@ -126,6 +188,23 @@ class SensorData(BaseModel):
     class Config:
         from_attributes = True
 
+class SensorReadingIngest(SensorDataCreate):
+    """One reading in a bulk ingest request, addressed by device id or config id"""
+    sensor_id: Optional[str] = None
+    sensor_config_id: Optional[int] = None
+
+class ESP32SensorData(BaseModel):
+    """Payload format sent by the ESP32 field devices"""
+    device_id: Optional[str] = None  # SensorConfig.sensor_id; the default device when omitted
+    timestamp: Union[str, float]  # ISO 8601 or Unix epoch seconds/milliseconds
+    temperature_c: float
+    humidity_percent: float
+    heat_index_c: float
+    water_level_raw: int
+    water_level_percent: int
+    soil_moisture_raw: int
+    soil_moisture_percent: int
+
 class SensorDataBatch(BaseModel):
     """For receiving multiple sensor readings at once"""
     sensor_id: str
@@ -140,9 +219,86 @@ class SensorAlert(BaseModel):
     threshold: float
     timestamp: datetime
 
+class SensorAlertEvent(BaseModel):
+    """A persisted alert transition (raised or cleared)"""
+    id: int
+    sensor_config_id: int
+    metric: str
+    alert_type: str
+    transition: str
+    severity: str
+    value: Optional[float] = None
+    threshold: Optional[float] = None
+    recorded_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class SensorRetentionUpdate(BaseModel):
+    """Per-sensor retention; a field set to null falls back to the tier's value"""
+    tier: Optional[str] = None
+    raw_days: Optional[int] = None  # 0 keeps forever
+    rollup_1m_days: Optional[int] = None
+    rollup_1h_days: Optional[int] = None
+    rollup_1d_days: Optional[int] = None
+    
+    @validator('tier')
+    def validate_tier(cls, v):
+        if v is not None and v not in IOT_RETENTION_TIERS:
+            raise ValueError(f"Unknown retention tier, expected one of: {', '.join(IOT_RETENTION_TIERS)}")
+        return v
+    
+    @validator('raw_days')
+    def validate_raw_days(cls, v):
+        # The dashboards count the last 24 hours of raw readings
+        if v is not None and v != 0 and v < 2:
+            raise ValueError('raw_days must be 0 (keep forever) or at least 2')
+        return v
+    
+    @validator('rollup_1m_days', 'rollup_1h_days', 'rollup_1d_days')
+    def validate_rollup_days(cls, v):
+        if v is not None and v < 0:
+            raise ValueError('Retention days cannot be negative')
+        return v
+
+class SensorRetention(BaseModel):
+    sensor_id: str
+    tier: str
+    raw_days: int
+    rollup_1m_days: int
+    rollup_1h_days: int
+    rollup_1d_days: int
+    overrides: Dict[str, int]  # Values set on this sensor rather than taken from the tier
+
+class MetricStatistics(BaseModel):
+    count: int
+    current: float
+    mean: float
+    std: float
+    min: float
+    max: float
+    percentiles: Dict[str, float]
+    slope_per_hour: float
+    change: float
+    trend: str  # increasing, decreasing or stable
+    rolling_mean: float
+    rolling_std: float
+    current_zscore: float
+    anomalies: int
+    last_anomaly_at: Optional[datetime] = None
+
+class SensorStatistics(BaseModel):
+    period_hours: int
+    readings: int
+    first_recorded_at: datetime
+    last_recorded_at: datetime
+    metrics: Dict[str, MetricStatistics]
+
 class SensorSummary(BaseModel):
     sensor_config: SensorConfig
     latest_data: Optional[SensorData] = None
     data_count_24h: int
     last_online: Optional[datetime] = None
-    alerts_count: int
\ No newline at end of file
+    alerts_count: int
+    statistics: Optional[SensorStatistics] = None
\ No newline at end of file
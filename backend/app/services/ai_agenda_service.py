@@ -12,6 +12,8 @@ from app.services.agent import enhanced_agent
 from app.tools.weather_tool import get_current_weather, get_weather_forecast, get_weather_alerts
 from app.tools.iot_sensor_tool import get_latest_sensor_data, get_sensor_history, get_sensor_alerts
 from app.tools.crop_tool import get_crop_calendar, get_fertilizer_recommendation
+from app.models.sensor import SensorConfig
+from app.services.sensor_analytics_service import sensor_analytics_service
 
 
 class AIAgendaService:
@@ -169,9 +171,21 @@ class AIAgendaService:
             sensor_data = get_latest_sensor_data.invoke({"user_id": user.id})
             sensor_alerts = get_sensor_alerts.invoke({"user_id": user.id})
             
+            # 24h statistics and trends of each of the user's sensors
+            sensors = db.query(SensorConfig).filter(
+                SensorConfig.user_id == user.id,
+                SensorConfig.is_active == True
+            ).all()
+            trends = {}
+            for sensor in sensors:
+                statistics = sensor_analytics_service.recent(db, 24, sensor.id)
+                if statistics:
+                    trends[sensor.sensor_id] = statistics["metrics"]
+            
             context["sensor_data"] = {
                 "latest": sensor_data,
-                "alerts": sensor_alerts
+                "alerts": sensor_alerts,
+                "trends": trends
             }
         except Exception as e:
             print(f"Sensor data error: {e}")
@@ -285,6 +299,20 @@ class AIAgendaService:
                         "estimated_duration": 60,
                         "ai_reasoning": "সেন্সর ডেটা অনুযায়ী মাটির আর্দ্রতা কম, তাই সেচের প্রয়োজন।"
                     })
+                # Soil drying out steadily but not low yet: plan irrigation ahead
+                elif any(
+                    metrics.get("soil_moisture", {}).get("trend") == "decreasing"
+                    for metrics in (sensor_data.get("trends") or {}).values()
+                ):
+                    suggestions.append({
+                        "title": "সেচের পরিকল্পনা করুন",
+                        "description": "গত ২৪ ঘন্টায় মাটির আর্দ্রতা ধারাবাহিকভাবে কমছে।",
+                        "priority": AgendaPriority.MEDIUM,
+                        "agenda_type": AgendaType.IRRIGATION,
+                        "scheduled_date": today + timedelta(days=1),
+                        "estimated_duration": 60,
+                        "ai_reasoning": "সেন্সর ডেটার প্রবণতা অনুযায়ী মাটির আর্দ্রতা কমছে, তাই আগামীকাল সেচের প্রয়োজন হতে পারে।"
+                    })
         
         # Seasonal suggestions based on current date
         month = today.month
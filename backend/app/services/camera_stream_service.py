@@ -0,0 +1,59 @@
+"""
+Helpers for client-pushed camera streams.
+The browser sends JPEG frames over the websocket; the server keeps only the
+newest unprocessed frame and replies with binary messages made of a 4-byte
+big-endian header length, a JSON header and the annotated JPEG.
+"""
+
+import json
+import struct
+import asyncio
+from typing import Dict, Optional, Tuple, Any
+
+_HEADER_LENGTH = struct.Struct(">I")
+
+
+class LatestFrameSlot:
+    """Single-slot buffer: a new frame replaces any frame not yet picked up."""
+
+    def __init__(self):
+        self._frame: Optional[Tuple[int, bytes]] = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame_bytes: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self.received += 1
+        self._frame = (self.received, frame_bytes)
+        self._event.set()
+
+    async def get(self) -> Optional[Tuple[int, bytes]]:
+        """Wait for the newest frame as (frame_number, bytes); None once closed."""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+
+def pack_frame_message(header: Dict[str, Any], frame_bytes: bytes = b"") -> bytes:
+    """Build a binary result message: [header length][JSON header][JPEG]."""
+    header_bytes = json.dumps(header).encode("utf-8")
+    return _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + frame_bytes
+
+
+def unpack_frame_message(message: bytes) -> Tuple[Dict[str, Any], bytes]:
+    """Split a binary result message back into its header and JPEG bytes."""
+    (header_length,) = _HEADER_LENGTH.unpack_from(message)
+    start = _HEADER_LENGTH.size
+    header = json.loads(message[start:start + header_length].decode("utf-8"))
+    return header, message[start + header_length:]
@@ -0,0 +1,111 @@
+"""
+Content-addressed cache for plant disease detection results.
+Repeated uploads of the same image (same decoded pixels, model version and
+confidence threshold) reuse the stored DetectionHistory record instead of
+re-running YOLO and writing new files.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+import numpy as np
+
+from app.core.config import DETECTION_CACHE_SIZE
+
+
+def image_content_hash(image: np.ndarray) -> str:
+    """Hash the decoded pixels, so renamed copies or files differing only in metadata still match."""
+    digest = hashlib.sha256()
+    digest.update(str(image.shape).encode())
+    digest.update(str(image.dtype).encode())
+    digest.update(np.ascontiguousarray(image).tobytes())
+    return digest.hexdigest()
+
+
+class CachedDetection:
+    def __init__(self, detection_history_id: int, detections: List[Dict],
+                 original_image_path: str, processed_image_path: str, processing_time: float):
+        self.detection_history_id = detection_history_id
+        self.detections = detections
+        self.original_image_path = original_image_path
+        self.processed_image_path = processed_image_path
+        self.processing_time = processing_time
+
+
+class DetectionResultCache:
+    """LRU cache from image/model/threshold keys to stored detection results."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedDetection]" = OrderedDict()
+        self._keys_by_history_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(user_id: int, image_hash: str, model_version: str, conf_threshold: float) -> str:
+        # Results are scoped per user, since the stored files belong to the uploader
+        return f"{user_id}:{model_version}:{conf_threshold:.4f}:{image_hash}"
+
+    def get(self, key: str) -> Optional[CachedDetection]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedDetection):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = entry
+            self._keys_by_history_id[entry.detection_history_id] = key
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._keys_by_history_id.pop(evicted.detection_history_id, None)
+                self.evictions += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._keys_by_history_id.pop(entry.detection_history_id, None)
+                self.invalidations += 1
+
+    def invalidate_history(self, detection_history_id: int):
+        """Drop the entry pointing at a deleted DetectionHistory record."""
+        with self._lock:
+            key = self._keys_by_history_id.pop(detection_history_id, None)
+            if key is not None and self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_history_id.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+# Global cache instance
+detection_cache = DetectionResultCache(max_entries=DETECTION_CACHE_SIZE)
@@ -0,0 +1,112 @@
+"""
+Bounded executor for CPU-bound detection work.
+Image decoding, inference, annotation and encoding run on a dedicated thread
+pool so a slow image never blocks the event loop. When the pool and its
+queue are full, new work is rejected so the API can answer 503 instead of
+piling up requests.
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, Any, Callable
+
+from app.core.config import DETECTION_EXECUTOR_WORKERS, DETECTION_EXECUTOR_MAX_QUEUE
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the detection executor cannot accept more work."""
+
+
+class StageTimer:
+    """Collects wall-clock durations for the stages of one request."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed_ms, 2)
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(self.timings.values()), 2)
+
+
+class DetectionExecutor:
+    """Thread pool with an admission limit for detection requests."""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16):
+        # OpenCV and PyTorch release the GIL in their heavy loops, so threads
+        # give real parallelism here without copying images between processes.
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="detection")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self._stage_totals: Dict[str, float] = {}
+        self._stage_counts: Dict[str, int] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @contextmanager
+    def admit(self):
+        """Reserve a slot for one request, or raise ExecutorSaturatedError."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturatedError("Detection service is busy, please retry shortly")
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function on the detection pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def record_timings(self, timer: StageTimer):
+        with self._lock:
+            for name, duration in timer.timings.items():
+                self._stage_totals[name] = self._stage_totals.get(name, 0.0) + duration
+                self._stage_counts[name] = self._stage_counts.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": max(0, self._in_flight - self.max_workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_stage_ms": {
+                    name: round(total / self._stage_counts[name], 2)
+                    for name, total in self._stage_totals.items()
+                }
+            }
+
+
+# Global executor instance
+detection_executor = DetectionExecutor(
+    max_workers=DETECTION_EXECUTOR_WORKERS,
+    max_queue=DETECTION_EXECUTOR_MAX_QUEUE
+)
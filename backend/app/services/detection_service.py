@@ -1,20 +1,31 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import os
-from typing import Tuple, List, Dict
+from concurrent.futures import Future
+from typing import Tuple, List, Dict, Optional
 import logging
 
+from app.core.config import DETECTION_BATCHING_ENABLED
+from .model_registry import model_registry
+from .inference_backends import resolve_model_path
+
 logger = logging.getLogger(__name__)
 
 class PlantDiseaseDetector:
     def __init__(self, model_path: str, conf_threshold: float = 0.25):
-        """Initialize the plant disease detector with YOLO model."""
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
+        """
+        Initialize the plant disease detector.
+
+        The YOLO model is shared through the process-wide model registry, so
+        creating a detector per request is cheap. conf_threshold is only the
+        default; predict() accepts a per-call threshold.
+        """
+        if not os.path.exists(resolve_model_path(model_path)):
+            raise FileNotFoundError(f"Model file not found: {resolve_model_path(model_path)}")
         
-        self.model = YOLO(model_path, task='detect')
+        self.loaded_model = model_registry.get(model_path)
         self.conf_threshold = conf_threshold
+        self.batcher = model_registry.get_batcher(self.loaded_model) if DETECTION_BATCHING_ENABLED else None
         
         # Disease descriptions mapping in Bengali
         self.disease_descriptions = {
@@ -97,7 +108,7 @@ class PlantDiseaseDetector:
         """Convert detection results to structured format."""
         detections = []
         for box, score, cls in zip(boxes, scores, classes):
-            class_name = self.model.names[int(cls)]
+            class_name = self.loaded_model.names[int(cls)]
             detections.append({
                 "class_name": self.disease_descriptions.get(class_name, class_name),
                 "original_class": class_name,
@@ -107,64 +118,88 @@ class PlantDiseaseDetector:
             })
         return detections
 
-    def predict(self, image_path: str) -> Tuple[np.ndarray, List[Dict]]:
-        """Predict plant diseases in the image."""
-        try:
-            # Read image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-
-            # Run YOLO inference
-            results = self.model(image, conf=self.conf_threshold)
+    def _draw_detections(self, image: np.ndarray, detections: List[Dict]) -> np.ndarray:
+        """Draw bounding boxes and labels on the image in place."""
+        for detection in detections:
+            box = detection["bbox"]
+            class_name = detection["original_class"]
+            english_label = self.english_labels.get(class_name, class_name)
+            severity_eng = "Severe" if detection["severity"] == "গুরুতর" else \
+                          "Moderate" if detection["severity"] == "মাঝারি" else \
+                          "Mild" if detection["severity"] == "হালকা" else "Low"
+            
+            label = f'{english_label} ({severity_eng}) {detection["confidence"]:.2f}'
             
-            detections = []
+            # Draw rectangle
+            cv2.rectangle(image,
+                        (int(box[0]), int(box[1])),
+                        (int(box[2]), int(box[3])),
+                        (0, 255, 0), 2)
             
-            # Process results
-            for r in results:
-                if len(r.boxes) > 0:
-                    boxes = r.boxes.xyxy.cpu().numpy()
-                    scores = r.boxes.conf.cpu().numpy()
-                    classes = r.boxes.cls.cpu().numpy()
-                    
-                    # Get structured detections
-                    detections = self._get_detection_results(boxes, scores, classes)
-                    
-                    # Draw bounding boxes and labels on image
-                    for detection in detections:
-                        box = detection["bbox"]
-                        class_name = detection["original_class"]
-                        english_label = self.english_labels.get(class_name, class_name)
-                        severity_eng = "Severe" if detection["severity"] == "গুরুতর" else \
-                                      "Moderate" if detection["severity"] == "মাঝারি" else \
-                                      "Mild" if detection["severity"] == "হালকা" else "Low"
-                        
-                        label = f'{english_label} ({severity_eng}) {detection["confidence"]:.2f}'
-                        
-                        # Draw rectangle
-                        cv2.rectangle(image,
-                                    (int(box[0]), int(box[1])),
-                                    (int(box[2]), int(box[3])),
-                                    (0, 255, 0), 2)
-                        
-                        # Calculate text position
-                        label_size, baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                        text_x = int(box[0])
-                        text_y = int(box[1]) - 10 if int(box[1]) - 10 > label_size[1] else int(box[1]) + 10 + label_size[1]
-                        
-                        # Draw background rectangle for text
-                        cv2.rectangle(image,
-                                    (text_x, text_y - label_size[1] - baseline),
-                                    (text_x + label_size[0], text_y + baseline),
-                                    (0, 0, 0), cv2.FILLED)
-                        
-                        # Draw text
-                        cv2.putText(image, label,
-                                   (text_x, text_y),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-
-            return image, detections
+            # Calculate text position
+            label_size, baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+            text_x = int(box[0])
+            text_y = int(box[1]) - 10 if int(box[1]) - 10 > label_size[1] else int(box[1]) + 10 + label_size[1]
+            
+            # Draw background rectangle for text
+            cv2.rectangle(image,
+                        (text_x, text_y - label_size[1] - baseline),
+                        (text_x + label_size[0], text_y + baseline),
+                        (0, 0, 0), cv2.FILLED)
+            
+            # Draw text
+            cv2.putText(image, label,
+                       (text_x, text_y),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        
+        return image
+
+    def submit_inference(self, image: np.ndarray, conf_threshold: Optional[float] = None) -> Future:
+        """
+        Queue an image for inference and return a future of (boxes, scores, classes).
+
+        With batching enabled the request is grouped with other concurrent
+        requests into one forward pass; otherwise it runs immediately.
+        """
+        if conf_threshold is None:
+            conf_threshold = self.conf_threshold
+
+        if self.batcher is not None:
+            return self.batcher.submit(image, conf_threshold)
+
+        future = Future()
+        try:
+            future.set_result(self.loaded_model.predict([image], conf_threshold)[0])
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _build_result(self, image: np.ndarray, boxes: np.ndarray, scores: np.ndarray,
+                      classes: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+        detections = self._get_detection_results(boxes, scores, classes)
+        return self._draw_detections(image, detections), detections
+
+    def _load_image(self, image_path: str) -> np.ndarray:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not load image: {image_path}")
+        return image
+
+    def predict_frame(self, image: np.ndarray, conf_threshold: Optional[float] = None) -> Tuple[np.ndarray, List[Dict]]:
+        """
+        Predict plant diseases in an already decoded BGR image.
+
+        The image is annotated in place and returned, so callers that need
+        the untouched frame should pass a copy.
+        """
+        try:
+            boxes, scores, classes = self.submit_inference(image, conf_threshold).result()
+            return self._build_result(image, boxes, scores, classes)
             
         except Exception as e:
             logger.error(f"Error during prediction: {str(e)}")
             raise
+
+    def predict(self, image_path: str, conf_threshold: Optional[float] = None) -> Tuple[np.ndarray, List[Dict]]:
+        """Predict plant diseases in the image."""
+        return self.predict_frame(self._load_image(image_path), conf_threshold)
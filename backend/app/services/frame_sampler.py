@@ -0,0 +1,99 @@
+"""
+Adaptive frame sampling for video detection.
+Decides which frames need a YOLO pass by comparing cheap thumbnails against
+the last inferred frame, and estimates the camera shift used to carry the
+last boxes forward on skipped frames.
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+
+
+class AdaptiveFrameSampler:
+    """Selects frames for inference based on how much the scene has changed."""
+
+    def __init__(self, change_threshold: float = 6.0, min_interval: int = 1,
+                 max_interval: int = 30, thumbnail_size: int = 64):
+        """
+        Args:
+            change_threshold: Mean absolute grayscale difference (0-255) against
+                the reference frame that triggers a new inference
+            min_interval: Minimum number of frames between two inferences
+            max_interval: Force an inference after this many skipped frames
+            thumbnail_size: Side of the square thumbnail used for scoring
+        """
+        self.change_threshold = change_threshold
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.thumbnail_size = thumbnail_size
+
+        self._reference = None
+        self._frames_since_reference = 0
+        self._scale = (1.0, 1.0)
+
+        self.sampled_frames = 0
+        self.skipped_frames = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumb = cv2.resize(gray, (self.thumbnail_size, self.thumbnail_size), interpolation=cv2.INTER_AREA)
+        # Blur away sensor noise so it doesn't count as scene change
+        return cv2.GaussianBlur(thumb, (3, 3), 0).astype(np.float32)
+
+    def observe(self, frame: np.ndarray) -> Tuple[bool, Tuple[float, float], float]:
+        """
+        Score a frame against the reference frame.
+
+        Returns:
+            (should_infer, shift, change_score) where shift is the estimated
+            (dx, dy) movement in full-resolution pixels since the reference.
+        """
+        thumb = self._thumbnail(frame)
+
+        if self._reference is None:
+            height, width = frame.shape[:2]
+            self._scale = (width / self.thumbnail_size, height / self.thumbnail_size)
+            return self._accept(thumb), (0.0, 0.0), 0.0
+
+        self._frames_since_reference += 1
+        change_score = float(np.mean(np.abs(thumb - self._reference)))
+
+        if self._frames_since_reference >= self.max_interval or (
+            self._frames_since_reference >= self.min_interval and change_score >= self.change_threshold
+        ):
+            return self._accept(thumb), (0.0, 0.0), change_score
+
+        (dx, dy), _ = cv2.phaseCorrelate(self._reference, thumb)
+        self.skipped_frames += 1
+        return False, (dx * self._scale[0], dy * self._scale[1]), change_score
+
+    def _accept(self, thumb: np.ndarray) -> bool:
+        self._reference = thumb
+        self._frames_since_reference = 0
+        self.sampled_frames += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sampled_frames": self.sampled_frames,
+            "skipped_frames": self.skipped_frames
+        }
+
+
+def shift_detections(detections: List[Dict], shift: Tuple[float, float],
+                     width: int, height: int) -> List[Dict]:
+    """Move detection boxes by the estimated camera shift, clipped to the frame."""
+    dx, dy = shift
+    shifted = []
+    for detection in detections:
+        x1, y1, x2, y2 = detection["bbox"]
+        moved = dict(detection)
+        moved["bbox"] = [
+            float(np.clip(x1 + dx, 0, width)),
+            float(np.clip(y1 + dy, 0, height)),
+            float(np.clip(x2 + dx, 0, width)),
+            float(np.clip(y2 + dy, 0, height))
+        ]
+        shifted.append(moved)
+    return shifted
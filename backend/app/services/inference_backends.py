@@ -0,0 +1,205 @@
+"""
+Inference backends for the plant disease detector.
+UltralyticsBackend runs the PyTorch .pt weights; OnnxRuntimeBackend runs a
+graph exported with export_detection_model.py on CPU, with its own
+letterboxing, box decoding and NMS so results match the ultralytics pipeline.
+"""
+
+import ast
+from typing import Dict, List, Tuple, Any
+import cv2
+import numpy as np
+
+from app.core.config import (
+    DETECTION_BACKEND, DETECTION_ONNX_MODEL_PATH, DETECTION_ONNX_INTRA_OP_THREADS,
+    DETECTION_ONNX_INTER_OP_THREADS, DETECTION_NMS_IOU_THRESHOLD
+)
+
+# (boxes, scores, classes) for one image
+InferenceResult = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# Same limits ultralytics applies in its NMS step
+MAX_DETECTIONS = 300
+_CLASS_OFFSET = 7680
+
+
+def resolve_model_path(model_path: str) -> str:
+    """Map the configured .pt weights to the exported graph when the ONNX backend is selected."""
+    if DETECTION_BACKEND == "onnxruntime" and model_path.endswith(".pt"):
+        return DETECTION_ONNX_MODEL_PATH
+    return model_path
+
+
+def create_backend(model_path: str):
+    """Create the backend matching a model file's format."""
+    if model_path.endswith(".onnx"):
+        return OnnxRuntimeBackend(model_path)
+    return UltralyticsBackend(model_path)
+
+
+def _empty_result() -> InferenceResult:
+    empty = np.zeros((0,), dtype=np.float32)
+    return np.zeros((0, 4), dtype=np.float32), empty, empty
+
+
+def extract_boxes(result) -> InferenceResult:
+    """Pull boxes, scores and classes out of a single ultralytics result."""
+    if len(result.boxes) == 0:
+        return _empty_result()
+
+    return (
+        result.boxes.xyxy.cpu().numpy(),
+        result.boxes.conf.cpu().numpy(),
+        result.boxes.cls.cpu().numpy()
+    )
+
+
+class UltralyticsBackend:
+    """Runs .pt weights through ultralytics/PyTorch."""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path: str):
+        # Imported here so the ONNX backend works without ultralytics/PyTorch installed
+        from ultralytics import YOLO
+        self.model = YOLO(model_path, task='detect')
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return self.model.names
+
+    def predict(self, images: List[np.ndarray], conf_threshold: float) -> List[InferenceResult]:
+        results = self.model(images, conf=conf_threshold, iou=DETECTION_NMS_IOU_THRESHOLD)
+        return [extract_boxes(result) for result in results]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int]) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to new_shape (h, w), as ultralytics does."""
+    height, width = image.shape[:2]
+    ratio = min(new_shape[0] / height, new_shape[1] / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    pad_w = (new_shape[1] - new_width) / 2
+    pad_h = (new_shape[0] - new_height) / 2
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio, (left, top)
+
+
+class OnnxRuntimeBackend:
+    """Runs an exported YOLO graph with ONNX Runtime on CPU."""
+
+    name = "onnxruntime"
+
+    def __init__(self, model_path: str, intra_op_threads: int = DETECTION_ONNX_INTRA_OP_THREADS,
+                 inter_op_threads: int = DETECTION_ONNX_INTER_OP_THREADS,
+                 iou_threshold: float = DETECTION_NMS_IOU_THRESHOLD):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("onnxruntime is required for DETECTION_BACKEND=onnxruntime (pip install onnxruntime)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.iou_threshold = iou_threshold
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, width = model_input.shape
+        self.dynamic_batch = not isinstance(batch_dim, int)
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self._names = self._parse_names(metadata.get("names"))
+        if isinstance(height, int) and isinstance(width, int):
+            self.input_shape = (height, width)
+        else:
+            imgsz = ast.literal_eval(metadata["imgsz"]) if "imgsz" in metadata else [640, 640]
+            self.input_shape = (int(imgsz[0]), int(imgsz[1]))
+
+    @staticmethod
+    def _parse_names(raw_names) -> Dict[int, str]:
+        # Ultralytics stores the class map as the repr of a dict
+        if not raw_names:
+            raise ValueError("ONNX model has no 'names' metadata; export it with export_detection_model.py")
+        return {int(key): value for key, value in ast.literal_eval(raw_names).items()}
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return self._names
+
+    def predict(self, images: List[np.ndarray], conf_threshold: float) -> List[InferenceResult]:
+        prepared = [letterbox(image, self.input_shape) for image in images]
+        blob = cv2.dnn.blobFromImages(
+            [padded for padded, _, _ in prepared], scalefactor=1 / 255.0, swapRB=True
+        )
+
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: blob[i:i + 1]})[0] for i in range(len(images))
+            ])
+
+        return [
+            self._decode(output, conf_threshold, ratio, pad, image.shape[:2])
+            for output, image, (_, ratio, pad) in zip(outputs, images, prepared)
+        ]
+
+    def _decode(self, output: np.ndarray, conf_threshold: float, ratio: float,
+                pad: Tuple[int, int], image_shape: Tuple[int, int]) -> InferenceResult:
+        # YOLOv8 heads emit (4 + classes, anchors); rows are anchors after transposing
+        predictions = output.T if output.shape[0] == 4 + len(self._names) else output
+        class_scores = predictions[:, 4:]
+        classes = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(classes)), classes]
+
+        keep = scores >= conf_threshold
+        if not np.any(keep):
+            return _empty_result()
+        xywh, scores, classes = predictions[keep, :4], scores[keep], classes[keep]
+
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+        # Per-class NMS: offset boxes by class so different classes never overlap
+        offset_boxes = boxes + (classes[:, None] * _CLASS_OFFSET)
+        nms_boxes = np.concatenate([offset_boxes[:, :2], offset_boxes[:, 2:] - offset_boxes[:, :2]], axis=1)
+        indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), scores.tolist(), conf_threshold, self.iou_threshold)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+        indices = indices[np.argsort(-scores[indices])][:MAX_DETECTIONS]
+
+        boxes = boxes[indices]
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, image_shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, image_shape[0])
+
+        return (
+            boxes.astype(np.float32),
+            scores[indices].astype(np.float32),
+            classes[indices].astype(np.float32)
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "input_shape": list(self.input_shape),
+            "dynamic_batch": self.dynamic_batch,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads
+        }
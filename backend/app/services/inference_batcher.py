@@ -0,0 +1,127 @@
+"""
+Dynamic micro-batching for YOLO inference.
+Concurrent predict calls are collected for a few milliseconds and run as a
+single batched forward pass on the shared model.
+"""
+
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Dict, List, Any
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _InferenceRequest:
+    def __init__(self, image: np.ndarray, conf_threshold: float):
+        self.image = image
+        self.conf_threshold = conf_threshold
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceBatcher:
+    """Collects inference requests into batches and runs them on a worker thread."""
+
+    def __init__(self, loaded_model, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.loaded_model = loaded_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._queue: "queue.Queue[_InferenceRequest]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        # Metrics
+        self.batches_run = 0
+        self.requests_served = 0
+        self.largest_batch = 0
+        self.total_wait_time = 0.0
+        self.total_inference_time = 0.0
+
+    def submit(self, image: np.ndarray, conf_threshold: float) -> Future:
+        """Queue an image for inference and return a future for its result."""
+        self._ensure_worker()
+        request = _InferenceRequest(image, conf_threshold)
+        self._queue.put(request)
+        return request.future
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="inference-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self) -> List[_InferenceRequest]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Backends take a single confidence per call, so group by threshold
+            groups: Dict[float, List[_InferenceRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.conf_threshold, []).append(request)
+
+            for conf_threshold, requests in groups.items():
+                self._run_group(conf_threshold, requests)
+
+    def _run_group(self, conf_threshold: float, requests: List[_InferenceRequest]):
+        # Callers may have cancelled while queued; skip them so setting their result can't fail
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+
+        started_at = time.perf_counter()
+        try:
+            results = self.loaded_model.predict(
+                [request.image for request in requests], conf_threshold
+            )
+        except Exception as e:
+            logger.error(f"Batched inference failed: {str(e)}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        inference_time = time.perf_counter() - started_at
+        self.batches_run += 1
+        self.requests_served += len(requests)
+        self.largest_batch = max(self.largest_batch, len(requests))
+        self.total_inference_time += inference_time
+
+        for request, result in zip(requests, results):
+            self.total_wait_time += started_at - request.enqueued_at
+            request.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+            "batches_run": self.batches_run,
+            "requests_served": self.requests_served,
+            "largest_batch": self.largest_batch,
+            "average_batch_size": round(self.requests_served / self.batches_run, 2) if self.batches_run else 0,
+            "average_wait_ms": round(self.total_wait_time / self.requests_served * 1000, 2) if self.requests_served else 0,
+            "average_batch_inference_ms": round(self.total_inference_time / self.batches_run * 1000, 2) if self.batches_run else 0
+        }
+
@@ -0,0 +1,178 @@
+"""
+Process-wide registry for YOLO detection models.
+Each weights file is loaded once per worker and shared by every detector instance.
+The inference backend (ultralytics or ONNX Runtime) follows the file format.
+"""
+
+import os
+import time
+import hashlib
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Iterable
+import numpy as np
+
+from app.core.config import DETECTION_BATCH_MAX_SIZE, DETECTION_BATCH_MAX_WAIT_MS
+from .inference_batcher import InferenceBatcher
+from .inference_backends import create_backend, resolve_model_path, InferenceResult
+
+logger = logging.getLogger(__name__)
+
+
+def _get_rss_mb() -> float:
+    """Return the resident memory of the current process in MB."""
+    try:
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    try:
+        import resource
+        # ru_maxrss is reported in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except (ImportError, AttributeError):
+        return 0.0
+
+
+def _file_digest(path: str) -> str:
+    """Short content hash of a weights file, used as the model version."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as weights_file:
+        for chunk in iter(lambda: weights_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class LoadedModel:
+    """A loaded model together with its load statistics."""
+
+    def __init__(self, model_path: str, backend, load_time: float, memory_mb: float):
+        self.model_path = model_path
+        self.backend = backend
+        self.load_time = load_time
+        self.memory_mb = memory_mb
+        self.file_size_mb = os.path.getsize(model_path) / (1024 * 1024)
+        self.version = _file_digest(model_path)
+        self.loaded_at = datetime.now()
+        self.use_count = 0
+
+        # Ultralytics predictors keep per-call state, so inference on a shared
+        # model has to be serialized. ONNX Runtime parallelizes inside each run.
+        self.lock = threading.Lock()
+
+        # Created on first use by ModelRegistry.get_batcher()
+        self.batcher = None
+
+    @property
+    def names(self) -> Dict[int, str]:
+        return self.backend.names
+
+    def predict(self, images: List[np.ndarray], conf_threshold: float) -> List[InferenceResult]:
+        """Run one forward pass over a list of BGR images."""
+        with self.lock:
+            return self.backend.predict(images, conf_threshold)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model_path": self.model_path,
+            **self.backend.describe(),
+            "version": self.version,
+            "load_time_seconds": round(self.load_time, 3),
+            "memory_mb": round(self.memory_mb, 1),
+            "file_size_mb": round(self.file_size_mb, 1),
+            "loaded_at": self.loaded_at.isoformat(),
+            "use_count": self.use_count,
+            "class_count": len(self.names),
+            "batching": self.batcher.stats() if self.batcher else None
+        }
+
+
+class ModelRegistry:
+    """Loads detection models lazily and caches them for the lifetime of the process."""
+
+    def __init__(self):
+        self._models: Dict[str, LoadedModel] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def _key(model_path: str) -> str:
+        return os.path.realpath(resolve_model_path(model_path))
+
+    def get(self, model_path: str) -> LoadedModel:
+        """Return the loaded model for a weights file, loading it on first use."""
+        key = self._key(model_path)
+
+        loaded = self._models.get(key)
+        if loaded is None:
+            with self._lock:
+                load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+            # Only one thread loads a given file; the others wait for it
+            with load_lock:
+                loaded = self._models.get(key)
+                if loaded is None:
+                    loaded = self._load(key)
+                    self._models[key] = loaded
+
+        loaded.use_count += 1
+        return loaded
+
+    def _load(self, model_path: str) -> LoadedModel:
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        memory_before = _get_rss_mb()
+        start_time = time.perf_counter()
+        backend = create_backend(model_path)
+        load_time = time.perf_counter() - start_time
+        memory_mb = max(_get_rss_mb() - memory_before, 0.0)
+
+        logger.info(f"Loaded {backend.name} model {model_path} in {load_time:.2f}s (+{memory_mb:.1f} MB)")
+        return LoadedModel(model_path, backend, load_time, memory_mb)
+
+    def get_batcher(self, loaded: LoadedModel) -> InferenceBatcher:
+        """Return the micro-batching scheduler for a loaded model, creating it on first use."""
+        if loaded.batcher is None:
+            with self._lock:
+                if loaded.batcher is None:
+                    loaded.batcher = InferenceBatcher(
+                        loaded,
+                        max_batch_size=DETECTION_BATCH_MAX_SIZE,
+                        max_wait_ms=DETECTION_BATCH_MAX_WAIT_MS
+                    )
+        return loaded.batcher
+
+    def warm(self, model_paths: Iterable[str]) -> List[Dict[str, Any]]:
+        """Load the given models ahead of the first request."""
+        warmed = []
+        for model_path in model_paths:
+            loaded = self.get(model_path)
+            loaded.use_count -= 1  # warming is not a real use
+            warmed.append(loaded.to_dict())
+        return warmed
+
+    def is_loaded(self, model_path: str) -> bool:
+        return self._key(model_path) in self._models
+
+    def unload(self, model_path: str) -> bool:
+        """Drop a model from the registry so the next request reloads it."""
+        with self._lock:
+            return self._models.pop(self._key(model_path), None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        models = [loaded.to_dict() for loaded in list(self._models.values())]
+        return {
+            "loaded_models": len(models),
+            "total_memory_mb": round(sum(m["memory_mb"] for m in models), 1),
+            "process_rss_mb": round(_get_rss_mb(), 1),
+            "models": models
+        }
+
+
+# Global registry instance
+model_registry = ModelRegistry()
@@ -0,0 +1,272 @@
+"""
+Streaming threshold alerts for sensor readings.
+Every committed batch is checked against the alert_thresholds of its sensors:
+a metric beyond its min/max for `debounce` consecutive readings raises an
+alert, which clears once the value has been back inside the limit by
+`hysteresis` for as many readings. The state of every sensor metric is kept in
+memory, so a reading costs a comparison per configured metric; only raise and
+clear transitions are written, to sensor_alert_events, which is also where the
+state is rebuilt from after a restart.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Any
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.models.sensor import SensorAlertEvent
+from app.schemas.sensor import AlertThreshold
+from .sensor_config_cache import sensor_config_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveAlert:
+    """A raised alert that has not cleared yet."""
+
+    __slots__ = ("sensor_config_id", "metric", "direction", "severity", "value", "threshold", "raised_at")
+
+    def __init__(self, sensor_config_id: int, metric: str, direction: str, severity: str,
+                 value: Optional[float], threshold: Optional[float], raised_at: Optional[datetime]):
+        self.sensor_config_id = sensor_config_id
+        self.metric = metric
+        self.direction = direction  # high or low
+        self.severity = severity
+        self.value = value  # latest reading while the alert is active
+        self.threshold = threshold
+        self.raised_at = raised_at
+
+    @property
+    def alert_type(self) -> str:
+        return f"{self.metric}_{self.direction}"
+
+    def describe(self) -> str:
+        position = "above" if self.direction == "high" else "below"
+        return f"{self.metric.replace('_', ' ').capitalize()} {position} {self.threshold} ({self.value})"
+
+
+class _MetricState:
+    __slots__ = ("active", "candidate", "streak", "last_recorded_at")
+
+    def __init__(self, active: Optional[ActiveAlert] = None):
+        self.active = active
+        self.candidate: Optional[str] = None  # direction of a breach still being debounced
+        self.streak = 0  # consecutive readings towards the next transition
+        self.last_recorded_at: Optional[datetime] = None
+
+
+class SensorAlertEngine:
+    """Per-sensor, per-metric alert state machines fed from the ingest path."""
+
+    def __init__(self):
+        self._states: Dict[int, Dict[str, _MetricState]] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.evaluated = 0
+        self.raised = 0
+        self.cleared = 0
+        self.skipped_late = 0
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _restore(self, db: Session, config_ids: Iterable[int]):
+        """Rebuild the active alerts of sensors not seen yet from their last persisted transitions."""
+        with self._lock:
+            missing = [config_id for config_id in set(config_ids) if config_id not in self._states]
+        if not missing:
+            return
+
+        last_ids = db.query(func.max(SensorAlertEvent.id)).filter(
+            SensorAlertEvent.sensor_config_id.in_(missing)
+        ).group_by(SensorAlertEvent.sensor_config_id, SensorAlertEvent.metric)
+        restored: Dict[int, Dict[str, _MetricState]] = {config_id: {} for config_id in missing}
+        for event in db.query(SensorAlertEvent).filter(SensorAlertEvent.id.in_(last_ids.scalar_subquery())):
+            active = None
+            if event.transition == "raised":
+                active = ActiveAlert(
+                    event.sensor_config_id, event.metric, event.alert_type.rsplit("_", 1)[-1],
+                    event.severity, event.value, event.threshold, event.recorded_at
+                )
+            restored[event.sensor_config_id][event.metric] = _MetricState(active)
+
+        with self._lock:
+            for config_id, states in restored.items():
+                self._states.setdefault(config_id, states)
+
+    @staticmethod
+    def _event(alert: ActiveAlert, transition: str, value: Optional[float],
+               recorded_at: Optional[datetime]) -> Dict[str, Any]:
+        return {
+            "sensor_config_id": alert.sensor_config_id,
+            "metric": alert.metric,
+            "alert_type": alert.alert_type,
+            "transition": transition,
+            "severity": alert.severity,
+            "value": value,
+            "threshold": alert.threshold,
+            "recorded_at": recorded_at
+        }
+
+    def _step(self, config_id: int, metric: str, rule: AlertThreshold, state: _MetricState,
+              value: float, recorded_at: datetime) -> Optional[Dict[str, Any]]:
+        """Advance one metric's state machine by one reading; returns a transition, if any."""
+        alert = state.active
+        if alert is None:
+            if rule.max is not None and value > rule.max:
+                direction, threshold = "high", rule.max
+            elif rule.min is not None and value < rule.min:
+                direction, threshold = "low", rule.min
+            else:
+                state.candidate = None
+                state.streak = 0
+                return None
+
+            if state.candidate != direction:
+                state.candidate = direction
+                state.streak = 0
+            state.streak += 1
+            if state.streak < rule.debounce:
+                return None
+
+            state.active = ActiveAlert(
+                config_id, metric, direction, rule.severity.value, value, threshold, recorded_at
+            )
+            state.candidate = None
+            state.streak = 0
+            self.raised += 1
+            return self._event(state.active, "raised", value, recorded_at)
+
+        alert.value = value
+        if alert.direction == "high":
+            recovered = rule.max is None or value <= rule.max - rule.hysteresis
+        else:
+            recovered = rule.min is None or value >= rule.min + rule.hysteresis
+        if not recovered:
+            state.streak = 0
+            return None
+
+        state.streak += 1
+        if state.streak < rule.debounce:
+            return None
+
+        state.active = None
+        state.streak = 0
+        self.cleared += 1
+        return self._event(alert, "cleared", value, recorded_at)
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def evaluate(self, db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run committed sensor_data rows through the alert rules and persist any transitions.
+
+        Readings older than the last one evaluated for the same metric
+        (backfills, late batches) are skipped so they can't flap live alerts.
+        """
+        config_ids = {row.get("sensor_config_id") for row in rows}
+        config_ids.discard(None)
+        if not config_ids:
+            return []
+        configs = sensor_config_cache.get_many_by_id(db, config_ids)
+        self._restore(db, config_ids)
+
+        events = []
+        with self._lock:
+            for row in rows:
+                config_id = row.get("sensor_config_id")
+                config = configs.get(config_id)
+                if config is None or not config.alert_thresholds:
+                    continue
+                states = self._states.setdefault(config_id, {})
+                recorded_at = row.get("recorded_at")
+
+                for metric, rule in config.alert_thresholds.items():
+                    value = row.get(metric)
+                    if value is None:
+                        continue
+                    state = states.get(metric)
+                    if state is None:
+                        state = states[metric] = _MetricState()
+                    if state.last_recorded_at is not None and recorded_at is not None and recorded_at < state.last_recorded_at:
+                        self.skipped_late += 1
+                        continue
+                    state.last_recorded_at = recorded_at
+                    event = self._step(config_id, metric, rule, state, value, recorded_at)
+                    if event is not None:
+                        events.append(event)
+                self.evaluated += 1
+
+            # Alerts whose threshold was removed (or whose sensor was deactivated) clear
+            for config_id in config_ids:
+                config = configs.get(config_id)
+                rules = config.alert_thresholds if config is not None and config.is_active else {}
+                for metric, state in self._states.get(config_id, {}).items():
+                    if state.active is not None and metric not in rules:
+                        events.append(self._event(state.active, "cleared", None, None))
+                        state.active = None
+                        self.cleared += 1
+
+        if events:
+            try:
+                db.execute(insert(SensorAlertEvent), events)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to persist {len(events)} sensor alert transitions: {str(e)}")
+        return events
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    def active_alerts(self, db: Session, config_ids: Iterable[int]) -> List[ActiveAlert]:
+        """Currently active alerts of the given sensors, most recently raised first."""
+        config_ids = list(config_ids)
+        self._restore(db, config_ids)
+        with self._lock:
+            alerts = [
+                state.active
+                for config_id in config_ids
+                for state in self._states.get(config_id, {}).values()
+                if state.active is not None
+            ]
+        return sorted(alerts, key=lambda alert: alert.raised_at or datetime.min, reverse=True)
+
+    def active_counts(self, db: Session, config_ids: Iterable[int]) -> Dict[int, int]:
+        config_ids = list(config_ids)
+        counts = {config_id: 0 for config_id in config_ids}
+        for alert in self.active_alerts(db, config_ids):
+            counts[alert.sensor_config_id] += 1
+        return counts
+
+    def forget(self, sensor_config_id: Optional[int] = None):
+        """Drop in-memory state for one sensor (or all) so it is rebuilt from sensor_alert_events."""
+        with self._lock:
+            if sensor_config_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(sensor_config_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sensors_tracked": len(self._states),
+                "active_alerts": sum(
+                    state.active is not None for states in self._states.values() for state in states.values()
+                ),
+                "readings_evaluated": self.evaluated,
+                "raised": self.raised,
+                "cleared": self.cleared,
+                "skipped_late": self.skipped_late
+            }
+
+
+# Global alert engine instance
+sensor_alert_engine = SensorAlertEngine()
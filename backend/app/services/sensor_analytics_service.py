@@ -0,0 +1,171 @@
+"""
+Vectorized statistics over a window of sensor readings.
+A window is read once into NumPy arrays (archive blocks and sensor_data
+merged by sensor_archive_service.read_columns). Everything after that is
+array arithmetic per metric, with no Python loop over readings:
+descriptive statistics and percentiles, a least-squares trend, trailing
+rolling mean/std and rolling z-scores for anomalies.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .sensor_archive_service import sensor_archive_service, micros_to_datetimes
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_METRICS = ["temperature", "humidity", "soil_moisture", "water_level"]
+PERCENTILES = (10, 50, 90)
+ROLLING_WINDOW = 24  # readings; two hours at the ESP32's 5-minute interval
+# About one false positive every two days on pure Gaussian noise at this window
+ANOMALY_Z = 4.0
+# A fitted change over the window smaller than this share of the scatter
+# around the fit is reported as "stable"
+TREND_MIN_CHANGE = 0.5
+_MICROS_PER_HOUR = 3600 * 1e6
+
+
+def rolling_stats(values: np.ndarray, window: int = ROLLING_WINDOW):
+    """Trailing mean and std over the last `window` values (fewer at the start), via cumulative sums."""
+    count = len(values)
+    if count == 0:
+        return np.empty(0), np.empty(0)
+    # Centered first so the running sum of squares doesn't lose precision
+    centered = values - values.mean()
+    sums = np.concatenate(([0.0], np.cumsum(centered)))
+    squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    ends = np.arange(1, count + 1)
+    starts = np.maximum(ends - window, 0)
+    sizes = ends - starts
+    means = (sums[ends] - sums[starts]) / sizes
+    variances = np.maximum((squares[ends] - squares[starts]) / sizes - means * means, 0.0)
+    return means + values.mean(), np.sqrt(variances)
+
+
+def rolling_zscores(values: np.ndarray, window: int = ROLLING_WINDOW, min_periods: int = 3) -> np.ndarray:
+    """
+    How far each value is from the rolling mean of the readings before it, in
+    rolling standard deviations. A spike can't inflate its own baseline this way.
+    """
+    count = len(values)
+    scores = np.zeros(count)
+    if count <= min_periods:
+        return scores
+    means, stds = rolling_stats(values, window)
+    # A flat stretch would make any change infinitely anomalous; floor the
+    # spread at a tenth of the window's overall spread
+    floor = 0.1 * values.std()
+    if floor == 0:
+        return scores
+    previous_means = means[:-1]
+    previous_stds = np.maximum(stds[:-1], floor)
+    scores[1:] = (values[1:] - previous_means) / previous_stds
+    scores[:min_periods] = 0.0
+    return scores
+
+
+def linear_trend(hours: np.ndarray, values: np.ndarray):
+    """Least-squares slope (units per hour) and the std of the residuals around the fit."""
+    if len(values) < 2:
+        return 0.0, 0.0
+    x = hours - hours.mean()
+    spread = np.dot(x, x)
+    if spread == 0:
+        return 0.0, float(values.std())
+    slope = np.dot(x, values - values.mean()) / spread
+    residuals = values - (values.mean() + slope * x)
+    return float(slope), float(residuals.std())
+
+
+def _round(value: float, digits: int = 3) -> float:
+    return round(float(value), digits)
+
+
+def metric_statistics(recorded_at: np.ndarray, values: np.ndarray,
+                      window: int = ROLLING_WINDOW) -> Optional[Dict[str, Any]]:
+    """Statistics of one metric; `recorded_at` is epoch microseconds, NaN values are skipped."""
+    present = ~np.isnan(values)
+    values = values[present]
+    if len(values) == 0:
+        return None
+    hours = (recorded_at[present] - recorded_at[present][0]) / _MICROS_PER_HOUR
+
+    slope, scatter = linear_trend(hours, values)
+    change = slope * float(hours[-1])
+    if len(values) < 3 or abs(change) <= TREND_MIN_CHANGE * scatter:
+        trend = "stable"
+    else:
+        trend = "increasing" if change > 0 else "decreasing"
+
+    rolling_means, rolling_stds = rolling_stats(values, window)
+    scores = rolling_zscores(values, window)
+    anomalies = np.flatnonzero(np.abs(scores) >= ANOMALY_Z)
+    percentiles = np.percentile(values, PERCENTILES)
+
+    return {
+        "count": int(len(values)),
+        "current": _round(values[-1]),
+        "mean": _round(values.mean()),
+        "std": _round(values.std()),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+        "percentiles": {f"p{p}": _round(value) for p, value in zip(PERCENTILES, percentiles)},
+        "slope_per_hour": _round(slope, 4),
+        "change": _round(change),
+        "trend": trend,
+        "rolling_mean": _round(rolling_means[-1]),
+        "rolling_std": _round(rolling_stds[-1]),
+        "current_zscore": _round(scores[-1], 2),
+        "anomalies": int(len(anomalies)),
+        "last_anomaly_at": (
+            micros_to_datetimes(recorded_at[present][anomalies[-1:]])[0] if len(anomalies) else None
+        )
+    }
+
+
+class SensorAnalyticsService:
+    """Loads a window of readings as arrays and summarizes each metric."""
+
+    def analyze(self, columns: Dict[str, np.ndarray], metrics: Optional[List[str]] = None,
+                window: int = ROLLING_WINDOW) -> Dict[str, Dict[str, Any]]:
+        """Statistics per metric for arrays shaped like read_columns' result."""
+        recorded_at = columns["recorded_at"]
+        results = {}
+        for metric in metrics or ANALYTICS_METRICS:
+            stats = metric_statistics(recorded_at, columns[metric], window)
+            if stats is not None:
+                results[metric] = stats
+        return results
+
+    def window(self, db: Session, start: datetime, end: datetime,
+               sensor_config_id: Optional[int] = None,
+               metrics: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Statistics over [start, end] for one sensor, or every sensor's readings
+        together when sensor_config_id is None. None when there are no readings.
+        """
+        metrics = metrics or ANALYTICS_METRICS
+        columns = sensor_archive_service.read_columns(db, start, end, sensor_config_id, metrics)
+        recorded_at = columns["recorded_at"]
+        if len(recorded_at) == 0:
+            return None
+        first, last = micros_to_datetimes(recorded_at[[0, -1]])
+        return {
+            "readings": int(len(recorded_at)),
+            "first_recorded_at": first,
+            "last_recorded_at": last,
+            "metrics": self.analyze(columns, metrics)
+        }
+
+    def recent(self, db: Session, hours: int = 24, sensor_config_id: Optional[int] = None,
+               metrics: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Statistics over the last `hours` hours."""
+        end = datetime.now()
+        return self.window(db, end - timedelta(hours=hours), end, sensor_config_id, metrics)
+
+
+# Global analytics service instance
+sensor_analytics_service = SensorAnalyticsService()
@@ -0,0 +1,421 @@
+"""
+Columnar archive tier for raw sensor readings.
+Readings older than IOT_ARCHIVE_AFTER_DAYS are moved out of sensor_data into
+one block per sensor per day: timestamps and ids are delta-encoded, numeric
+columns kept as float64 (NaN for missing), string columns dictionary-encoded,
+every fixed-width array byte-shuffled and the whole block zlib-compressed.
+Readers merge the blocks with the rows still in sensor_data, so range queries
+don't care where a reading lives.
+"""
+
+import json
+import zlib
+import struct
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Float, DateTime, func, select
+from sqlalchemy.orm import Session
+
+from app.models.sensor import SensorData, SensorArchiveBlock
+from app.core.config import IOT_ARCHIVE_AFTER_DAYS
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# How each sensor_data column is stored in a block; sensor_config_id lives on the block row
+_TABLE_COLUMNS = SensorData.__table__.columns
+TIME_COLUMNS = [column.name for column in _TABLE_COLUMNS if isinstance(column.type, DateTime)]
+FLOAT_COLUMNS = [column.name for column in _TABLE_COLUMNS if isinstance(column.type, Float)]
+STRING_COLUMNS = [
+    column.name for column in _TABLE_COLUMNS
+    if column.name not in TIME_COLUMNS + FLOAT_COLUMNS + ["id", "sensor_config_id"]
+]
+
+# Raw rows deleted per statement when archiving (stays under SQLite's bound-parameter limit)
+DELETE_CHUNK_SIZE = 500
+
+
+def _to_micros(timestamps: Iterable[datetime]) -> np.ndarray:
+    return np.array([(timestamp - _EPOCH) // _MICROSECOND for timestamp in timestamps], dtype=np.int64)
+
+
+def micros_to_datetimes(micros: np.ndarray) -> List[datetime]:
+    return micros.astype("datetime64[us]").tolist()
+
+
+def _shuffle(array: np.ndarray) -> bytes:
+    """Group the bytes of fixed-width values by significance; slowly changing data then compresses far better."""
+    return array.view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+
+
+def _unshuffle(buffer: bytes, dtype, count: int) -> np.ndarray:
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(itemsize, count).T.copy().view(dtype).ravel()
+
+
+def encode_block(rows: List[Dict[str, Any]]) -> bytes:
+    """
+    Encode sensor_data rows (dicts, sorted by recorded_at) into a compressed block.
+
+    Layout before compression: 4-byte little-endian header length, JSON header
+    describing the columns, then each column's array in header order.
+    Columns that are None in every row are left out.
+    """
+    count = len(rows)
+    columns = []
+    arrays = []
+
+    for name in ["id"] + TIME_COLUMNS:
+        values = [row.get(name) for row in rows]
+        if name == "received_at":
+            values = [value or row["recorded_at"] for value, row in zip(values, rows)]
+        raw = np.array(values, dtype=np.int64) if name == "id" else _to_micros(values)
+        columns.append({"name": name, "kind": "delta"})
+        arrays.append(_shuffle(np.diff(raw, prepend=0)))
+
+    for name in FLOAT_COLUMNS:
+        values = [row.get(name) for row in rows]
+        if all(value is None for value in values):
+            continue
+        columns.append({"name": name, "kind": "float"})
+        arrays.append(_shuffle(np.array([np.nan if value is None else value for value in values], dtype=np.float64)))
+
+    for name in STRING_COLUMNS:
+        values = [row.get(name) for row in rows]
+        if all(value is None for value in values):
+            continue
+        dictionary = list(dict.fromkeys(values))
+        codes = {value: code for code, value in enumerate(dictionary)}
+        columns.append({"name": name, "kind": "dict", "values": dictionary})
+        arrays.append(_shuffle(np.array([codes[value] for value in values], dtype=np.uint16)))
+
+    header = json.dumps({"version": FORMAT_VERSION, "count": count, "columns": columns}).encode("utf-8")
+    return zlib.compress(struct.pack("<I", len(header)) + header + b"".join(arrays), 6)
+
+
+def decode_block(data: bytes, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Decode a block into column arrays: id and times as int64 (times in epoch
+    microseconds), numeric columns as float64 with NaN for missing, strings as
+    object arrays. Only `columns` are materialized when given.
+    """
+    payload = zlib.decompress(data)
+    header_length = struct.unpack_from("<I", payload)[0]
+    header = json.loads(payload[4:4 + header_length])
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported archive block version: {header['version']}")
+
+    count = header["count"]
+    wanted = set(columns) if columns is not None else None
+    offset = 4 + header_length
+    decoded: Dict[str, np.ndarray] = {}
+    for column in header["columns"]:
+        dtype = np.uint16 if column["kind"] == "dict" else (np.int64 if column["kind"] == "delta" else np.float64)
+        size = np.dtype(dtype).itemsize * count
+        name = column["name"]
+        if wanted is None or name in wanted:
+            values = _unshuffle(payload[offset:offset + size], dtype, count)
+            if column["kind"] == "delta":
+                values = np.cumsum(values)
+            elif column["kind"] == "dict":
+                values = np.array(column["values"], dtype=object)[values]
+            decoded[name] = values
+        offset += size
+
+    # Columns that were all-None when the block was written
+    for name in wanted if wanted is not None else FLOAT_COLUMNS + STRING_COLUMNS:
+        if name not in decoded:
+            decoded[name] = np.full(count, np.nan) if name in FLOAT_COLUMNS else np.full(count, None, dtype=object)
+    return decoded
+
+
+def _decoded_rows(decoded: Dict[str, np.ndarray], sensor_config_id: int, mask: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Turn decoded block columns back into sensor_data row dicts."""
+    if mask is not None:
+        decoded = {name: values[mask] for name, values in decoded.items()}
+    count = len(decoded["id"])
+    columns = {"sensor_config_id": [sensor_config_id] * count}
+    for name, values in decoded.items():
+        if name in TIME_COLUMNS:
+            columns[name] = micros_to_datetimes(values)
+        elif name in FLOAT_COLUMNS:
+            columns[name] = [None if np.isnan(value) else value for value in values.tolist()]
+        else:
+            columns[name] = values.tolist()
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+
+class SensorArchiveService:
+    """Moves old readings into archive blocks and reads ranges across blocks and sensor_data."""
+
+    # ------------------------------------------------------------------
+    # Archiving
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _raw_rows(db: Session, sensor_config_id: int, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        return [
+            dict(row) for row in db.execute(
+                select(SensorData.__table__).where(
+                    SensorData.sensor_config_id == sensor_config_id,
+                    SensorData.recorded_at >= start,
+                    SensorData.recorded_at < end
+                ).order_by(SensorData.recorded_at, SensorData.id)
+            ).mappings()
+        ]
+
+    def archive_day(self, db: Session, sensor_config_id: int, day: datetime) -> int:
+        """
+        Move one sensor's readings for one day into its archive block and commit.
+
+        Rows that arrive for an already archived day are merged into the
+        existing block. Returns the number of readings moved.
+        """
+        day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = self._raw_rows(db, sensor_config_id, day, day + timedelta(days=1))
+        if not rows:
+            return 0
+
+        block = db.query(SensorArchiveBlock).filter(
+            SensorArchiveBlock.sensor_config_id == sensor_config_id,
+            SensorArchiveBlock.day == day
+        ).first()
+        combined = rows
+        if block is not None:
+            combined = _decoded_rows(decode_block(block.data), sensor_config_id) + rows
+            combined.sort(key=lambda row: (row["recorded_at"], row["id"]))
+        else:
+            block = SensorArchiveBlock(sensor_config_id=sensor_config_id, day=day)
+            db.add(block)
+
+        block.format_version = FORMAT_VERSION
+        block.row_count = len(combined)
+        block.first_recorded_at = combined[0]["recorded_at"]
+        block.last_recorded_at = combined[-1]["recorded_at"]
+        block.data = encode_block(combined)
+
+        # Block write and raw delete commit together, so a reading is never in both or neither
+        ids = [row["id"] for row in rows]
+        for index in range(0, len(ids), DELETE_CHUNK_SIZE):
+            db.query(SensorData).filter(
+                SensorData.id.in_(ids[index:index + DELETE_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        db.commit()
+        return len(rows)
+
+    def pending_days(self, db: Session, older_than: datetime,
+                     sensor_config_id: Optional[int] = None) -> List[Tuple[int, datetime, int]]:
+        """(sensor_config_id, day, readings) for every whole day before older_than still in sensor_data."""
+        cutoff = older_than.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_expr = func.date(SensorData.recorded_at)
+        query = db.query(SensorData.sensor_config_id, day_expr, func.count(SensorData.id)).filter(
+            SensorData.recorded_at < cutoff,
+            SensorData.sensor_config_id.isnot(None)
+        )
+        if sensor_config_id is not None:
+            query = query.filter(SensorData.sensor_config_id == sensor_config_id)
+        return [
+            (config_id, datetime.fromisoformat(day), count)
+            for config_id, day, count in query.group_by(SensorData.sensor_config_id, day_expr).order_by(day_expr)
+        ]
+
+    def archive(self, db: Session, older_than_days: int = IOT_ARCHIVE_AFTER_DAYS,
+                sensor_config_id: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """Archive every whole day older than `older_than_days`, one committed block at a time."""
+        days = self.pending_days(db, datetime.now() - timedelta(days=older_than_days), sensor_config_id)
+        moved = 0
+        if not dry_run:
+            for config_id, day, _ in days:
+                moved += self.archive_day(db, config_id, day)
+            logger.info(f"Archived {moved} sensor readings into {len(days)} blocks")
+        return {
+            "blocks": len(days),
+            "readings": sum(count for _, _, count in days),
+            "moved": moved,
+            "dry_run": dry_run
+        }
+
+    def archived_keys(self, db: Session, keys: Iterable[Tuple[int, datetime]]) -> Set[Tuple[int, datetime]]:
+        """
+        The (sensor_config_id, recorded_at) keys that are already in an archive block.
+
+        sensor_data's unique index can't see readings that were moved out, so
+        late arrivals for past days are checked here. Readings from today
+        never have a block, so live ingest doesn't query at all.
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        by_block: Dict[Tuple[int, datetime], List[Tuple[int, datetime]]] = {}
+        for config_id, recorded_at in keys:
+            if config_id is not None and recorded_at is not None and recorded_at < today:
+                day = recorded_at.replace(hour=0, minute=0, second=0, microsecond=0)
+                by_block.setdefault((config_id, day), []).append((config_id, recorded_at))
+        if not by_block:
+            return set()
+
+        found = set()
+        blocks = db.query(SensorArchiveBlock).filter(
+            SensorArchiveBlock.sensor_config_id.in_({config_id for config_id, _ in by_block}),
+            SensorArchiveBlock.day.in_({day for _, day in by_block})
+        )
+        for block in blocks:
+            candidates = by_block.get((block.sensor_config_id, block.day))
+            if not candidates:
+                continue
+            archived = decode_block(block.data, ["recorded_at"])["recorded_at"]
+            present = np.isin(_to_micros(recorded_at for _, recorded_at in candidates), archived)
+            found.update(key for key, is_present in zip(candidates, present) if is_present)
+        return found
+
+    def deduplicate(self, db: Session, sensor_config_id: Optional[int] = None) -> List[Tuple[int, datetime, int]]:
+        """
+        Drop repeated recorded_at values inside archive blocks, keeping the
+        first stored reading, and commit. Returns (sensor_config_id, day,
+        readings removed) for every block that changed.
+        """
+        blocks = db.query(SensorArchiveBlock)
+        if sensor_config_id is not None:
+            blocks = blocks.filter(SensorArchiveBlock.sensor_config_id == sensor_config_id)
+
+        changed = []
+        for block in blocks:
+            if len(np.unique(decode_block(block.data, ["recorded_at"])["recorded_at"])) == block.row_count:
+                continue
+            rows, seen = [], set()
+            for row in _decoded_rows(decode_block(block.data), block.sensor_config_id):
+                if row["recorded_at"] not in seen:
+                    seen.add(row["recorded_at"])
+                    rows.append(row)
+            changed.append((block.sensor_config_id, block.day, block.row_count - len(rows)))
+            block.row_count = len(rows)
+            block.data = encode_block(rows)
+        db.commit()
+        return changed
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        blocks, readings, size = db.query(
+            func.count(SensorArchiveBlock.id),
+            func.coalesce(func.sum(SensorArchiveBlock.row_count), 0),
+            func.coalesce(func.sum(func.length(SensorArchiveBlock.data)), 0)
+        ).one()
+        return {
+            "blocks": blocks,
+            "readings": readings,
+            "bytes": size,
+            "bytes_per_reading": round(size / readings, 2) if readings else 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _blocks(db: Session, start: datetime, end: datetime, sensor_config_id: Optional[int] = None,
+                sensor_config_ids: Optional[List[int]] = None) -> List[SensorArchiveBlock]:
+        query = db.query(SensorArchiveBlock).filter(
+            SensorArchiveBlock.day >= start.replace(hour=0, minute=0, second=0, microsecond=0),
+            SensorArchiveBlock.day <= end
+        )
+        if sensor_config_id is not None:
+            query = query.filter(SensorArchiveBlock.sensor_config_id == sensor_config_id)
+        if sensor_config_ids is not None:
+            query = query.filter(SensorArchiveBlock.sensor_config_id.in_(sensor_config_ids))
+        return query.order_by(SensorArchiveBlock.day).all()
+
+    @staticmethod
+    def _range_mask(recorded_at: np.ndarray, start: datetime, end: datetime) -> np.ndarray:
+        start_us, end_us = _to_micros([start, end])
+        return (recorded_at >= start_us) & (recorded_at <= end_us)
+
+    def read_columns(self, db: Session, start: datetime, end: datetime,
+                     sensor_config_id: Optional[int] = None,
+                     columns: Optional[List[str]] = None,
+                     sensor_config_ids: Optional[List[int]] = None) -> Dict[str, np.ndarray]:
+        """
+        Numeric columns over [start, end] from archive blocks and sensor_data, sorted by time.
+
+        Returns "recorded_at" (epoch microseconds, int64) plus one float64
+        array per requested column, NaN where a reading has no value.
+        sensor_config_ids limits the read to a set of sensors.
+        """
+        columns = columns or FLOAT_COLUMNS
+        parts = []
+        for block in self._blocks(db, start, end, sensor_config_id, sensor_config_ids):
+            decoded = decode_block(block.data, ["recorded_at"] + columns)
+            mask = self._range_mask(decoded["recorded_at"], start, end)
+            parts.append({name: values[mask] for name, values in decoded.items()})
+
+        query = db.query(SensorData.recorded_at, *(getattr(SensorData, column) for column in columns)).filter(
+            SensorData.recorded_at >= start,
+            SensorData.recorded_at <= end
+        )
+        if sensor_config_id is not None:
+            query = query.filter(SensorData.sensor_config_id == sensor_config_id)
+        if sensor_config_ids is not None:
+            query = query.filter(SensorData.sensor_config_id.in_(sensor_config_ids))
+        records = query.order_by(SensorData.recorded_at).all()
+        hot = {"recorded_at": _to_micros(record[0] for record in records)}
+        for index, column in enumerate(columns, 1):
+            # None becomes NaN
+            hot[column] = np.array([record[index] for record in records], dtype=np.float64)
+        parts.append(hot)
+
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in hot}
+        if len(parts) > 1:
+            order = np.argsort(merged["recorded_at"], kind="stable")
+            merged = {name: values[order] for name, values in merged.items()}
+        return merged
+
+    def read_rows(self, db: Session, start: datetime, end: datetime,
+                  sensor_config_id: Optional[int] = None, limit: Optional[int] = None,
+                  newest_first: bool = False) -> List[Dict[str, Any]]:
+        """Full readings (sensor_data row dicts) over [start, end] from archive blocks and sensor_data."""
+        query = db.query(SensorData).filter(
+            SensorData.recorded_at >= start,
+            SensorData.recorded_at <= end
+        )
+        if sensor_config_id is not None:
+            query = query.filter(SensorData.sensor_config_id == sensor_config_id)
+        query = query.order_by(SensorData.recorded_at.desc() if newest_first else SensorData.recorded_at)
+        if limit is not None:
+            query = query.limit(limit)
+        names = [column.name for column in _TABLE_COLUMNS]
+        rows = [{name: getattr(row, name) for name in names} for row in query]
+
+        blocks = self._blocks(db, start, end, sensor_config_id)
+        for block in blocks:
+            decoded = decode_block(block.data)
+            rows.extend(_decoded_rows(decoded, block.sensor_config_id, self._range_mask(decoded["recorded_at"], start, end)))
+        if blocks:
+            rows.sort(key=lambda row: row["recorded_at"], reverse=newest_first)
+        return rows[:limit] if limit is not None else rows
+
+    def iter_archived_rows(self, db: Session, sensor_config_id: Optional[int] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the archived readings block by block (used to rebuild rollups)."""
+        query = db.query(SensorArchiveBlock)
+        if sensor_config_id is not None:
+            query = query.filter(SensorArchiveBlock.sensor_config_id == sensor_config_id)
+        if start is not None:
+            query = query.filter(SensorArchiveBlock.day >= start.replace(hour=0, minute=0, second=0, microsecond=0))
+        if end is not None:
+            query = query.filter(SensorArchiveBlock.day < end)
+        for block in query.order_by(SensorArchiveBlock.day).yield_per(50):
+            decoded = decode_block(block.data)
+            mask = np.ones(block.row_count, dtype=bool)
+            if start is not None:
+                mask &= decoded["recorded_at"] >= _to_micros([start])[0]
+            if end is not None:
+                mask &= decoded["recorded_at"] < _to_micros([end])[0]
+            yield _decoded_rows(decoded, block.sensor_config_id, mask)
+
+
+# Global archive service instance
+sensor_archive_service = SensorArchiveService()
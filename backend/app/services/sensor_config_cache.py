@@ -0,0 +1,166 @@
+"""
+In-memory lookup cache for sensor configurations.
+Ingest resolves a device's sensor_id to its config id, active flag and
+calibration offset without querying sensor_configs on every reading. Entries
+are invalidated when a config is changed through the API and also expire
+after a TTL, so changes made by other workers are picked up.
+"""
+
+import json
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Any, Tuple
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.models.sensor import SensorConfig
+from app.schemas.sensor import AlertThreshold, validate_alert_metrics
+from app.core.config import IOT_SENSOR_CONFIG_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Reading column the single calibration_offset applies to, by sensor type
+CALIBRATED_FIELD_BY_TYPE = {
+    "DHT22": "temperature",
+    "GY30": "light_intensity",
+    "SOIL_MOISTURE": "soil_moisture",
+    "WATER_LEVEL": "water_level",
+    "MULTI": "temperature"
+}
+
+
+class CachedSensorConfig:
+    """The subset of a SensorConfig needed on the ingest path."""
+
+    __slots__ = ("id", "sensor_id", "sensor_type", "user_id", "is_active", "calibration_offset", "alert_thresholds")
+
+    def __init__(self, config: SensorConfig):
+        self.id = config.id
+        self.sensor_id = config.sensor_id
+        self.sensor_type = config.sensor_type
+        self.user_id = config.user_id
+        self.is_active = bool(config.is_active)
+        self.calibration_offset = config.calibration_offset or 0.0
+        self.alert_thresholds = self._parse_thresholds(config)
+
+    @staticmethod
+    def _parse_thresholds(config: SensorConfig) -> Dict[str, AlertThreshold]:
+        """Parse the alert_thresholds JSON once per cache fill; invalid settings disable alerting."""
+        if not config.alert_thresholds:
+            return {}
+        try:
+            thresholds = {
+                metric: AlertThreshold(**limits)
+                for metric, limits in json.loads(config.alert_thresholds).items()
+            }
+            return validate_alert_metrics(thresholds)
+        except (ValueError, TypeError, AttributeError, ValidationError) as e:
+            logger.warning(f"Ignoring invalid alert_thresholds for sensor {config.sensor_id}: {str(e)}")
+            return {}
+
+    def apply_calibration(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the calibration offset to the reading column this sensor type measures."""
+        field = CALIBRATED_FIELD_BY_TYPE.get(self.sensor_type)
+        if field and self.calibration_offset and row.get(field) is not None:
+            row[field] = row[field] + self.calibration_offset
+        return row
+
+
+class SensorConfigCache:
+    """TTL cache of sensor configs keyed by device sensor_id and by config id."""
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._by_sensor_id: Dict[str, Tuple[Optional[CachedSensorConfig], float]] = {}
+        self._by_config_id: Dict[int, Tuple[Optional[CachedSensorConfig], float]] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, index: Dict, keys: Iterable) -> Tuple[Dict, list]:
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entry = index.get(key)
+                if entry is not None and entry[1] > now:
+                    found[key] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+                    self.misses += 1
+        return found, missing
+
+    def _store(self, configs: Iterable[SensorConfig], missing_sensor_ids=(), missing_config_ids=()):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            # Unknown devices are cached too, so a misconfigured fleet can't hammer the database
+            for sensor_id in missing_sensor_ids:
+                self._by_sensor_id[sensor_id] = (None, expires_at)
+            for config_id in missing_config_ids:
+                self._by_config_id[config_id] = (None, expires_at)
+            for config in configs:
+                cached = CachedSensorConfig(config)
+                self._by_sensor_id[cached.sensor_id] = (cached, expires_at)
+                self._by_config_id[cached.id] = (cached, expires_at)
+
+    def get_many(self, db: Session, sensor_ids: Iterable[str]) -> Dict[str, Optional[CachedSensorConfig]]:
+        """Resolve device ids, loading all cache misses with a single query."""
+        found, missing = self._lookup(self._by_sensor_id, set(sensor_ids))
+        if missing:
+            configs = db.query(SensorConfig).filter(SensorConfig.sensor_id.in_(missing)).all()
+            self._store(configs, missing_sensor_ids=missing)
+            loaded = {config.sensor_id: CachedSensorConfig(config) for config in configs}
+            for sensor_id in missing:
+                found[sensor_id] = loaded.get(sensor_id)
+        return found
+
+    def get_many_by_id(self, db: Session, config_ids: Iterable[int]) -> Dict[int, Optional[CachedSensorConfig]]:
+        """Resolve sensor_configs primary keys, loading all cache misses with a single query."""
+        found, missing = self._lookup(self._by_config_id, set(config_ids))
+        if missing:
+            configs = db.query(SensorConfig).filter(SensorConfig.id.in_(missing)).all()
+            self._store(configs, missing_config_ids=missing)
+            loaded = {config.id: CachedSensorConfig(config) for config in configs}
+            for config_id in missing:
+                found[config_id] = loaded.get(config_id)
+        return found
+
+    def get(self, db: Session, sensor_id: str) -> Optional[CachedSensorConfig]:
+        return self.get_many(db, [sensor_id]).get(sensor_id)
+
+    def invalidate(self, sensor_id: Optional[str] = None):
+        """Drop one device's entry (or everything) after its config changed."""
+        with self._lock:
+            self.invalidations += 1
+            if sensor_id is None:
+                self._by_sensor_id.clear()
+                self._by_config_id.clear()
+                return
+            entry = self._by_sensor_id.pop(sensor_id, None)
+            if entry is not None and entry[0] is not None:
+                self._by_config_id.pop(entry[0].id, None)
+            # A newly created config may have been cached as unknown by id
+            self._by_config_id = {
+                config_id: cached for config_id, cached in self._by_config_id.items()
+                if cached[0] is not None
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._by_sensor_id),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+# Global cache instance
+sensor_config_cache = SensorConfigCache(ttl_seconds=IOT_SENSOR_CONFIG_CACHE_TTL)
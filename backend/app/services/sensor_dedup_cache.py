@@ -0,0 +1,82 @@
+"""
+Recently seen reading keys for duplicate rejection at ingest.
+A reading is identified by (sensor_config_id, recorded_at). Devices that
+retry after a timeout resend the same reading, so the keys of recently
+accepted readings are kept in a bounded LRU: a retry is acknowledged without
+touching the journal or the database. The unique index on sensor_data stays
+the authority; this only makes the common case cheap.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Any, Tuple
+
+from app.core.config import IOT_DEDUP_CACHE_SIZE
+
+ReadingKey = Tuple[int, datetime]
+
+
+def reading_key(row: Dict[str, Any]) -> ReadingKey:
+    return row["sensor_config_id"], row["recorded_at"]
+
+
+class SensorDedupCache:
+    """LRU set of (sensor_config_id, recorded_at) keys with duplicate counters."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[ReadingKey, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.cache_duplicates = 0
+        self.insert_duplicates = 0
+        self.evictions = 0
+
+    def seen(self, key: ReadingKey) -> bool:
+        """Whether the key was accepted recently; counts a duplicate when it was."""
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            self.cache_duplicates += 1
+            return True
+
+    def add(self, keys: Iterable[ReadingKey]):
+        with self._lock:
+            for key in keys:
+                self._keys[key] = None
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, keys: Iterable[ReadingKey]):
+        """Forget keys of readings that were acknowledged but never stored, so a resend is accepted."""
+        with self._lock:
+            for key in keys:
+                self._keys.pop(key, None)
+
+    def record_insert_duplicates(self, count: int):
+        """Count readings that got past the cache but were found already stored at insert."""
+        with self._lock:
+            self.insert_duplicates += count
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "max_keys": self.max_keys,
+            "evictions": self.evictions,
+            "cache_duplicates": self.cache_duplicates,
+            "insert_duplicates": self.insert_duplicates,
+            "duplicates_total": self.cache_duplicates + self.insert_duplicates
+        }
+
+
+# Global dedup cache instance
+sensor_dedup_cache = SensorDedupCache(max_keys=IOT_DEDUP_CACHE_SIZE)
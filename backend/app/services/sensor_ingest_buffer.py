@@ -0,0 +1,358 @@
+"""
+Write-behind buffer for sensor readings.
+Readings are appended to an on-disk journal, acknowledged immediately and
+written to sensor_data in batches by a background thread, either when enough
+rows are waiting or after a short interval. Journal segments are deleted only
+after their rows are committed, and any left over after a crash are replayed
+on the next start. A batch that keeps failing is written row by row; rows that
+still fail are moved to a dead-letter file next to the journal (same format,
+rename it to segment-*.jsonl to replay it) so later batches keep flowing.
+"""
+
+import os
+import json
+import time
+import glob
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from app.database import SessionLocal
+from app.core.config import (
+    IOT_INGEST_MAX_PENDING, IOT_INGEST_FLUSH_BATCH_SIZE, IOT_INGEST_FLUSH_INTERVAL,
+    IOT_INGEST_JOURNAL_DIR, IOT_INGEST_JOURNAL_FSYNC, IOT_INGEST_MAX_FLUSH_ATTEMPTS
+)
+from .sensor_ingest_service import sensor_ingest_service
+from .sensor_dedup_cache import sensor_dedup_cache, reading_key
+
+logger = logging.getLogger(__name__)
+
+_DATETIME_FIELDS = ("recorded_at", "received_at")
+
+# Wait before retrying after a failed flush, so a locked database isn't hammered
+RETRY_BACKOFF_SECONDS = 2.0
+
+
+class IngestBufferFullError(Exception):
+    """Raised when the buffer already holds its maximum number of readings."""
+
+
+def _encode_row(row: Dict[str, Any]) -> bytes:
+    encoded = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in row.items()
+    }
+    return (json.dumps(encoded) + "\n").encode("utf-8")
+
+
+def _decode_row(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    for field in _DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = datetime.fromisoformat(row[field])
+    return row
+
+
+class SensorIngestBuffer:
+    """Bounded in-memory queue of readings backed by an append-only journal."""
+
+    def __init__(self, journal_dir: str, max_pending: int = 10000,
+                 flush_batch_size: int = 500, flush_interval: float = 1.0, fsync: bool = False,
+                 max_flush_attempts: int = 5):
+        self.journal_dir = journal_dir
+        self.max_pending = max_pending
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_flush_attempts = max(1, max_flush_attempts)
+
+        self._pending: deque = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._segment_fd: Optional[int] = None
+        self._segment_path: Optional[str] = None
+        self._segment_seq = 0
+        # [rows, journal segments, failed attempts] for batches not written yet
+        self._retry: List[List[Any]] = []
+        self._retry_rows = 0
+        self._next_retry_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        # Metrics
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed_rows = 0
+        self.duplicate_rows = 0  # already stored, e.g. replayed from a segment committed just before a crash
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.replayed_rows = 0
+        self.dead_letter_rows = 0
+        self.last_flush_at: Optional[datetime] = None
+        self.last_flush_rows = 0
+        self.last_flush_latency_ms = 0.0
+        self._total_flush_latency = 0.0
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        self._segment_path = os.path.join(self.journal_dir, f"segment-{self._segment_seq:012d}.jsonl")
+        self._segment_fd = os.open(self._segment_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _seal_segment(self) -> Optional[str]:
+        """Close the active segment and start a new one; returns the sealed path."""
+        sealed = self._segment_path
+        if self._segment_fd is not None:
+            os.close(self._segment_fd)
+        self._open_segment()
+        return sealed
+
+    def _recover(self):
+        """Load rows from segments left behind by a previous process."""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        segments = sorted(glob.glob(os.path.join(self.journal_dir, "segment-*.jsonl")))
+
+        for path in segments:
+            rows = []
+            with open(path, "r", encoding="utf-8") as segment:
+                for line in segment:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rows.append(_decode_row(line))
+                    except (ValueError, TypeError):
+                        # A crash mid-write can leave a truncated last line
+                        logger.warning(f"Skipping corrupt journal line in {path}")
+            self._retry.append([rows, [path], 0])
+            self._retry_rows += len(rows)
+            self.replayed_rows += len(rows)
+
+        if segments:
+            last_seq = os.path.basename(segments[-1])[len("segment-"):-len(".jsonl")]
+            self._segment_seq = int(last_seq)
+            logger.info(f"Replaying {self.replayed_rows} sensor readings from {len(segments)} journal segment(s)")
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Replay leftover journal segments and start the flush thread."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._recover()
+            self._open_segment()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="sensor-ingest-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush what is buffered and stop the flush thread."""
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush(force=True)
+        with self._condition:
+            if self._segment_fd is not None:
+                os.close(self._segment_fd)
+                self._segment_fd = None
+            # Nothing was written to the last segment if the buffer is empty
+            if not self._pending and self._segment_path and os.path.getsize(self._segment_path) == 0:
+                os.remove(self._segment_path)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def enqueue(self, rows: List[Dict[str, Any]]):
+        """Journal and queue prepared sensor_data rows; raises IngestBufferFullError when full."""
+        with self._condition:
+            if len(self._pending) + self._retry_rows + len(rows) > self.max_pending:
+                self.rejected += len(rows)
+                raise IngestBufferFullError("Sensor ingest buffer is full, please retry shortly")
+
+            os.write(self._segment_fd, b"".join(_encode_row(row) for row in rows))
+            if self.fsync:
+                os.fsync(self._segment_fd)
+
+            self._pending.extend(rows)
+            self.enqueued += len(rows)
+            if len(self._pending) >= self.flush_batch_size:
+                self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopping or len(self._pending) >= self.flush_batch_size,
+                    timeout=self.flush_interval
+                )
+                if self._stopping:
+                    return
+            self.flush()
+
+    def flush(self, force: bool = False) -> int:
+        """Write buffered rows to the database; returns the number of rows committed."""
+        with self._flush_lock:
+            with self._condition:
+                if self._pending:
+                    rows = list(self._pending)
+                    self._pending.clear()
+                    self._retry.append([rows, [self._seal_segment()], 0])
+                    self._retry_rows += len(rows)
+                if not self._retry:
+                    return 0
+                if not force and time.monotonic() < self._next_retry_at:
+                    return 0
+                batches = list(self._retry)
+
+            written = 0
+            done = []
+            retry_later = False
+            for batch in batches:
+                rows, segments, attempts = batch
+                if self._write_batch(rows):
+                    written += len(rows)
+                elif attempts + 1 < self.max_flush_attempts:
+                    # Keep it for the next pass, but don't let it hold back the batches after it
+                    batch[2] = attempts + 1
+                    retry_later = True
+                    continue
+                else:
+                    failed = self._write_rows(rows)
+                    written += len(rows) - len(failed)
+                    if failed:
+                        self._dead_letter(failed, segments)
+                for path in segments:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                done.append(batch)
+
+            with self._condition:
+                self._retry = [batch for batch in self._retry if not any(batch is item for item in done)]
+                self._retry_rows -= sum(len(batch[0]) for batch in done)
+                if retry_later:
+                    self._next_retry_at = time.monotonic() + RETRY_BACKOFF_SECONDS
+            return written
+
+    def _write_batch(self, rows: List[Dict[str, Any]]) -> bool:
+        if not rows:
+            return True
+
+        started_at = time.perf_counter()
+        db = SessionLocal()
+        try:
+            ids = sensor_ingest_service.insert_rows(db, rows)
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            logger.error(f"Flushing {len(rows)} sensor readings failed: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+        latency = time.perf_counter() - started_at
+        self.flush_count += 1
+        self.flushed_rows += len(rows)
+        self.duplicate_rows += ids.count(None)
+        self.last_flush_rows = len(rows)
+        self.last_flush_latency_ms = round(latency * 1000, 2)
+        self.last_flush_at = datetime.now()
+        self._total_flush_latency += latency
+        return True
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Write rows one at a time so a bad reading can't sink its batch; returns the rows that failed."""
+        failed = []
+        error = None
+        db = SessionLocal()
+        try:
+            for row in rows:
+                try:
+                    ids = sensor_ingest_service.insert_rows(db, [row])
+                except Exception as e:
+                    db.rollback()
+                    failed.append(row)
+                    error = e
+                    continue
+                self.flushed_rows += 1
+                self.duplicate_rows += ids.count(None)
+        finally:
+            db.close()
+
+        if failed:
+            logger.error(f"{len(failed)} of {len(rows)} sensor readings failed after "
+                         f"{self.max_flush_attempts} flush attempts: {str(error)}")
+        return failed
+
+    def _dead_letter(self, rows: List[Dict[str, Any]], segments: List[str]):
+        """Park rows that can't be written in a dead-letter file instead of retrying them forever."""
+        name = os.path.basename(segments[0]) if segments else f"segment-{self._segment_seq:012d}.jsonl"
+        path = os.path.join(self.journal_dir, name.replace("segment-", "dead-letter-", 1))
+        with open(path, "ab") as dead_letter:
+            dead_letter.write(b"".join(_encode_row(row) for row in rows))
+            if self.fsync:
+                dead_letter.flush()
+                os.fsync(dead_letter.fileno())
+
+        # They were acknowledged but never stored; let a resend from the device through
+        sensor_dedup_cache.discard(reading_key(row) for row in rows)
+        self.dead_letter_rows += len(rows)
+        logger.error(f"Moved {len(rows)} sensor readings to dead-letter file {path}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            queue_depth = len(self._pending)
+            retry_rows = self._retry_rows
+        journal_segments = len(glob.glob(os.path.join(self.journal_dir, "segment-*.jsonl")))
+        dead_letter_files = len(glob.glob(os.path.join(self.journal_dir, "dead-letter-*.jsonl")))
+        return {
+            "running": self.running,
+            "queue_depth": queue_depth,
+            "retry_rows": retry_rows,
+            "max_pending": self.max_pending,
+            "flush_batch_size": self.flush_batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed_rows": self.flushed_rows,
+            "duplicate_rows": self.duplicate_rows,
+            "flush_count": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "replayed_rows": self.replayed_rows,
+            "dead_letter_rows": self.dead_letter_rows,
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_latency_ms": self.last_flush_latency_ms,
+            "average_flush_latency_ms": round(self._total_flush_latency / self.flush_count * 1000, 2) if self.flush_count else 0,
+            "journal_segments": journal_segments,
+            "dead_letter_files": dead_letter_files
+        }
+
+
+# Global buffer instance (started from the application startup hook)
+sensor_ingest_buffer = SensorIngestBuffer(
+    journal_dir=IOT_INGEST_JOURNAL_DIR,
+    max_pending=IOT_INGEST_MAX_PENDING,
+    flush_batch_size=IOT_INGEST_FLUSH_BATCH_SIZE,
+    flush_interval=IOT_INGEST_FLUSH_INTERVAL,
+    fsync=IOT_INGEST_JOURNAL_FSYNC,
+    max_flush_attempts=IOT_INGEST_MAX_FLUSH_ATTEMPTS
+)
@@ -0,0 +1,388 @@
+"""
+Central ingestion path for sensor readings.
+Readings from any source (ESP32 devices, the per-sensor API, bulk uploads) are
+validated together, resolved to their SensorConfig through the config cache,
+calibrated and written with a single multi-row INSERT per transaction, which
+also updates their rollup buckets, and then checked against alert thresholds.
+Ingestion is idempotent on (sensor_config_id, recorded_at): a reading that is
+already stored (a device retry, a replayed journal) is skipped, not duplicated.
+"""
+
+import json
+import math
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Tuple
+from pydantic import ValidationError
+from sqlalchemy import inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models.sensor import SensorData
+from app.schemas.sensor import SensorReadingIngest, ESP32SensorData
+from app.core.config import IOT_DEFAULT_DEVICE_ID, IOT_MAX_CLOCK_SKEW_SECONDS
+from .sensor_config_cache import sensor_config_cache, CachedSensorConfig
+from .sensor_dedup_cache import sensor_dedup_cache, reading_key
+from .sensor_archive_service import sensor_archive_service
+from .sensor_rollup_service import sensor_rollup_service
+from .sensor_latest_store import sensor_latest_store
+from .sensor_live_hub import sensor_live_hub
+from .sensor_alert_engine import sensor_alert_engine
+
+logger = logging.getLogger(__name__)
+
+# Reading columns copied from a validated payload into sensor_data
+SENSOR_VALUE_FIELDS = [
+    "temperature", "humidity", "light_intensity", "soil_moisture", "soil_ph",
+    "water_level", "water_flow_rate", "atmospheric_pressure", "uv_index",
+    "battery_level", "signal_strength", "error_message"
+]
+
+
+# Device clocks before this haven't been set yet (seconds or milliseconds since boot)
+EARLIEST_DEVICE_TIME = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+# Epoch values above this are milliseconds
+_EPOCH_MILLIS_THRESHOLD = 1e11
+
+
+class SensorNotFoundError(Exception):
+    """Raised when a reading names a device with no active SensorConfig."""
+
+
+def _normalize_timestamp(value: datetime) -> datetime:
+    """Store timestamps as naive local time, matching datetime.now() used by the readers."""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+        )
+    return str(error)
+
+
+def parse_device_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Parse a device timestamp: ISO 8601 ('T' or space separated, with or
+    without 'Z' or an offset; naive means local time) or Unix epoch seconds or
+    milliseconds, as a number or a string. Returns None when it can't be
+    parsed or the device clock is clearly wrong: before 2020, or more than
+    IOT_MAX_CLOCK_SKEW_SECONDS ahead of the server.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        epoch = float(value)
+    except (TypeError, ValueError):
+        epoch = None
+
+    if epoch is not None:
+        if not math.isfinite(epoch):
+            return None
+        if epoch > _EPOCH_MILLIS_THRESHOLD:
+            epoch /= 1000
+        try:
+            recorded_at = datetime.fromtimestamp(epoch, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    else:
+        try:
+            recorded_at = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+    aware = recorded_at if recorded_at.tzinfo is not None else recorded_at.astimezone()
+    latest = datetime.now(timezone.utc) + timedelta(seconds=IOT_MAX_CLOCK_SKEW_SECONDS)
+    if aware < EARLIEST_DEVICE_TIME or aware > latest:
+        return None
+    return recorded_at
+
+
+def esp32_payload_to_reading(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an ESP32 payload into the generic reading format.
+
+    A timestamp that can't be used falls back to the time of arrival; the
+    reading is then marked data_quality "warning" with the reason, since a
+    resent copy of it can't be recognised as a duplicate.
+    """
+    data = ESP32SensorData(**payload)
+    recorded_at = parse_device_timestamp(data.timestamp)
+    reading = {
+        "sensor_id": data.device_id or IOT_DEFAULT_DEVICE_ID,
+        "temperature": data.temperature_c,
+        "humidity": data.humidity_percent,
+        "soil_moisture": data.soil_moisture_percent,
+        "water_level": data.water_level_percent,
+        "device_status": "online",
+        "data_quality": "good",
+        "recorded_at": recorded_at
+    }
+    if recorded_at is None:
+        reading.update({
+            "data_quality": "warning",
+            "error_message": f"Unusable device timestamp {data.timestamp!r}, recorded at arrival",
+            "recorded_at": datetime.now()
+        })
+    return reading
+
+
+class SensorIngestService:
+    """Validates and bulk-inserts sensor readings."""
+
+    def __init__(self):
+        # False on a database from before migrate_sensor_data_dedup.py (see check_unique_index)
+        self.unique_index = True
+
+        # Metrics
+        self.timestamp_fallbacks = 0
+
+    def check_unique_index(self, bind=engine) -> bool:
+        """
+        Check that sensor_data has its unique (sensor_config_id, recorded_at)
+        index. Without it inserts can't skip conflicts, so only duplicates the
+        recent-keys cache or the batch itself catches are dropped.
+        """
+        self.unique_index = any(
+            index["unique"] and index["column_names"] == ["sensor_config_id", "recorded_at"]
+            for index in inspect(bind).get_indexes(SensorData.__tablename__)
+        )
+        return self.unique_index
+
+    def _esp32_reading(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        reading = esp32_payload_to_reading(payload)
+        if reading["data_quality"] == "warning":
+            self.timestamp_fallbacks += 1
+        return reading
+
+    @staticmethod
+    def parse_body(body: bytes, content_type: str = "") -> List[Any]:
+        """
+        Parse a JSON array or NDJSON request body into raw payloads.
+
+        Malformed NDJSON lines are kept as ValueError entries so they get a
+        per-row error instead of failing the whole batch.
+        """
+        text = body.decode("utf-8").strip()
+        if not text:
+            return []
+
+        if text.startswith("[") and "ndjson" not in content_type:
+            payloads = json.loads(text)
+            if not isinstance(payloads, list):
+                raise ValueError("Expected a JSON array of readings")
+            return payloads
+
+        payloads = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                payloads.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                payloads.append(ValueError(f"Invalid JSON on line {line_number}: {e.msg}"))
+        return payloads
+
+    def validate(self, payloads: List[Dict[str, Any]]) -> Tuple[List[Optional[SensorReadingIngest]], List[Optional[str]]]:
+        """Parse raw payloads; returns parallel lists of readings and error messages."""
+        readings: List[Optional[SensorReadingIngest]] = []
+        errors: List[Optional[str]] = []
+        for payload in payloads:
+            try:
+                if isinstance(payload, ValueError):
+                    raise payload
+                if not isinstance(payload, dict):
+                    raise ValueError("Each reading must be a JSON object")
+                if "temperature_c" in payload:
+                    payload = self._esp32_reading(payload)
+                reading = SensorReadingIngest(**payload)
+                if reading.sensor_id is None and reading.sensor_config_id is None:
+                    raise ValueError("Either sensor_id or sensor_config_id is required")
+                readings.append(reading)
+                errors.append(None)
+            except (ValidationError, ValueError, TypeError) as e:
+                readings.append(None)
+                errors.append(_error_message(e))
+        return readings, errors
+
+    def prepare_row(self, reading: SensorReadingIngest, config: CachedSensorConfig,
+                    received_at: datetime) -> Dict[str, Any]:
+        """Build a calibrated sensor_data row for a validated reading."""
+        row = {field: getattr(reading, field) for field in SENSOR_VALUE_FIELDS}
+        row.update({
+            "sensor_config_id": config.id,
+            "device_status": reading.device_status.value,
+            "data_quality": reading.data_quality.value,
+            "recorded_at": _normalize_timestamp(reading.recorded_at),
+            "received_at": received_at
+        })
+        return config.apply_calibration(row)
+
+    def build_esp32_row(self, db: Session, data: ESP32SensorData) -> Dict[str, Any]:
+        """
+        Prepare a sensor_data row for one ESP32 reading.
+
+        The device is resolved through the config cache, so the database is
+        only queried when the device's entry is missing or expired.
+        """
+        reading = SensorReadingIngest(**self._esp32_reading(data.dict()))
+        config = sensor_config_cache.get(db, reading.sensor_id)
+        if config is None or not config.is_active:
+            raise SensorNotFoundError(f"Active sensor not found: {reading.sensor_id}")
+        return self.prepare_row(reading, config, datetime.now())
+
+    def insert_rows(self, db: Session, rows: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Write prepared sensor_data rows in one multi-row INSERT and commit.
+
+        A row whose (sensor_config_id, recorded_at) is already stored, in
+        sensor_data or an archive block, or earlier in the same batch is
+        skipped and gets None instead of an id. Only inserted rows update
+        their rollup buckets (in the same transaction) and, once it has
+        committed, the latest-reading store, live subscribers and alert rules.
+        """
+        if not rows:
+            return []
+
+        stored = sensor_archive_service.archived_keys(db, (reading_key(row) for row in rows))
+        candidates = []
+        for index, row in enumerate(rows):
+            key = reading_key(row)
+            if key not in stored:
+                stored.add(key)
+                candidates.append(index)
+
+        inserted_ids = {}
+        if candidates:
+            statement = sqlite_insert(SensorData)
+            if self.unique_index:
+                statement = statement.on_conflict_do_nothing(index_elements=["sensor_config_id", "recorded_at"])
+            result = db.execute(
+                statement.returning(SensorData.id, SensorData.sensor_config_id, SensorData.recorded_at),
+                [rows[index] for index in candidates]
+            )
+            inserted_ids = {(config_id, recorded_at): row_id for row_id, config_id, recorded_at in result}
+
+        ids: List[Optional[int]] = [None] * len(rows)
+        for index in candidates:
+            ids[index] = inserted_ids.get(reading_key(rows[index]))
+        inserted_rows = [row for row, row_id in zip(rows, ids) if row_id is not None]
+        inserted = [row_id for row_id in ids if row_id is not None]
+
+        sensor_rollup_service.apply(db, inserted_rows)
+        db.commit()
+        sensor_dedup_cache.add(reading_key(row) for row in rows)
+        sensor_dedup_cache.record_insert_duplicates(len(rows) - len(inserted))
+        if not inserted:
+            return ids
+
+        sensor_latest_store.record(inserted_rows, inserted)
+        sensor_live_hub.publish(inserted_rows, inserted)
+        try:
+            sensor_alert_engine.evaluate(db, inserted_rows)
+        except Exception as e:
+            # The readings are already committed; don't report them as failed
+            db.rollback()
+            logger.error(f"Sensor alert evaluation failed: {str(e)}")
+        return ids
+
+    @staticmethod
+    def stored_reading(db: Session, row: Dict[str, Any]) -> Optional[SensorData]:
+        """The sensor_data row already holding a reading that insert_rows skipped."""
+        return db.query(SensorData).filter(
+            SensorData.sensor_config_id == row["sensor_config_id"],
+            SensorData.recorded_at == row["recorded_at"]
+        ).first()
+
+    def ingest(self, db: Session, payloads: List[Dict[str, Any]],
+               sensor_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Validate and store a batch of readings.
+
+        Args:
+            payloads: Raw reading dicts (generic or ESP32 format)
+            sensor_id: When set, every reading is stored for this device
+
+        Returns:
+            Counts plus a per-row status list in the input order; readings
+            that were already stored are reported as duplicates, not failures
+        """
+        readings, errors = self.validate(payloads)
+
+        device_ids = {sensor_id} if sensor_id else {
+            reading.sensor_id for reading in readings
+            if reading is not None and reading.sensor_config_id is None
+        }
+        config_ids = set() if sensor_id else {
+            reading.sensor_config_id for reading in readings
+            if reading is not None and reading.sensor_config_id is not None
+        }
+        configs_by_device = sensor_config_cache.get_many(db, device_ids)
+        configs_by_id = sensor_config_cache.get_many_by_id(db, config_ids)
+
+        received_at = datetime.now()
+        rows = []
+        row_indexes = []
+        duplicates = set()
+        for index, reading in enumerate(readings):
+            if reading is None:
+                continue
+            if sensor_id or reading.sensor_config_id is None:
+                device = sensor_id or reading.sensor_id
+                config = configs_by_device.get(device)
+            else:
+                device = reading.sensor_config_id
+                config = configs_by_id.get(device)
+            if config is None or not config.is_active:
+                errors[index] = f"Active sensor not found: {device}"
+                continue
+            row = self.prepare_row(reading, config, received_at)
+            # Resent readings are answered from the recent-keys cache without touching the database
+            if sensor_dedup_cache.seen(reading_key(row)):
+                duplicates.add(index)
+                continue
+            rows.append(row)
+            row_indexes.append(index)
+
+        try:
+            ids = self.insert_rows(db, rows)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk sensor insert failed: {str(e)}")
+            for index in row_indexes:
+                errors[index] = f"Database error: {str(e)}"
+            ids = []
+            row_indexes = []
+
+        results: List[Dict[str, Any]] = [
+            {"index": index, "status": "error", "error": error}
+            for index, error in enumerate(errors)
+        ]
+        for index, row_id in zip(row_indexes, ids):
+            if row_id is None:
+                duplicates.add(index)
+            else:
+                results[index] = {"index": index, "status": "created", "id": row_id}
+        for index in duplicates:
+            results[index] = {"index": index, "status": "duplicate"}
+
+        inserted = sum(1 for row_id in ids if row_id is not None)
+        failed = len(payloads) - inserted - len(duplicates)
+        return {
+            "status": "success" if failed == 0 else ("partial" if inserted or duplicates else "error"),
+            "received": len(payloads),
+            "inserted": inserted,
+            "duplicates": len(duplicates),
+            "failed": failed,
+            "results": results
+        }
+
+
+# Global ingest service instance
+sensor_ingest_service = SensorIngestService()
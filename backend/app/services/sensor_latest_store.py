@@ -0,0 +1,361 @@
+"""
+Last-known-value store for sensor readings.
+The ingest path pushes every committed batch here, so "latest reading",
+"last online" and "readings in the last 24 hours" lookups are served from
+memory instead of an ORDER BY ... LIMIT 1 / COUNT query per request. A sensor
+is loaded from the database the first time it is asked for; from then on the
+ingest updates keep it current. preload() fills many sensors at once with a
+fixed number of set-based queries, so a dashboard listing hundreds of sensors
+costs the same as one listing a single sensor. The store is per process: readings written by
+another worker only show up here after invalidate() or a restart.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+from sqlalchemy import func, select, case
+from sqlalchemy.orm import Session, aliased
+
+from app.models.sensor import SensorData, SensorConfig
+
+COUNTER_WINDOW_MINUTES = 24 * 60
+# Loaded counters keep per-minute detail for this much of the oldest part of the
+# window and one lump for the rest; the sensor is reloaded once the lump's
+# start slides out of the window
+COUNTER_DETAIL_MINUTES = 60
+
+_READING_FIELDS = tuple(SensorData.__table__.columns.keys())
+
+
+class LatestReading:
+    """Detached copy of a sensor_data row, readable like the ORM object."""
+
+    __slots__ = _READING_FIELDS
+
+    def __init__(self, **fields):
+        for field in _READING_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    @classmethod
+    def from_model(cls, data: SensorData) -> "LatestReading":
+        return cls(**{field: getattr(data, field) for field in _READING_FIELDS})
+
+    def age_minutes(self, now: Optional[datetime] = None) -> float:
+        return ((now or datetime.now()) - self.recorded_at).total_seconds() / 60
+
+
+def reading_to_esp32_format(reading) -> Dict[str, Any]:
+    """Serialize a stored reading (ORM row or LatestReading) in the dashboard's ESP32 format."""
+    return {
+        "id": reading.id,
+        "sensor_config_id": reading.sensor_config_id,
+        "timestamp": reading.recorded_at.isoformat(),
+        "temperature_c": reading.temperature,
+        "humidity_percent": reading.humidity,
+        "heat_index_c": reading.temperature + 2 if reading.temperature else None,  # Approximate heat index
+        "water_level_percent": reading.water_level,
+        "soil_moisture_percent": reading.soil_moisture,
+        "device_status": reading.device_status,
+        "data_quality": reading.data_quality,
+        "received_at": reading.received_at.isoformat() if reading.received_at else None
+    }
+
+
+def _minute(timestamp: datetime) -> datetime:
+    return timestamp.replace(second=0, microsecond=0)
+
+
+class _SensorState:
+    __slots__ = ("latest", "last_online", "minute_counts", "expires_at")
+
+    def __init__(self):
+        self.latest: Optional[LatestReading] = None
+        self.last_online: Optional[datetime] = None
+        self.minute_counts: Dict[datetime, int] = {}
+        self.expires_at: Optional[datetime] = None
+
+    def fresh(self, now: datetime) -> bool:
+        return self.expires_at is None or now < self.expires_at
+
+
+class SensorLatestStore:
+    """Latest reading, last online time and per-minute 24h counters per sensor."""
+
+    def __init__(self):
+        self._sensors: Dict[int, _SensorState] = {}
+        self._overall: Optional[LatestReading] = None
+        self._overall_loaded = False
+        # Rows committed while a sensor (key None: the overall latest) is being loaded
+        self._pending: Dict[Optional[int], List[Tuple[Dict[str, Any], int]]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._pruned_until: Optional[datetime] = None
+
+        # Metrics
+        self.hits = 0
+        self.loads = 0
+        self.updates = 0
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _query_states(db: Session, sensor_config_ids: List[int], max_id: int) -> Dict[int, _SensorState]:
+        """
+        Read the state of several sensors in two statements, ignoring rows after max_id.
+
+        The latest row and last online time are correlated subqueries per
+        sensor_configs row, each resolved by a backwards walk of the
+        (sensor_config_id, recorded_at) index; the 24h counters are one
+        grouped query over the same index returning at most
+        COUNTER_DETAIL_MINUTES + 1 rows per sensor.
+        """
+        states = {config_id: _SensorState() for config_id in sensor_config_ids}
+        if not states:
+            return states
+
+        reading = aliased(SensorData)
+        latest_id = select(reading.id).where(
+            reading.sensor_config_id == SensorConfig.id,
+            reading.id <= max_id
+        ).order_by(reading.recorded_at.desc()).limit(1).correlate(SensorConfig).scalar_subquery()
+        last_online = select(reading.recorded_at).where(
+            reading.sensor_config_id == SensorConfig.id,
+            reading.id <= max_id,
+            reading.device_status == "online"
+        ).order_by(reading.recorded_at.desc()).limit(1).correlate(SensorConfig).scalar_subquery()
+
+        heads = db.query(
+            SensorConfig.id.label("sensor_config_id"),
+            latest_id.label("latest_id"),
+            last_online.label("last_online")
+        ).filter(SensorConfig.id.in_(states)).subquery()
+
+        for config_id, online_at, latest in db.query(
+            heads.c.sensor_config_id, heads.c.last_online, SensorData
+        ).outerjoin(SensorData, SensorData.id == heads.c.latest_id):
+            state = states[config_id]
+            if latest is not None:
+                state.latest = LatestReading.from_model(latest)
+            state.last_online = online_at
+
+        # Per-minute counts for the oldest COUNTER_DETAIL_MINUTES of the window,
+        # one count (keyed by its start) for everything newer
+        since = _minute(datetime.now() - timedelta(minutes=COUNTER_WINDOW_MINUTES))
+        detail_until = since + timedelta(minutes=COUNTER_DETAIL_MINUTES)
+        bucket_expr = case(
+            (SensorData.recorded_at < detail_until, func.strftime("%Y-%m-%d %H:%M:00", SensorData.recorded_at)),
+            else_=detail_until.strftime("%Y-%m-%d %H:%M:00")
+        )
+        for config_id, minute, count in db.query(
+            SensorData.sensor_config_id, bucket_expr, func.count(SensorData.id)
+        ).filter(
+            SensorData.sensor_config_id.in_(states),
+            SensorData.recorded_at >= since,
+            SensorData.id <= max_id
+        ).group_by(SensorData.sensor_config_id, bucket_expr):
+            states[config_id].minute_counts[datetime.fromisoformat(minute)] = count
+
+        expires_at = detail_until + timedelta(minutes=COUNTER_WINDOW_MINUTES)
+        for state in states.values():
+            state.expires_at = expires_at
+
+        return states
+
+    def _load(self, db: Session, keys: List[Optional[int]], query):
+        """
+        Run a load query without losing concurrent ingest updates.
+
+        Rows up to the current max id come from the database; rows committed
+        while the query runs are captured by record() and replayed afterwards,
+        returned per key.
+        """
+        with self._lock:
+            for key in keys:
+                self._pending[key] = []
+        try:
+            max_id = db.query(func.max(SensorData.id)).scalar() or 0
+            loaded = query(max_id)
+        except Exception:
+            with self._lock:
+                for key in keys:
+                    self._pending.pop(key, None)
+            raise
+
+        with self._lock:
+            pending = {
+                key: [(row, row_id) for row, row_id in self._pending.pop(key, []) if row_id > max_id]
+                for key in keys
+            }
+            self.loads += 1
+            return loaded, pending
+
+    def _state(self, db: Session, sensor_config_id: int) -> _SensorState:
+        now = datetime.now()
+        with self._lock:
+            state = self._sensors.get(sensor_config_id)
+            if state is not None and state.fresh(now):
+                self.hits += 1
+                return state
+
+        with self._load_lock:
+            with self._lock:
+                state = self._sensors.get(sensor_config_id)
+            if state is not None and state.fresh(now):
+                return state
+
+            states, pending = self._load(
+                db, [sensor_config_id], lambda max_id: self._query_states(db, [sensor_config_id], max_id)
+            )
+            state = states[sensor_config_id]
+            with self._lock:
+                for row, row_id in pending[sensor_config_id]:
+                    self._apply(state, row, LatestReading(**row, id=row_id))
+                self._sensors[sensor_config_id] = state
+            return state
+
+    def preload(self, db: Session, sensor_config_ids: List[int]):
+        """Load every listed sensor that is not in memory (or due a reload), in one round of queries."""
+        now = datetime.now()
+
+        def is_missing(config_id: int) -> bool:
+            state = self._sensors.get(config_id)
+            return state is None or not state.fresh(now)
+
+        with self._lock:
+            missing = [config_id for config_id in dict.fromkeys(sensor_config_ids) if is_missing(config_id)]
+        if not missing:
+            return
+
+        with self._load_lock:
+            with self._lock:
+                missing = [config_id for config_id in missing if is_missing(config_id)]
+            if not missing:
+                return
+
+            states, pending = self._load(
+                db, missing, lambda max_id: self._query_states(db, missing, max_id)
+            )
+            with self._lock:
+                for config_id, state in states.items():
+                    for row, row_id in pending[config_id]:
+                        self._apply(state, row, LatestReading(**row, id=row_id))
+                    self._sensors[config_id] = state
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    def latest(self, db: Session, sensor_config_id: int) -> Optional[LatestReading]:
+        """Most recent reading of one sensor (by recorded_at)."""
+        return self._state(db, sensor_config_id).latest
+
+    def latest_overall(self, db: Session) -> Optional[LatestReading]:
+        """Most recent reading across all sensors."""
+        with self._lock:
+            if self._overall_loaded:
+                self.hits += 1
+                return self._overall
+
+        with self._load_lock:
+            with self._lock:
+                if self._overall_loaded:
+                    return self._overall
+
+            def query(max_id: int) -> Optional[LatestReading]:
+                latest = db.query(SensorData).filter(
+                    SensorData.id <= max_id
+                ).order_by(SensorData.recorded_at.desc()).first()
+                return LatestReading.from_model(latest) if latest is not None else None
+
+            overall, pending = self._load(db, [None], query)
+            with self._lock:
+                for row, row_id in pending[None]:
+                    if overall is None or row["recorded_at"] >= overall.recorded_at:
+                        overall = LatestReading(**row, id=row_id)
+                self._overall = overall
+                self._overall_loaded = True
+                return overall
+
+    def last_online(self, db: Session, sensor_config_id: int) -> Optional[datetime]:
+        return self._state(db, sensor_config_id).last_online
+
+    def count_24h(self, db: Session, sensor_config_id: int) -> int:
+        """Readings recorded in the last 24 hours (minute resolution)."""
+        state = self._state(db, sensor_config_id)
+        since = _minute(datetime.now() - timedelta(minutes=COUNTER_WINDOW_MINUTES))
+        with self._lock:
+            return sum(count for minute, count in state.minute_counts.items() if minute >= since)
+
+    # ------------------------------------------------------------------
+    # Updates from the ingest path
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _apply(state: _SensorState, row: Dict[str, Any], reading: LatestReading):
+        recorded_at = reading.recorded_at
+        if state.latest is None or recorded_at >= state.latest.recorded_at:
+            state.latest = reading
+        if row.get("device_status", "online") == "online" and (
+            state.last_online is None or recorded_at >= state.last_online
+        ):
+            state.last_online = recorded_at
+        minute = _minute(recorded_at)
+        if minute >= _minute(datetime.now() - timedelta(minutes=COUNTER_WINDOW_MINUTES)):
+            state.minute_counts[minute] = state.minute_counts.get(minute, 0) + 1
+
+    def record(self, rows: List[Dict[str, Any]], ids: List[int]):
+        """Apply rows that were just committed (ids in the same order)."""
+        since = _minute(datetime.now() - timedelta(minutes=COUNTER_WINDOW_MINUTES))
+
+        with self._lock:
+            for row, row_id in zip(rows, ids):
+                if row.get("recorded_at") is None:
+                    continue
+                config_id = row.get("sensor_config_id")
+                reading = LatestReading(**row, id=row_id)
+
+                if self._overall_loaded and (self._overall is None or reading.recorded_at >= self._overall.recorded_at):
+                    self._overall = reading
+                if None in self._pending:
+                    self._pending[None].append((row, row_id))
+                if config_id in self._pending:
+                    self._pending[config_id].append((row, row_id))
+
+                # Sensors nobody has asked for yet are loaded lazily with these rows included
+                state = self._sensors.get(config_id)
+                if state is not None:
+                    self._apply(state, row, reading)
+                    self.updates += 1
+
+            # Drop minutes that fell out of the window, at most once a minute
+            if self._pruned_until != since:
+                self._pruned_until = since
+                for state in self._sensors.values():
+                    state.minute_counts = {
+                        minute: count for minute, count in state.minute_counts.items() if minute >= since
+                    }
+
+    def invalidate(self, sensor_config_id: Optional[int] = None):
+        """Forget one sensor (or everything) so it is reloaded from the database."""
+        with self._lock:
+            if sensor_config_id is None:
+                self._sensors.clear()
+            else:
+                self._sensors.pop(sensor_config_id, None)
+            self._overall = None
+            self._overall_loaded = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sensors_loaded": len(self._sensors),
+                "hits": self.hits,
+                "loads": self.loads,
+                "updates": self.updates
+            }
+
+
+# Global store instance
+sensor_latest_store = SensorLatestStore()
@@ -0,0 +1,121 @@
+"""
+In-process pub/sub hub for live sensor readings.
+The ingest path publishes every committed batch from whatever thread wrote it;
+the hub hands it to the event loop with call_soon_threadsafe and fans it out to
+the SSE / WebSocket subscribers whose sensors it concerns. Each subscriber
+keeps only the newest unsent reading per sensor, so a slow client gets fresh
+values instead of a growing backlog.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Any, Iterable, Set
+
+from app.core.config import IOT_LIVE_MAX_SUBSCRIBERS
+from .sensor_latest_store import LatestReading, reading_to_esp32_format
+
+logger = logging.getLogger(__name__)
+
+
+class LiveHubFullError(Exception):
+    """Raised when the hub already has its maximum number of subscribers."""
+
+
+class LiveSubscription:
+    """One connected client: the sensors it follows and its coalesced pending readings."""
+
+    def __init__(self, sensor_config_ids: Optional[Iterable[int]] = None):
+        self.sensor_config_ids: Optional[Set[int]] = set(sensor_config_ids) if sensor_config_ids is not None else None
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._event = asyncio.Event()
+
+        # Metrics
+        self.delivered = 0
+        self.coalesced = 0
+
+    def wants(self, sensor_config_id: int) -> bool:
+        return self.sensor_config_ids is None or sensor_config_id in self.sensor_config_ids
+
+    def offer(self, payload: Dict[str, Any]):
+        """Queue a reading, replacing an unsent one from the same sensor (event loop only)."""
+        sensor_config_id = payload["sensor_config_id"]
+        if sensor_config_id in self._pending:
+            self.coalesced += 1
+        self._pending[sensor_config_id] = payload
+        self._event.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait for new readings; returns [] when `timeout` passes first (time for a heartbeat)."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._event.clear()
+        batch = sorted(self._pending.values(), key=lambda payload: payload["timestamp"])
+        self._pending = {}
+        self.delivered += len(batch)
+        return batch
+
+
+class SensorLiveHub:
+    """Fans committed readings out to live subscribers."""
+
+    def __init__(self, max_subscribers: int = 1000):
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[LiveSubscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Metrics
+        self.published = 0
+        self.dispatched = 0
+
+    def subscribe(self, sensor_config_ids: Optional[Iterable[int]] = None) -> LiveSubscription:
+        """Register a subscriber; must be called from the event loop."""
+        if len(self._subscribers) >= self.max_subscribers:
+            raise LiveHubFullError("Too many live subscribers, please retry shortly")
+        self._loop = asyncio.get_running_loop()
+        subscription = LiveSubscription(sensor_config_ids)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, rows: List[Dict[str, Any]], ids: List[int]):
+        """Publish rows that were just committed; safe to call from any thread."""
+        loop = self._loop
+        if not self._subscribers or loop is None or loop.is_closed():
+            return
+        payloads = [
+            reading_to_esp32_format(LatestReading(**row, id=row_id))
+            for row, row_id in zip(rows, ids)
+            if row.get("recorded_at") is not None
+        ]
+        self.published += len(payloads)
+        try:
+            loop.call_soon_threadsafe(self._dispatch, payloads)
+        except RuntimeError:
+            # Loop closed between the check and the call (shutdown)
+            pass
+
+    def _dispatch(self, payloads: List[Dict[str, Any]]):
+        for subscription in list(self._subscribers):
+            for payload in payloads:
+                if subscription.wants(payload["sensor_config_id"]):
+                    subscription.offer(payload)
+                    self.dispatched += 1
+
+    def stats(self) -> Dict[str, Any]:
+        subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "dispatched": self.dispatched,
+            "delivered": sum(subscription.delivered for subscription in subscribers),
+            "coalesced": sum(subscription.coalesced for subscription in subscribers)
+        }
+
+
+# Global hub instance
+sensor_live_hub = SensorLiveHub(max_subscribers=IOT_LIVE_MAX_SUBSCRIBERS)
@@ -0,0 +1,326 @@
+"""
+Retention and compaction of sensor history.
+Each sensor keeps its raw readings (sensor_data and archive blocks) and each
+rollup resolution for as many days as its policy says: the sensor's tier from
+IOT_RETENTION_TIERS with any overrides from sensor_retention_policies, 0
+meaning forever. A pass deletes what has expired in chunks of chunk_size
+rows, committing after each one so writers are never locked out for long,
+then compacts what is left past IOT_ARCHIVE_AFTER_DAYS into archive blocks
+and hands freed pages back with SQLite's incremental vacuum. A background
+thread runs a pass every IOT_RETENTION_INTERVAL_HOURS.
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.models.sensor import SensorConfig, SensorData, SensorArchiveBlock, SensorRollup, SensorRetentionPolicy
+from app.core.config import (
+    IOT_RETENTION_TIERS, IOT_RETENTION_DEFAULT_TIER, IOT_RETENTION_INTERVAL_HOURS,
+    IOT_RETENTION_CHUNK_SIZE, IOT_RETENTION_CHUNK_PAUSE, IOT_RETENTION_VACUUM_PAGES,
+    IOT_ARCHIVE_AFTER_DAYS
+)
+from .sensor_archive_service import sensor_archive_service
+from .sensor_rollup_service import RESOLUTIONS
+
+logger = logging.getLogger(__name__)
+
+# Policy fields, in days
+RETENTION_FIELDS = ["raw_days"] + [f"rollup_{resolution}_days" for resolution in RESOLUTIONS]
+
+# Let startup finish before the first pass
+STARTUP_DELAY_SECONDS = 60
+
+# PRAGMA auto_vacuum value for INCREMENTAL
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def resolve_policy(policy: Optional[SensorRetentionPolicy] = None) -> Dict[str, Any]:
+    """The effective retention of a sensor: its tier's days with the sensor's overrides applied."""
+    tier = policy.tier if policy is not None else None
+    if tier not in IOT_RETENTION_TIERS:
+        # Unset, or a tier since removed from the configuration
+        tier = IOT_RETENTION_DEFAULT_TIER
+    resolved = {"tier": tier}
+    for field in RETENTION_FIELDS:
+        override = getattr(policy, field) if policy is not None else None
+        resolved[field] = override if override is not None else IOT_RETENTION_TIERS[tier].get(field, 0)
+    return resolved
+
+
+def _floor_day(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class SensorRetentionService:
+    """Chunked retention passes over sensor history, run on demand or by a background thread."""
+
+    def __init__(self, interval_hours: float = IOT_RETENTION_INTERVAL_HOURS,
+                 chunk_size: int = IOT_RETENTION_CHUNK_SIZE, chunk_pause: float = IOT_RETENTION_CHUNK_PAUSE,
+                 vacuum_pages: int = IOT_RETENTION_VACUUM_PAGES):
+        self.interval_seconds = interval_hours * 3600
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_pause = chunk_pause
+        self.vacuum_pages = vacuum_pages
+
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.runs = 0
+        self.failed_runs = 0
+        self.deleted_total: Dict[str, int] = {"sensor_data": 0, "sensor_archive_blocks": 0, "sensor_rollups": 0}
+        self.chunks = 0
+        self.pages_freed = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_seconds = 0.0
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.progress: Optional[Dict[str, Any]] = None  # what the running pass is deleting
+        self._warned_vacuum = False
+
+    # ------------------------------------------------------------------
+    # Policies
+    # ------------------------------------------------------------------
+
+    def policies(self, db: Session, sensor_config_id: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        """Effective retention of every sensor (or one), keyed by sensor config id."""
+        query = db.query(SensorConfig.id, SensorRetentionPolicy).outerjoin(
+            SensorRetentionPolicy, SensorRetentionPolicy.sensor_config_id == SensorConfig.id
+        )
+        if sensor_config_id is not None:
+            query = query.filter(SensorConfig.id == sensor_config_id)
+        return {config_id: resolve_policy(policy) for config_id, policy in query}
+
+    # ------------------------------------------------------------------
+    # Passes
+    # ------------------------------------------------------------------
+
+    def _delete_chunked(self, db: Session, model, conditions: List, table: str,
+                        sensor_config_id: Optional[int], dry_run: bool) -> int:
+        """Delete matching rows chunk_size at a time, one commit per chunk; dry runs only count."""
+        if dry_run:
+            return db.query(func.count(model.id)).filter(*conditions).scalar()
+
+        deleted = 0
+        while not self._stopping.is_set():
+            ids = [row_id for (row_id,) in db.query(model.id).filter(*conditions).limit(self.chunk_size)]
+            if not ids:
+                break
+            db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            deleted += len(ids)
+            self.chunks += 1
+            self.deleted_total[table] += len(ids)
+            self.progress = {"table": table, "sensor_config_id": sensor_config_id, "deleted": deleted}
+            if len(ids) < self.chunk_size:
+                break
+            # Gives writers waiting on the database lock a turn
+            self._stopping.wait(self.chunk_pause)
+        return deleted
+
+    def _expire_sensor(self, db: Session, sensor_config_id: Optional[int], policy: Dict[str, Any],
+                       now: datetime, result: Dict[str, Any], dry_run: bool):
+        if sensor_config_id is None:
+            # Readings orphaned by deleted sensors follow the default tier
+            config_condition = SensorData.sensor_config_id.is_(None)
+        else:
+            config_condition = SensorData.sensor_config_id == sensor_config_id
+
+        raw_days = policy["raw_days"]
+        if raw_days:
+            cutoff = now - timedelta(days=raw_days)
+            result["deleted"]["sensor_data"] += self._delete_chunked(
+                db, SensorData, [config_condition, SensorData.recorded_at < cutoff],
+                "sensor_data", sensor_config_id, dry_run
+            )
+            if sensor_config_id is not None:
+                # Only blocks whose whole day is past the cutoff
+                block_conditions = [
+                    SensorArchiveBlock.sensor_config_id == sensor_config_id,
+                    SensorArchiveBlock.day < _floor_day(cutoff)
+                ]
+                result["deleted"]["archived_readings"] += db.query(
+                    func.coalesce(func.sum(SensorArchiveBlock.row_count), 0)
+                ).filter(*block_conditions).scalar()
+                result["deleted"]["sensor_archive_blocks"] += self._delete_chunked(
+                    db, SensorArchiveBlock, block_conditions, "sensor_archive_blocks", sensor_config_id, dry_run
+                )
+
+        if sensor_config_id is None:
+            return
+        for resolution in RESOLUTIONS:
+            days = policy[f"rollup_{resolution}_days"]
+            if not days:
+                continue
+            result["deleted"]["sensor_rollups"] += self._delete_chunked(
+                db, SensorRollup, [
+                    SensorRollup.sensor_config_id == sensor_config_id,
+                    SensorRollup.resolution == resolution,
+                    SensorRollup.bucket_start < now - timedelta(days=days)
+                ], "sensor_rollups", sensor_config_id, dry_run
+            )
+
+    @staticmethod
+    def _archivable(db: Session, policies: Dict[int, Dict[str, Any]], now: datetime) -> int:
+        """Readings a real pass would archive: whole days past the archive age that don't expire first."""
+        archive_cutoff = _floor_day(now - timedelta(days=IOT_ARCHIVE_AFTER_DAYS))
+        total = 0
+        for config_id, policy in policies.items():
+            conditions = [SensorData.sensor_config_id == config_id, SensorData.recorded_at < archive_cutoff]
+            if policy["raw_days"]:
+                conditions.append(SensorData.recorded_at >= now - timedelta(days=policy["raw_days"]))
+            total += db.query(func.count(SensorData.id)).filter(*conditions).scalar()
+        return total
+
+    def run(self, db: Session, dry_run: bool = False, sensor_config_id: Optional[int] = None,
+            compact: bool = True) -> Dict[str, Any]:
+        """
+        One retention pass: expire, then compact, then vacuum.
+
+        A dry run counts what would be deleted and archived without changing
+        anything. Only one pass runs at a time; a concurrent call returns
+        {"status": "busy"}.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return {"status": "busy"}
+        started_at = time.perf_counter()
+        now = datetime.now()
+        result: Dict[str, Any] = {
+            "status": "ok",
+            "dry_run": dry_run,
+            "deleted": {"sensor_data": 0, "sensor_archive_blocks": 0, "archived_readings": 0, "sensor_rollups": 0},
+            "archived": 0,
+            "pages_freed": 0
+        }
+        try:
+            policies = self.policies(db, sensor_config_id)
+            result["sensors"] = len(policies)
+            for config_id, policy in policies.items():
+                self._expire_sensor(db, config_id, policy, now, result, dry_run)
+            if sensor_config_id is None:
+                self._expire_sensor(db, None, resolve_policy(), now, result, dry_run)
+
+            # Compact what is left after expiry, so nothing is archived only to be dropped
+            if compact and IOT_ARCHIVE_AFTER_DAYS > 0 and not self._stopping.is_set():
+                if dry_run:
+                    result["archived"] = self._archivable(db, policies, now)
+                else:
+                    result["archived"] = sensor_archive_service.archive(
+                        db, IOT_ARCHIVE_AFTER_DAYS, sensor_config_id
+                    )["moved"]
+
+            if not dry_run:
+                result["pages_freed"] = self.incremental_vacuum(db)
+
+            result["duration_seconds"] = round(time.perf_counter() - started_at, 3)
+            if not dry_run:
+                self.runs += 1
+                self.last_run_at = now
+                self.last_duration_seconds = result["duration_seconds"]
+                self.last_result = result
+                self.last_error = None
+                logger.info(f"Sensor retention pass: {result}")
+            return result
+        except Exception as e:
+            db.rollback()
+            self.failed_runs += 1
+            self.last_error = str(e)
+            raise
+        finally:
+            self.progress = None
+            self._run_lock.release()
+
+    # ------------------------------------------------------------------
+    # Vacuum
+    # ------------------------------------------------------------------
+
+    def incremental_vacuum(self, db: Session) -> int:
+        """Return up to vacuum_pages free pages to the filesystem; needs auto_vacuum=INCREMENTAL."""
+        bind = db.get_bind()
+        if bind.dialect.name != "sqlite" or self.vacuum_pages <= 0:
+            return 0
+        with bind.connect() as connection:
+            if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != _AUTO_VACUUM_INCREMENTAL:
+                if not self._warned_vacuum:
+                    logger.info("SQLite auto_vacuum is not INCREMENTAL; run apply_sensor_retention.py "
+                                "--enable-incremental-vacuum once to let retention shrink the file")
+                    self._warned_vacuum = True
+                return 0
+            free_before = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+            # executescript steps the pragma to completion; a plain execute frees a single page
+            connection.connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})"
+            )
+            freed = free_before - connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        self.pages_freed += freed
+        return freed
+
+    @staticmethod
+    def enable_incremental_vacuum(bind=engine):
+        """Switch the database to auto_vacuum=INCREMENTAL; rewrites the whole file once (full VACUUM)."""
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+
+    # ------------------------------------------------------------------
+    # Scheduler
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the background thread that runs a pass every interval."""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="sensor-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the thread; a pass in progress stops after its current chunk."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        delay = STARTUP_DELAY_SECONDS
+        while not self._stopping.wait(delay):
+            db = SessionLocal()
+            try:
+                self.run(db)
+            except Exception as e:
+                logger.error(f"Sensor retention pass failed: {str(e)}")
+            finally:
+                db.close()
+            delay = self.interval_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduler_running": self.running,
+            "interval_hours": self.interval_seconds / 3600,
+            "runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "deleted_total": dict(self.deleted_total),
+            "chunks": self.chunks,
+            "pages_freed": self.pages_freed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "in_progress": self.progress
+        }
+
+
+# Global retention service instance
+sensor_retention_service = SensorRetentionService()
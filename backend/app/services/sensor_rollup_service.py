@@ -0,0 +1,272 @@
+"""
+Time-bucketed rollups of sensor readings.
+Every batch written to sensor_data is folded into 1-minute, 1-hour and 1-day
+buckets (count/min/max/sum/last per metric) in the same transaction, so history
+queries read a few hundred rollup rows instead of scanning raw readings. The
+rebuild path recomputes buckets from sensor_data (and archived readings) for
+backfills and repairs.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+from sqlalchemy import case, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.sensor import SensorData, SensorRollup
+from app.core.config import IOT_RETENTION_TIERS, IOT_RETENTION_DEFAULT_TIER
+from .sensor_archive_service import sensor_archive_service
+
+logger = logging.getLogger(__name__)
+
+# Bucket widths in seconds, finest first
+RESOLUTIONS = {
+    "1m": 60,
+    "1h": 3600,
+    "1d": 86400
+}
+
+# Numeric sensor_data columns that are rolled up
+ROLLUP_METRICS = [
+    "temperature", "humidity", "light_intensity", "soil_moisture", "soil_ph",
+    "water_level", "water_flow_rate", "atmospheric_pressure", "uv_index",
+    "battery_level", "signal_strength"
+]
+
+# Raw rows read per chunk when rebuilding
+REBUILD_CHUNK_SIZE = 5000
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    """Floor a (naive local) timestamp to the start of its bucket."""
+    if resolution == "1m":
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == "1h":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if resolution == "1d":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def _retained(resolution: str, start: datetime) -> bool:
+    """Whether the default retention tier still keeps this resolution's buckets from `start`."""
+    days = IOT_RETENTION_TIERS[IOT_RETENTION_DEFAULT_TIER].get(f"rollup_{resolution}_days", 0)
+    return not days or start >= datetime.now() - timedelta(days=days)
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int) -> str:
+    """
+    Pick the finest resolution that covers the range in at most max_points
+    buckets (1d at most), skipping resolutions already expired at `start`.
+    """
+    step_seconds = (end - start).total_seconds() / max(1, max_points)
+    for resolution, seconds in RESOLUTIONS.items():
+        if seconds >= step_seconds and _retained(resolution, start):
+            return resolution
+    return "1d"
+
+
+class SensorRollupService:
+    """Maintains and queries the sensor_rollups table."""
+
+    @staticmethod
+    def aggregate(rows: Iterable[Dict[str, Any]]) -> Dict[Tuple, List]:
+        """
+        Fold sensor_data rows into buckets in memory.
+
+        Returns {(config_id, resolution, metric, bucket_start): [count, min, max, sum, last, last_at]}
+        """
+        buckets: Dict[Tuple, List] = {}
+        for row in rows:
+            recorded_at = row.get("recorded_at")
+            config_id = row.get("sensor_config_id")
+            if recorded_at is None or config_id is None:
+                continue
+            starts = {resolution: bucket_start(recorded_at, resolution) for resolution in RESOLUTIONS}
+            for metric in ROLLUP_METRICS:
+                value = row.get(metric)
+                if value is None:
+                    continue
+                for resolution, start in starts.items():
+                    key = (config_id, resolution, metric, start)
+                    bucket = buckets.get(key)
+                    if bucket is None:
+                        buckets[key] = [1, value, value, value, value, recorded_at]
+                        continue
+                    bucket[0] += 1
+                    bucket[1] = min(bucket[1], value)
+                    bucket[2] = max(bucket[2], value)
+                    bucket[3] += value
+                    if recorded_at >= bucket[5]:
+                        bucket[4] = value
+                        bucket[5] = recorded_at
+        return buckets
+
+    @staticmethod
+    def _upsert(db: Session, buckets: Dict[Tuple, List]):
+        if not buckets:
+            return
+        values = [
+            {
+                "sensor_config_id": config_id,
+                "resolution": resolution,
+                "metric": metric,
+                "bucket_start": start,
+                "count": count,
+                "min_value": min_value,
+                "max_value": max_value,
+                "sum_value": sum_value,
+                "last_value": last_value,
+                "last_recorded_at": last_at
+            }
+            for (config_id, resolution, metric, start), (count, min_value, max_value, sum_value, last_value, last_at)
+            in buckets.items()
+        ]
+
+        statement = sqlite_insert(SensorRollup)
+        excluded = statement.excluded
+        newer = excluded.last_recorded_at >= SensorRollup.last_recorded_at
+        statement = statement.on_conflict_do_update(
+            index_elements=["sensor_config_id", "resolution", "metric", "bucket_start"],
+            set_={
+                "count": SensorRollup.count + excluded.count,
+                "min_value": case((excluded.min_value < SensorRollup.min_value, excluded.min_value), else_=SensorRollup.min_value),
+                "max_value": case((excluded.max_value > SensorRollup.max_value, excluded.max_value), else_=SensorRollup.max_value),
+                "sum_value": SensorRollup.sum_value + excluded.sum_value,
+                "last_value": case((newer, excluded.last_value), else_=SensorRollup.last_value),
+                "last_recorded_at": case((newer, excluded.last_recorded_at), else_=SensorRollup.last_recorded_at)
+            }
+        )
+        db.execute(statement, values)
+
+    def apply(self, db: Session, rows: List[Dict[str, Any]]):
+        """Fold newly inserted rows into their buckets; the caller commits."""
+        self._upsert(db, self.aggregate(rows))
+
+    def rebuild(self, db: Session, sensor_config_id: Optional[int] = None,
+                start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        """
+        Recompute rollups from sensor_data and the archive blocks.
+
+        The range is widened to whole days so no bucket is left half-built.
+        Pass `start` once retention has dropped old raw readings: buckets
+        before it are kept, and rebuilding them would lose what they hold.
+        Returns the number of raw readings folded in.
+        """
+        if start is not None:
+            start = bucket_start(start, "1d")
+        if end is not None:
+            end = bucket_start(end, "1d") + timedelta(days=1)
+
+        purge = delete(SensorRollup)
+        raw = db.query(SensorData).order_by(SensorData.recorded_at)
+        if sensor_config_id is not None:
+            purge = purge.where(SensorRollup.sensor_config_id == sensor_config_id)
+            raw = raw.filter(SensorData.sensor_config_id == sensor_config_id)
+        if start is not None:
+            purge = purge.where(SensorRollup.bucket_start >= start)
+            raw = raw.filter(SensorData.recorded_at >= start)
+        if end is not None:
+            purge = purge.where(SensorRollup.bucket_start < end)
+            raw = raw.filter(SensorData.recorded_at < end)
+
+        db.execute(purge)
+
+        columns = ["sensor_config_id", "recorded_at"] + ROLLUP_METRICS
+        query = raw.with_entities(*(getattr(SensorData, column) for column in columns))
+        processed = 0
+        chunk = []
+        for record in query.yield_per(REBUILD_CHUNK_SIZE):
+            chunk.append(dict(zip(columns, record)))
+            if len(chunk) >= REBUILD_CHUNK_SIZE:
+                self.apply(db, chunk)
+                processed += len(chunk)
+                chunk = []
+        if chunk:
+            self.apply(db, chunk)
+            processed += len(chunk)
+
+        # Readings already moved to the archive tier
+        for rows in sensor_archive_service.iter_archived_rows(db, sensor_config_id, start, end):
+            self.apply(db, rows)
+            processed += len(rows)
+
+        db.commit()
+        logger.info(f"Rebuilt sensor rollups from {processed} readings")
+        return processed
+
+    def _merged_buckets(self, db: Session, start: datetime, end: datetime, resolution: str,
+                        sensor_config_ids: Optional[List[int]], metrics: List[str]) -> Dict[datetime, Dict[str, List]]:
+        query = db.query(SensorRollup).filter(
+            SensorRollup.resolution == resolution,
+            SensorRollup.metric.in_(metrics),
+            SensorRollup.bucket_start >= bucket_start(start, resolution),
+            SensorRollup.bucket_start < end
+        )
+        if sensor_config_ids is not None:
+            query = query.filter(SensorRollup.sensor_config_id.in_(sensor_config_ids))
+
+        merged: Dict[datetime, Dict[str, List]] = {}
+        for rollup in query.order_by(SensorRollup.bucket_start).all():
+            bucket = merged.setdefault(rollup.bucket_start, {})
+            current = bucket.get(rollup.metric)
+            if current is None:
+                bucket[rollup.metric] = [
+                    rollup.count, rollup.min_value, rollup.max_value,
+                    rollup.sum_value, rollup.last_value, rollup.last_recorded_at
+                ]
+                continue
+            current[0] += rollup.count
+            current[1] = min(current[1], rollup.min_value)
+            current[2] = max(current[2], rollup.max_value)
+            current[3] += rollup.sum_value
+            if rollup.last_recorded_at >= current[5]:
+                current[4] = rollup.last_value
+                current[5] = rollup.last_recorded_at
+        return merged
+
+    def query(self, db: Session, start: datetime, end: datetime,
+              sensor_config_ids: Optional[List[int]] = None, metrics: Optional[List[str]] = None,
+              resolution: Optional[str] = None, max_points: int = 500) -> Dict[str, Any]:
+        """
+        Read aggregated buckets for a time range.
+
+        Buckets of several sensors are merged when more than one (or None = all)
+        config id is given. The resolution defaults to the finest one that
+        keeps the range within max_points buckets. The first bucket may start
+        before `start`, since buckets are read whole.
+        """
+        resolution = resolution or choose_resolution(start, end, max_points)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+        merged = self._merged_buckets(db, start, end, resolution, sensor_config_ids, metrics or ROLLUP_METRICS)
+        buckets = [
+            {
+                "bucket_start": start_at,
+                "metrics": {
+                    metric: {
+                        "count": count,
+                        "min": min_value,
+                        "max": max_value,
+                        "mean": round(sum_value / count, 3),
+                        "last": last_value
+                    }
+                    for metric, (count, min_value, max_value, sum_value, last_value, _) in values.items()
+                }
+            }
+            for start_at, values in merged.items()
+        ]
+
+        return {
+            "resolution": resolution,
+            "bucket_seconds": RESOLUTIONS[resolution],
+            "start": start,
+            "end": end,
+            "buckets": buckets
+        }
+
+
+# Global rollup service instance
+sensor_rollup_service = SensorRollupService()
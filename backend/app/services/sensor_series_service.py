@@ -0,0 +1,137 @@
+"""
+Downsampled sensor time series for charts.
+Raw readings for a time range are reduced server-side to a target point count
+per metric, either with Largest-Triangle-Three-Buckets (keeps the visual shape)
+or min/max per pixel bucket (keeps every peak and trough), and returned as
+parallel timestamp/value arrays.
+"""
+
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+from sqlalchemy.orm import Session
+
+from .sensor_archive_service import sensor_archive_service, micros_to_datetimes
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+# Metrics charted by the dashboard when none are requested
+DEFAULT_SERIES_METRICS = ["temperature", "humidity", "soil_moisture", "water_level"]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that best
+    preserve the shape of the series. x must be sorted ascending.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # The next bucket's average is the third triangle vertex
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Min/max decimation: split the time range into (threshold - 2) / 2
+    equal-width buckets and keep the lowest and highest point of each, plus
+    both ends.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    bucket_count = (threshold - 2) // 2
+    edges = np.linspace(x[0], x[-1], bucket_count + 1)
+    boundaries = np.searchsorted(x, edges[1:-1], side="left")
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [n]))
+
+    selected = [0, n - 1]
+    for start, end in zip(starts, ends):
+        if end <= start:
+            continue
+        segment = y[start:end]
+        selected.append(start + int(np.argmin(segment)))
+        selected.append(start + int(np.argmax(segment)))
+
+    return np.unique(np.array(selected, dtype=np.int64))
+
+
+class SensorSeriesService:
+    """Reads raw readings and returns per-metric downsampled columns."""
+
+    @staticmethod
+    def downsample(timestamps: np.ndarray, values: np.ndarray, points: int, method: str = "lttb") -> np.ndarray:
+        """Return the indices to keep for one metric."""
+        if method == "minmax":
+            return minmax_indices(timestamps, values, points)
+        return lttb_indices(timestamps, values, points)
+
+    def build(self, db: Session, start: datetime, end: datetime,
+              sensor_config_ids: Optional[List[int]] = None, metrics: Optional[List[str]] = None,
+              points: int = 500, method: str = "lttb") -> Dict[str, Any]:
+        """
+        Downsample every requested metric over [start, end] to at most `points` points.
+
+        Timestamps are epoch milliseconds. Readings without a value for a metric
+        are skipped for that metric only. Archived days are read from their
+        columnar blocks. sensor_config_ids limits the series to those sensors.
+        """
+        metrics = metrics or DEFAULT_SERIES_METRICS
+
+        columns = sensor_archive_service.read_columns(db, start, end, columns=metrics,
+                                                      sensor_config_ids=sensor_config_ids)
+        timestamps = np.array(
+            [recorded_at.timestamp() * 1000 for recorded_at in micros_to_datetimes(columns["recorded_at"])],
+            dtype=np.float64
+        )
+        series = {}
+        for metric in metrics:
+            # Missing values are NaN and get dropped
+            values = columns[metric]
+            present = ~np.isnan(values)
+            metric_timestamps = timestamps[present]
+            metric_values = values[present]
+
+            keep = self.downsample(metric_timestamps, metric_values, points, method)
+            series[metric] = {
+                "t": metric_timestamps[keep].astype(np.int64).tolist(),
+                "v": np.round(metric_values[keep], 3).tolist()
+            }
+
+        return {
+            "start": start,
+            "end": end,
+            "method": method,
+            "points": points,
+            "raw_count": len(timestamps),
+            "series": series
+        }
+
+
+# Global series service instance
+sensor_series_service = SensorSeriesService()
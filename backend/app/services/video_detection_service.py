@@ -1,17 +1,24 @@
 import cv2
 import numpy as np
 import os
-import tempfile
+import queue
 import subprocess
 import threading
 from typing import Generator, Dict, List, Tuple, Optional
-from ultralytics import YOLO
 import logging
 import time
+from app.core.config import (
+    DETECTION_VIDEO_QUEUE_SIZE, DETECTION_VIDEO_BATCH_SIZE, DETECTION_ADAPTIVE_SAMPLING,
+    DETECTION_SAMPLER_CHANGE_THRESHOLD, DETECTION_SAMPLER_MIN_INTERVAL, DETECTION_SAMPLER_MAX_INTERVAL
+)
 from .detection_service import PlantDiseaseDetector
+from .frame_sampler import AdaptiveFrameSampler, shift_detections
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of the frame stream between pipeline stages
+_END_OF_STREAM = object()
+
 class VideoPlantDiseaseDetector(PlantDiseaseDetector):
     """Extended detector for video and real-time processing"""
     
@@ -67,20 +74,131 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
             logger.error(f"Error during video conversion: {str(e)}")
             return False
 
-    def process_video_file(self, video_path: str, output_path: str, frame_skip: int = 5) -> Generator[Dict, None, None]:
+    def _open_video_writer(self, output_path: str, fps: int, width: int, height: int) -> Tuple[cv2.VideoWriter, str]:
+        """Open a VideoWriter with the most browser-friendly codec available."""
+        # Try different codecs in order of preference
+        codecs_to_try = [
+            ('H264', 'H.264 - best browser compatibility'),
+            ('avc1', 'H.264 alternative'),  
+            ('mp4v', 'MPEG-4 fallback'),
+            ('MJPG', 'Motion JPEG fallback')
+        ]
+        
+        for codec, description in codecs_to_try:
+            out = None
+            try:
+                fourcc = cv2.VideoWriter_fourcc(*codec)
+                out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+                # Test if the writer was successfully created
+                if out.isOpened():
+                    logger.info(f"Using codec: {codec} ({description})")
+                    return out, codec
+                out.release()
+            except Exception as e:
+                if out:
+                    out.release()
+                logger.debug(f"Codec {codec} failed: {str(e)}")
+        
+        raise ValueError("Could not initialize video writer with any supported codec")
+
+    @staticmethod
+    def _put(target_queue: queue.Queue, item, stop_event: threading.Event) -> bool:
+        """Blocking put that gives up when the pipeline is stopped."""
+        while not stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_stage(self, cap: cv2.VideoCapture, frame_queue: queue.Queue,
+                      stop_event: threading.Event, errors: List[Exception]):
+        """Decode thread: reads frames and feeds the inference stage."""
+        frame_count = 0
+        try:
+            while not stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frame_count += 1
+                if not self._put(frame_queue, (frame_count, frame), stop_event):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            self._put(frame_queue, _END_OF_STREAM, stop_event)
+
+    def _encode_stage(self, out: cv2.VideoWriter, write_queue: queue.Queue,
+                      stop_event: threading.Event, errors: List[Exception]):
+        """Encode thread: writes finished frames to the output video in order."""
+        try:
+            while True:
+                try:
+                    frame = write_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop_event.is_set():
+                        break
+                    continue
+                if frame is _END_OF_STREAM:
+                    break
+                out.write(frame)
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    def _infer_batch(self, batch: List[Tuple[int, np.ndarray]], conf_threshold: Optional[float]) -> List[Tuple[np.ndarray, Optional[List[Dict]]]]:
+        """
+        Run inference for a batch of sampled frames.
+
+        All frames are submitted before any result is awaited, so the
+        micro-batcher can run them as a single forward pass.
+        """
+        futures = [self.submit_inference(frame, conf_threshold) for _, frame in batch]
+        results = []
+        for (frame_number, frame), future in zip(batch, futures):
+            try:
+                boxes, scores, classes = future.result()
+                results.append(self._build_result(frame.copy(), boxes, scores, classes))
+            except Exception as e:
+                logger.error(f"Error processing frame {frame_number}: {str(e)}")
+                results.append((frame, None))  # Write original frame on error
+        return results
+
+    def process_video_file(self, video_path: str, output_path: str, frame_skip: int = 5,
+                           conf_threshold: Optional[float] = None,
+                           adaptive_sampling: Optional[bool] = None) -> Generator[Dict, None, None]:
         """
         Process a video file frame by frame with disease detection.
+
+        Decoding and encoding run on their own threads, joined to the
+        inference stage by bounded queues, so a slow stage applies
+        backpressure instead of buffering the whole video in memory.
+        Sampled frames are inferred in batches; a batch also runs early once
+        DETECTION_VIDEO_QUEUE_SIZE frames are waiting on it, so a still scene
+        can't pile up frames between two samples.
+
+        With adaptive sampling, YOLO only runs on frames whose content changed
+        noticeably since the last inferred frame; skipped frames reuse the
+        last boxes, shifted by the estimated camera motion.
         
         Args:
             video_path: Path to input video file
             output_path: Path to save processed video
-            frame_skip: Process every nth frame for efficiency
+            frame_skip: Process every nth frame (used when adaptive sampling is off)
+            conf_threshold: Confidence threshold (defaults to the detector's)
+            adaptive_sampling: Sample on scene change (defaults to DETECTION_ADAPTIVE_SAMPLING)
             
         Yields:
-            Progress updates with detection results
+            Progress updates with detection results; a stop_stream() call, even
+            one made before the first frame, ends with a "cancelled" event
         """
         self.is_processing = True
-        self.stop_processing = False
+        
+        stop_event = threading.Event()
+        threads = []
+        cap = None
+        out = None
         
         try:
             # Open video file
@@ -95,104 +213,161 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             
             # Setup video writer with H.264 codec for better browser compatibility
-            # Try different codecs in order of preference
-            codecs_to_try = [
-                ('H264', 'H.264 - best browser compatibility'),
-                ('avc1', 'H.264 alternative'),  
-                ('mp4v', 'MPEG-4 fallback'),
-                ('MJPG', 'Motion JPEG fallback')
-            ]
-            
-            out = None
-            used_codec = None
-            for codec, description in codecs_to_try:
-                try:
-                    fourcc = cv2.VideoWriter_fourcc(*codec)
-                    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-                    # Test if the writer was successfully created
-                    if out.isOpened():
-                        used_codec = codec
-                        logger.info(f"Using codec: {codec} ({description})")
-                        break
-                    else:
-                        out.release()
-                        out = None
-                except Exception as e:
-                    if out:
-                        out.release()
-                        out = None
-                    logger.debug(f"Codec {codec} failed: {str(e)}")
-                    continue
+            out, used_codec = self._open_video_writer(output_path, fps, width, height)
             
-            if not out or not out.isOpened():
-                raise ValueError("Could not initialize video writer with any supported codec")
-            
-            frame_count = 0
             processed_frames = 0
             detection_history = []
             
+            if adaptive_sampling is None:
+                adaptive_sampling = DETECTION_ADAPTIVE_SAMPLING
+            sampler = AdaptiveFrameSampler(
+                change_threshold=DETECTION_SAMPLER_CHANGE_THRESHOLD,
+                min_interval=DETECTION_SAMPLER_MIN_INTERVAL,
+                max_interval=DETECTION_SAMPLER_MAX_INTERVAL
+            ) if adaptive_sampling else None
+            skipped_frames = 0
+            last_detections: List[Dict] = []
+            
             yield {
                 "status": "started",
                 "total_frames": total_frames,
                 "fps": fps,
-                "dimensions": (width, height)
+                "dimensions": (width, height),
+                "sampling_mode": "adaptive" if sampler else "fixed"
             }
             
-            while cap.isOpened() and not self.stop_processing:
-                ret, frame = cap.read()
-                if not ret:
+            # Start the decode and encode stages
+            frame_queue = queue.Queue(maxsize=DETECTION_VIDEO_QUEUE_SIZE)
+            write_queue = queue.Queue(maxsize=DETECTION_VIDEO_QUEUE_SIZE)
+            errors: List[Exception] = []
+            threads = [
+                threading.Thread(target=self._decode_stage, args=(cap, frame_queue, stop_event, errors),
+                                 name="video-decode", daemon=True),
+                threading.Thread(target=self._encode_stage, args=(out, write_queue, stop_event, errors),
+                                 name="video-encode", daemon=True)
+            ]
+            for thread in threads:
+                thread.start()
+            
+            # Frames waiting for their batch to finish, in display order
+            pending: List[Tuple[int, np.ndarray, bool, Tuple[float, float]]] = []
+            batch: List[Tuple[int, np.ndarray]] = []
+            peak_buffered_frames = 0
+            end_of_stream = False
+            cancelled = False
+            
+            while not end_of_stream:
+                if self.stop_processing:
+                    cancelled = True
                     break
                 
-                frame_count += 1
+                item = frame_queue.get()
+                if item is _END_OF_STREAM:
+                    end_of_stream = True
+                else:
+                    frame_count, frame = item
+                    shift = (0.0, 0.0)
+                    if sampler:
+                        is_sampled, shift, _ = sampler.observe(frame)
+                    else:
+                        # Process every nth frame for efficiency
+                        is_sampled = frame_count % frame_skip == 0
+                    pending.append((frame_count, frame, is_sampled, shift))
+                    peak_buffered_frames = max(peak_buffered_frames, len(pending))
+                    if is_sampled:
+                        batch.append((frame_count, frame))
+                
+                # Bound the frames held back (and the wait for progress) by the queue size
+                if (len(batch) < DETECTION_VIDEO_BATCH_SIZE and len(pending) < DETECTION_VIDEO_QUEUE_SIZE
+                        and not end_of_stream):
+                    continue
+                
+                results = iter(self._infer_batch(batch, conf_threshold))
+                batch = []
+                reported_frame = 0
                 
-                # Process every nth frame for efficiency
-                if frame_count % frame_skip == 0:
+                for frame_count, frame, is_sampled, shift in pending:
+                    if not is_sampled:
+                        skipped_frames += 1
+                        if sampler and last_detections:
+                            # Carry the last boxes forward, following the camera motion
+                            self._draw_detections(frame, shift_detections(last_detections, shift, width, height))
+                        # Write frame without running inference
+                        self._put(write_queue, frame, stop_event)
+                        continue
+                    
+                    processed_frame, detections = next(results)
+                    self._put(write_queue, processed_frame, stop_event)
                     processed_frames += 1
+                    if detections is None:
+                        last_detections = []
+                        continue
+                    last_detections = detections
                     
-                    # Save frame temporarily for detection
-                    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                        cv2.imwrite(temp_file.name, frame)
-                        
-                        # Run detection
-                        try:
-                            processed_frame, detections = self.predict(temp_file.name)
-                            
-                            # Store detection results
-                            frame_data = {
-                                "frame_number": frame_count,
-                                "timestamp": frame_count / fps,
-                                "detections": detections,
-                                "detection_count": len(detections)
-                            }
-                            detection_history.append(frame_data)
-                            
-                            # Write processed frame
-                            out.write(processed_frame)
-                            
-                            # Yield progress update
-                            yield {
-                                "status": "processing",
-                                "frame_number": frame_count,
-                                "processed_frames": processed_frames,
-                                "total_frames": total_frames,
-                                "progress": (frame_count / total_frames) * 100,
-                                "current_detections": detections,
-                                "detection_count": len(detections)
-                            }
-                            
-                        except Exception as e:
-                            logger.error(f"Error processing frame {frame_count}: {str(e)}")
-                            out.write(frame)  # Write original frame on error
-                        
-                        finally:
-                            # Clean up temp file safely
-                            try:
-                                os.unlink(temp_file.name)
-                            except (OSError, PermissionError) as e:
-                                logger.warning(f"Could not delete temp file {temp_file.name}: {str(e)}")
-                else:
-                    # Write original frame without processing
-                    out.write(frame)
+                    # Store detection results
+                    detection_history.append({
+                        "frame_number": frame_count,
+                        "timestamp": frame_count / fps,
+                        "detections": detections,
+                        "detection_count": len(detections)
+                    })
+                    
+                    # Yield progress update
+                    yield {
+                        "status": "processing",
+                        "frame_number": frame_count,
+                        "processed_frames": processed_frames,
+                        "total_frames": total_frames,
+                        "progress": (frame_count / total_frames) * 100,
+                        "current_detections": detections,
+                        "detection_count": len(detections),
+                        "sampled_frames": processed_frames,
+                        "skipped_frames": skipped_frames
+                    }
+                    reported_frame = frame_count
+                
+                if pending and reported_frame < pending[-1][0]:
+                    # The stretch ended on skipped frames; still report how far we got
+                    frame_count = pending[-1][0]
+                    yield {
+                        "status": "processing",
+                        "frame_number": frame_count,
+                        "processed_frames": processed_frames,
+                        "total_frames": total_frames,
+                        "progress": (frame_count / total_frames) * 100,
+                        "current_detections": [],
+                        "detection_count": 0,
+                        "sampled_frames": processed_frames,
+                        "skipped_frames": skipped_frames
+                    }
+                pending = []
+                
+                if errors:
+                    raise errors[0]
+            
+            if cancelled:
+                # Partial output isn't served, so skip the transcode
+                stop_event.set()
+                for thread in threads:
+                    thread.join()
+                yield {
+                    "status": "cancelled",
+                    "total_frames": total_frames,
+                    "processed_frames": processed_frames,
+                    "sampled_frames": processed_frames,
+                    "skipped_frames": skipped_frames,
+                    "detection_history": detection_history,
+                    "total_detections": sum(len(frame["detections"]) for frame in detection_history)
+                }
+                return
+            
+            # Let the encoder drain, then stop the decoder
+            self._put(write_queue, _END_OF_STREAM, stop_event)
+            threads[1].join()
+            stop_event.set()
+            threads[0].join()
+            if errors:
+                raise errors[0]
             
             # Cleanup
             cap.release()
@@ -206,6 +381,10 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
                 "status": "completed",
                 "total_frames": total_frames,
                 "processed_frames": processed_frames,
+                "sampled_frames": processed_frames,
+                "skipped_frames": skipped_frames,
+                "sampling_mode": "adaptive" if sampler else "fixed",
+                "peak_buffered_frames": peak_buffered_frames,
                 "output_path": output_path,
                 "detection_history": detection_history,
                 "total_detections": sum(len(frame["detections"]) for frame in detection_history),
@@ -220,14 +399,24 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
                 "error": str(e)
             }
         finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join(timeout=5)
+            if cap is not None:
+                cap.release()
+            if out is not None:
+                out.release()
             self.is_processing = False
+            self.stop_processing = False
     
-    def process_realtime_stream(self, camera_index: int = 0) -> Generator[Dict, None, None]:
+    def process_realtime_stream(self, camera_index: int = 0,
+                                conf_threshold: Optional[float] = None) -> Generator[Dict, None, None]:
         """
         Process real-time camera stream with disease detection.
         
         Args:
             camera_index: Camera device index (0 for default camera)
+            conf_threshold: Confidence threshold (defaults to the detector's)
             
         Yields:
             Real-time detection results
@@ -267,48 +456,37 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
                 if current_time - last_detection_time >= detection_interval:
                     last_detection_time = current_time
                     
-                    # Save frame temporarily for detection
-                    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                        cv2.imwrite(temp_file.name, frame)
+                    try:
+                        processed_frame, detections = self.predict_frame(frame.copy(), conf_threshold)
+                        
+                        # Convert frame to base64 for transmission
+                        _, buffer = cv2.imencode('.jpg', processed_frame)
+                        frame_b64 = buffer.tobytes()
                         
-                        try:
-                            processed_frame, detections = self.predict(temp_file.name)
-                            
-                            # Convert frame to base64 for transmission
-                            _, buffer = cv2.imencode('.jpg', processed_frame)
-                            frame_b64 = buffer.tobytes()
-                            
-                            yield {
-                                "status": "detection",
-                                "frame_number": frame_count,
-                                "timestamp": current_time,
-                                "detections": detections,
-                                "detection_count": len(detections),
-                                "frame_data": frame_b64
-                            }
-                            
-                        except Exception as e:
-                            logger.error(f"Error in real-time detection: {str(e)}")
-                            # Send original frame on error
-                            _, buffer = cv2.imencode('.jpg', frame)
-                            frame_b64 = buffer.tobytes()
-                            
-                            yield {
-                                "status": "detection",
-                                "frame_number": frame_count,
-                                "timestamp": current_time,
-                                "detections": [],
-                                "detection_count": 0,
-                                "frame_data": frame_b64,
-                                "error": str(e)
-                            }
+                        yield {
+                            "status": "detection",
+                            "frame_number": frame_count,
+                            "timestamp": current_time,
+                            "detections": detections,
+                            "detection_count": len(detections),
+                            "frame_data": frame_b64
+                        }
                         
-                        finally:
-                            # Clean up temp file safely
-                            try:
-                                os.unlink(temp_file.name)
-                            except (OSError, PermissionError) as e:
-                                logger.warning(f"Could not delete temp file {temp_file.name}: {str(e)}")
+                    except Exception as e:
+                        logger.error(f"Error in real-time detection: {str(e)}")
+                        # Send original frame on error
+                        _, buffer = cv2.imencode('.jpg', frame)
+                        frame_b64 = buffer.tobytes()
+                        
+                        yield {
+                            "status": "detection",
+                            "frame_number": frame_count,
+                            "timestamp": current_time,
+                            "detections": [],
+                            "detection_count": 0,
+                            "frame_data": frame_b64,
+                            "error": str(e)
+                        }
                 
                 # Small delay to prevent overwhelming the system
                 time.sleep(0.033)  # ~30 FPS
@@ -328,12 +506,14 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
         """Stop the current processing stream"""
         self.stop_processing = True
     
-    def process_frame_from_bytes(self, frame_bytes: bytes) -> Tuple[bytes, List[Dict]]:
+    def process_frame_from_bytes(self, frame_bytes: bytes,
+                                 conf_threshold: Optional[float] = None) -> Tuple[bytes, List[Dict]]:
         """
         Process a single frame from bytes (for camera snapshots).
         
         Args:
             frame_bytes: Image data as bytes
+            conf_threshold: Confidence threshold (defaults to the detector's)
             
         Returns:
             Processed frame as bytes and detection results
@@ -346,26 +526,14 @@ class VideoPlantDiseaseDetector(PlantDiseaseDetector):
             if frame is None:
                 raise ValueError("Invalid image data")
             
-            # Save temporarily for detection
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                cv2.imwrite(temp_file.name, frame)
-                
-                try:
-                    processed_frame, detections = self.predict(temp_file.name)
-                    
-                    # Convert back to bytes
-                    _, buffer = cv2.imencode('.jpg', processed_frame)
-                    processed_bytes = buffer.tobytes()
-                    
-                    return processed_bytes, detections
-                    
-                finally:
-                    # Clean up temp file safely
-                    try:
-                        os.unlink(temp_file.name)
-                    except (OSError, PermissionError) as e:
-                        logger.warning(f"Could not delete temp file {temp_file.name}: {str(e)}")
-                    
+            processed_frame, detections = self.predict_frame(frame, conf_threshold)
+            
+            # Convert back to bytes
+            _, buffer = cv2.imencode('.jpg', processed_frame)
+            processed_bytes = buffer.tobytes()
+            
+            return processed_bytes, detections
+            
         except Exception as e:
             logger.error(f"Error processing frame from bytes: {str(e)}")
             raise
@@ -0,0 +1,342 @@
+"""
+Background job queue for video disease detection.
+Videos are processed by a bounded worker pool instead of inside the HTTP
+request. Progress is kept as an in-memory event log for live subscribers and
+persisted to the video_detection_jobs table for polling and restarts.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Any, AsyncGenerator
+
+from app.database import SessionLocal
+from app.models.detection import VideoDetectionJob
+from app.core.config import DETECTION_MODEL_PATH, VIDEO_JOB_MAX_WORKERS, VIDEO_JOB_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+# How often running jobs write their progress to the database
+PROGRESS_PERSIST_INTERVAL = 2.0
+
+# Events kept in memory per job for subscribers that reconnect
+EVENT_LOG_SIZE = 500
+
+# Finished jobs whose event logs stay in memory; older ones are served from the database
+MAX_FINISHED_EVENT_LOGS = 100
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many video jobs are already waiting."""
+
+
+class _JobEvents:
+    """Sequenced in-memory event log for one job."""
+
+    def __init__(self):
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+        self.next_seq = 1
+        self.finished = False
+
+    def append(self, event: Dict[str, Any]):
+        self.events.append((self.next_seq, event))
+        self.next_seq += 1
+
+
+class VideoJobManager:
+    """Runs video detection jobs on a bounded worker pool."""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 20):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="video-job")
+        self._lock = threading.Lock()
+        self._events: Dict[str, _JobEvents] = {}
+        self._detectors: Dict[str, Any] = {}
+        self._cancelled: set = set()
+        self._pending = 0
+        self._shutting_down = False
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+
+    def submit(self, db, user_id: int, input_path: str, output_path: str,
+               original_filename: Optional[str] = None, confidence_threshold: float = 0.25,
+               frame_skip: int = 5, adaptive_sampling: Optional[bool] = None) -> VideoDetectionJob:
+        """Create a job record and queue it for processing."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFullError("Too many video jobs are waiting, please try again later")
+            self._pending += 1
+
+        job = VideoDetectionJob(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            original_filename=original_filename,
+            input_path=input_path,
+            output_path=output_path,
+            confidence_threshold=confidence_threshold,
+            frame_skip=frame_skip,
+            adaptive_sampling=adaptive_sampling,
+            status="queued",
+            progress=0.0
+        )
+        try:
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        self._enqueue(job.id)
+        return job
+
+    def _enqueue(self, job_id: str):
+        with self._lock:
+            self._prune_event_logs()
+            log = self._events.setdefault(job_id, _JobEvents())
+            log.append({"status": "queued", "job_id": job_id})
+        self._executor.submit(self._run, job_id)
+
+    def _prune_event_logs(self):
+        finished = [job_id for job_id, log in self._events.items() if log.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_EVENT_LOGS)]:
+            del self._events[job_id]
+
+    def recover_jobs(self) -> int:
+        """Re-queue jobs that were queued or running when the process stopped."""
+        db = SessionLocal()
+        try:
+            jobs = db.query(VideoDetectionJob).filter(
+                VideoDetectionJob.status.in_(["queued", "running"])
+            ).all()
+            recovered = 0
+            for job in jobs:
+                if not os.path.exists(job.input_path):
+                    job.status = "failed"
+                    job.error_message = "Input video is no longer available"
+                    job.completed_at = datetime.now()
+                    continue
+                job.status = "queued"
+                job.progress = 0.0
+                job.processed_frames = 0
+                job.partial_detections = []
+                with self._lock:
+                    self._pending += 1
+                recovered += 1
+            db.commit()
+            for job in jobs:
+                if job.status == "queued":
+                    self._enqueue(job.id)
+            return recovered
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a queued or running job to stop."""
+        with self._lock:
+            self._cancelled.add(job_id)
+            detector = self._detectors.get(job_id)
+        if detector is not None:
+            detector.stop_stream()
+        return True
+
+    def shutdown(self):
+        """Stop accepting work; running jobs are recovered on next start."""
+        with self._lock:
+            self._shutting_down = True
+            detectors = list(self._detectors.values())
+        for detector in detectors:
+            detector.stop_stream()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    def _publish(self, job_id: str, event: Dict[str, Any]):
+        with self._lock:
+            log = self._events.setdefault(job_id, _JobEvents())
+            log.append(event)
+            if event.get("status") in TERMINAL_STATUSES or event.get("status") == "error":
+                log.finished = True
+
+    def _run(self, job_id: str):
+        from app.services.video_detection_service import VideoPlantDiseaseDetector
+
+        with self._lock:
+            self._pending -= 1
+
+        db = SessionLocal()
+        try:
+            job = db.query(VideoDetectionJob).filter(VideoDetectionJob.id == job_id).first()
+            if job is None:
+                return
+
+            if job_id in self._cancelled:
+                self._finish(db, job, "cancelled", error_message="Cancelled before start")
+                return
+
+            job.status = "running"
+            job.started_at = datetime.now()
+            db.commit()
+
+            detector = VideoPlantDiseaseDetector(model_path=DETECTION_MODEL_PATH)
+            with self._lock:
+                self._detectors[job_id] = detector
+                if job_id in self._cancelled:
+                    detector.stop_stream()
+
+            partial_detections: List[Dict] = []
+            last_persisted = 0.0
+
+            for event in detector.process_video_file(
+                job.input_path, job.output_path, job.frame_skip,
+                job.confidence_threshold, job.adaptive_sampling
+            ):
+                event = dict(event, job_id=job_id)
+                status = event.get("status")
+
+                if status == "started":
+                    job.total_frames = event.get("total_frames", 0)
+                elif status == "processing":
+                    job.progress = event.get("progress", 0.0)
+                    job.processed_frames = event.get("processed_frames", 0)
+                    if event.get("current_detections"):
+                        partial_detections.append({
+                            "frame_number": event["frame_number"],
+                            "detections": event["current_detections"],
+                            "detection_count": event["detection_count"]
+                        })
+                elif status == "cancelled":
+                    if self._shutting_down:
+                        # Stopped by shutdown, not the user; stays running so recover_jobs re-queues it
+                        break
+                    # _finish publishes the cancelled event
+                    self._finish(db, job, "cancelled", result=event)
+                    continue
+                elif status == "completed":
+                    job.progress = 100.0
+                    job.processed_frames = event.get("processed_frames", 0)
+                    self._finish(db, job, "completed", result=event)
+                elif status == "error":
+                    self._finish(db, job, "failed", error_message=event.get("error"))
+
+                self._publish(job_id, event)
+
+                # Throttle progress writes so the database isn't hit per frame
+                now = time.monotonic()
+                if status == "processing" and now - last_persisted >= PROGRESS_PERSIST_INTERVAL:
+                    job.partial_detections = list(partial_detections)
+                    db.commit()
+                    last_persisted = now
+
+        except Exception as e:
+            logger.error(f"Video job {job_id} failed: {str(e)}")
+            db.rollback()
+            job = db.query(VideoDetectionJob).filter(VideoDetectionJob.id == job_id).first()
+            if job is not None:
+                self._finish(db, job, "failed", error_message=str(e))
+            self._publish(job_id, {"status": "error", "job_id": job_id, "error": str(e)})
+        finally:
+            with self._lock:
+                self._detectors.pop(job_id, None)
+                self._cancelled.discard(job_id)
+            db.close()
+
+    def _finish(self, db, job: VideoDetectionJob, status: str,
+                result: Optional[Dict] = None, error_message: Optional[str] = None):
+        job.status = status
+        job.completed_at = datetime.now()
+        if result is not None:
+            job.result = {key: value for key, value in result.items() if key != "detection_history"}
+            job.partial_detections = result.get("detection_history")
+        if error_message:
+            job.error_message = error_message
+        db.commit()
+        if status == "cancelled":
+            self._publish(job.id, {"status": "cancelled", "job_id": job.id})
+
+    # ------------------------------------------------------------------
+    # Reading progress
+    # ------------------------------------------------------------------
+
+    def get_events(self, job_id: str, after: int = 0) -> Optional[List]:
+        """Return (seq, event) pairs newer than `after`, or None if the job has no live log."""
+        with self._lock:
+            log = self._events.get(job_id)
+            if log is None:
+                return None
+            return [(seq, event) for seq, event in log.events if seq > after]
+
+    def is_finished(self, job_id: str) -> bool:
+        with self._lock:
+            log = self._events.get(job_id)
+            return log is None or log.finished
+
+    async def subscribe(self, job_id: str, after: int = 0,
+                        poll_interval: float = 0.25) -> AsyncGenerator:
+        """Yield (seq, event) pairs until the job reaches a terminal state."""
+        while True:
+            events = self.get_events(job_id, after)
+            if events is None:
+                return
+            for seq, event in events:
+                after = seq
+                yield seq, event
+            if self.is_finished(job_id) and not self.get_events(job_id, after):
+                return
+            await asyncio.sleep(poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending_jobs": self._pending,
+                "running_jobs": len(self._detectors)
+            }
+
+
+def job_to_dict(job: VideoDetectionJob, include_detections: bool = False) -> Dict[str, Any]:
+    """Serialize a job for API responses."""
+    output_url = None
+    if job.status == "completed" and job.output_path:
+        output_url = "/" + job.output_path.replace("\\", "/").lstrip("/")
+
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress or 0.0,
+        "total_frames": job.total_frames or 0,
+        "processed_frames": job.processed_frames or 0,
+        "original_filename": job.original_filename,
+        "confidence_threshold": job.confidence_threshold,
+        "output_url": output_url,
+        "error_message": job.error_message,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
+    }
+    if include_detections:
+        data["partial_detections"] = job.partial_detections or []
+        data["result"] = job.result
+    return data
+
+
+# Global job manager instance
+video_job_manager = VideoJobManager(
+    max_workers=VIDEO_JOB_MAX_WORKERS,
+    max_pending=VIDEO_JOB_MAX_PENDING
+)
@@ -5,6 +5,20 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.sensor import SensorData, SensorConfig
+from app.services.sensor_analytics_service import sensor_analytics_service, ANOMALY_Z
+from app.services.sensor_latest_store import sensor_latest_store
+from app.services.sensor_alert_engine import sensor_alert_engine
+
+# Farmer-facing alert messages by alert type (<metric>_high / <metric>_low)
+ALERT_MESSAGES = {
+    "temperature_high": "তাপমাত্রা অত্যধিক বেশি ({value}°C)। গাছপালাকে ছায়া দিন।",
+    "temperature_low": "তাপমাত্রা খুব কম ({value}°C)। ঠান্ডার হাত থেকে ফসল রক্ষা করুন।",
+    "humidity_high": "আর্দ্রতা অত্যধিক বেশি ({value}%)। ছত্রাক রোগের ঝুঁকি।",
+    "humidity_low": "আর্দ্রতা কম ({value}%)। পানি স্প্রে করুন।",
+    "soil_moisture_high": "মাটিতে অতিরিক্ত পানি ({value}%)। জল নিষ্কাশনের ব্যবস্থা করুন।",
+    "soil_moisture_low": "মাটির আর্দ্রতা খুব কম ({value}%)। জরুরি সেচ দরকার।",
+    "water_level_low": "পানির ট্যাংক প্রায় খালি ({value}%)। পানি ভর্তি করুন।"
+}
 
 @tool
 def get_latest_sensor_data(sensor_type: Optional[str] = None) -> Dict[str, Any]:
@@ -21,10 +35,11 @@ def get_latest_sensor_data(sensor_type: Optional[str] = None) -> Dict[str, Any]:
         # Get database session
         db = next(get_db())
         
-        # Get the latest sensor data
-        latest_data = db.query(SensorData).order_by(SensorData.recorded_at.desc()).first()
+        # Get the latest sensor data (kept in memory by the ingest path)
+        latest_data = sensor_latest_store.latest_overall(db)
         
         if not latest_data:
+            db.close()
             return {
                 "error": "No sensor data available",
                 "message": "কোনো সেন্সর ডেটা পাওয়া যায়নি। IoT ডিভাইস সংযুক্ত আছে কিনা পরীক্ষা করুন।"
@@ -39,7 +54,7 @@ def get_latest_sensor_data(sensor_type: Optional[str] = None) -> Dict[str, Any]:
             "water_level_percent": latest_data.water_level,
             "device_status": latest_data.device_status,
             "data_quality": latest_data.data_quality,
-            "readings_age_minutes": (datetime.now() - latest_data.recorded_at).total_seconds() / 60,
+            "readings_age_minutes": latest_data.age_minutes(),
             "status": "success"
         }
         
@@ -87,79 +102,51 @@ def get_sensor_history(hours: int = 24, limit: int = 50) -> Dict[str, Any]:
     
     Args:
         hours: Number of hours to look back (default: 24)
-        limit: Maximum number of readings to return (default: 50)
+        limit: Kept for compatibility; statistics cover every reading in the period
     
     Returns:
-        Historical sensor readings with trend analysis
+        Historical sensor statistics with least-squares trends and anomaly counts
     """
     try:
         # Get database session
         db = next(get_db())
         
         # Calculate start time
-        start_time = datetime.now() - timedelta(hours=hours)
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=hours)
         
-        # Get historical data
-        historical_data = db.query(SensorData).filter(
-            SensorData.recorded_at >= start_time
-        ).order_by(SensorData.recorded_at.desc()).limit(limit).all()
+        # Every reading in the window, analysed as arrays in one pass
+        statistics = sensor_analytics_service.window(db, start_time, end_time)
         
-        if not historical_data:
+        if not statistics or not statistics["metrics"]:
+            db.close()
             return {
                 "error": "No historical data available",
                 "message": f"গত {hours} ঘন্টার কোনো ডেটা পাওয়া যায়নি।"
             }
         
-        # Calculate trends and averages
-        temps = [d.temperature for d in historical_data if d.temperature is not None]
-        humidities = [d.humidity for d in historical_data if d.humidity is not None]
-        soil_moistures = [d.soil_moisture for d in historical_data if d.soil_moisture is not None]
-        water_levels = [d.water_level for d in historical_data if d.water_level is not None]
-        
         response = {
             "period_hours": hours,
-            "total_readings": len(historical_data),
-            "latest_reading": historical_data[0].recorded_at.isoformat(),
-            "oldest_reading": historical_data[-1].recorded_at.isoformat(),
+            "total_readings": statistics["readings"],
+            "latest_reading": statistics["last_recorded_at"].isoformat(),
+            "oldest_reading": statistics["first_recorded_at"].isoformat(),
             "status": "success"
         }
         
-        # Calculate averages and trends
-        if temps:
-            response["temperature"] = {
-                "current": temps[0],
-                "average": round(sum(temps) / len(temps), 1),
-                "min": min(temps),
-                "max": max(temps),
-                "trend": "increasing" if len(temps) > 1 and temps[0] > temps[-1] else "decreasing" if len(temps) > 1 else "stable"
-            }
-        
-        if humidities:
-            response["humidity"] = {
-                "current": humidities[0],
-                "average": round(sum(humidities) / len(humidities), 1),
-                "min": min(humidities),
-                "max": max(humidities),
-                "trend": "increasing" if len(humidities) > 1 and humidities[0] > humidities[-1] else "decreasing" if len(humidities) > 1 else "stable"
-            }
-        
-        if soil_moistures:
-            response["soil_moisture"] = {
-                "current": soil_moistures[0],
-                "average": round(sum(soil_moistures) / len(soil_moistures), 1),
-                "min": min(soil_moistures),
-                "max": max(soil_moistures),
-                "trend": "increasing" if len(soil_moistures) > 1 and soil_moistures[0] > soil_moistures[-1] else "decreasing" if len(soil_moistures) > 1 else "stable"
-            }
-        
-        if water_levels:
-            response["water_level"] = {
-                "current": water_levels[0],
-                "average": round(sum(water_levels) / len(water_levels), 1),
-                "min": min(water_levels),
-                "max": max(water_levels),
-                "trend": "increasing" if len(water_levels) > 1 and water_levels[0] > water_levels[-1] else "decreasing" if len(water_levels) > 1 else "stable"
+        # Averages, spread and least-squares trends
+        for metric, stats in statistics["metrics"].items():
+            response[metric] = {
+                "current": stats["current"],
+                "average": round(stats["mean"], 1),
+                "min": stats["min"],
+                "max": stats["max"],
+                "median": stats["percentiles"]["p50"],
+                "change_per_hour": stats["slope_per_hour"],
+                "trend": stats["trend"],
+                "anomalies": stats["anomalies"]
             }
+            if abs(stats["current_zscore"]) >= ANOMALY_Z:
+                response[metric]["current_is_anomaly"] = True
         
         # Add trend analysis advice
         trend_advice = []
@@ -173,6 +160,10 @@ def get_sensor_history(hours: int = 24, limit: int = 50) -> Dict[str, Any]:
         if response.get("water_level", {}).get("trend") == "decreasing":
             trend_advice.append("পানির স্তর কমছে। পানি সংরক্ষণের ব্যবস্থা নিন।")
         
+        anomalous = [metric for metric in statistics["metrics"] if response[metric].get("current_is_anomaly")]
+        if anomalous:
+            trend_advice.append(f"সর্বশেষ রিডিং অস্বাভাবিক ({', '.join(anomalous)})। সেন্সর ও জমি পরীক্ষা করুন।")
+        
         if trend_advice:
             response["trend_advice"] = trend_advice
         
@@ -190,7 +181,11 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                      threshold_humidity_high: float = 85, threshold_humidity_low: float = 40,
                      threshold_soil_low: float = 30, threshold_water_low: float = 20) -> Dict[str, Any]:
     """
-    Check for sensor alerts based on configurable thresholds.
+    Check for sensor alerts.
+    
+    Sensors with alert thresholds configured are watched continuously as
+    readings arrive; their active alerts are returned. When no sensor has
+    thresholds configured, the latest reading is checked against the limits below.
     
     Args:
         threshold_temp_high: High temperature alert threshold (default: 35°C)
@@ -204,8 +199,40 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
         List of active alerts and recommendations
     """
     try:
-        # Get latest sensor data
-        latest_result = get_latest_sensor_data()
+        # Active alerts kept by the alert engine for sensors with configured thresholds
+        db = next(get_db())
+        watched = [
+            config_id for (config_id,) in db.query(SensorConfig.id).filter(
+                SensorConfig.is_active == True,
+                SensorConfig.alert_thresholds.isnot(None)
+            )
+        ]
+        active = sensor_alert_engine.active_alerts(db, watched) if watched else []
+        db.close()
+        
+        if watched:
+            alerts = [
+                {
+                    "type": alert.alert_type,
+                    "severity": alert.severity,
+                    "message": ALERT_MESSAGES.get(alert.alert_type, alert.describe()).format(value=alert.value),
+                    "value": alert.value,
+                    "threshold": alert.threshold,
+                    "since": alert.raised_at.isoformat() if alert.raised_at else None
+                }
+                for alert in active
+            ]
+            return {
+                "alerts": alerts,
+                "alert_count": len(alerts),
+                "critical_alerts": [a for a in alerts if a["severity"] == "critical"],
+                "status": "success",
+                "timestamp": datetime.now().isoformat(),
+                "message": "কোনো সতর্কতা নেই। সব স্বাভাবিক আছে।" if not alerts else f"{len(alerts)}টি সতর্কতা পাওয়া গেছে।"
+            }
+        
+        # No thresholds configured: check the latest reading against the given limits
+        latest_result = get_latest_sensor_data.invoke({})
         
         if "error" in latest_result:
             return latest_result
@@ -219,7 +246,7 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                 alerts.append({
                     "type": "temperature_high",
                     "severity": "warning",
-                    "message": f"তাপমাত্রা অত্যধিক বেশি ({temp}°C)। গাছপালাকে ছায়া দিন।",
+                    "message": ALERT_MESSAGES["temperature_high"].format(value=temp),
                     "value": temp,
                     "threshold": threshold_temp_high
                 })
@@ -227,7 +254,7 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                 alerts.append({
                     "type": "temperature_low", 
                     "severity": "warning",
-                    "message": f"তাপমাত্রা খুব কম ({temp}°C)। ঠান্ডার হাত থেকে ফসল রক্ষা করুন।",
+                    "message": ALERT_MESSAGES["temperature_low"].format(value=temp),
                     "value": temp,
                     "threshold": threshold_temp_low
                 })
@@ -239,7 +266,7 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                 alerts.append({
                     "type": "humidity_high",
                     "severity": "caution",
-                    "message": f"আর্দ্রতা অত্যধিক বেশি ({humidity}%)। ছত্রাক রোগের ঝুঁকি।",
+                    "message": ALERT_MESSAGES["humidity_high"].format(value=humidity),
                     "value": humidity,
                     "threshold": threshold_humidity_high
                 })
@@ -247,7 +274,7 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                 alerts.append({
                     "type": "humidity_low",
                     "severity": "info",
-                    "message": f"আর্দ্রতা কম ({humidity}%)। পানি স্প্রে করুন।",
+                    "message": ALERT_MESSAGES["humidity_low"].format(value=humidity),
                     "value": humidity,
                     "threshold": threshold_humidity_low
                 })
@@ -259,7 +286,7 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                 alerts.append({
                     "type": "soil_moisture_low",
                     "severity": "critical",
-                    "message": f"মাটির আর্দ্রতা খুব কম ({soil}%)। জরুরি সেচ দরকার।",
+                    "message": ALERT_MESSAGES["soil_moisture_low"].format(value=soil),
                     "value": soil,
                     "threshold": threshold_soil_low
                 })
@@ -271,7 +298,7 @@ def get_sensor_alerts(threshold_temp_high: float = 35, threshold_temp_low: float
                 alerts.append({
                     "type": "water_level_low",
                     "severity": "critical",
-                    "message": f"পানির ট্যাংক প্রায় খালি ({water}%)। পানি ভর্তি করুন।",
+                    "message": ALERT_MESSAGES["water_level_low"].format(value=water),
                     "value": water,
                     "threshold": threshold_water_low
                 })
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Run one sensor retention pass: delete raw readings and rollups past each
+sensor's retention (in small committed chunks), archive what is left past
+IOT_ARCHIVE_AFTER_DAYS, then incrementally vacuum. The server runs the same
+pass every IOT_RETENTION_INTERVAL_HOURS; this is for one-off runs and previews.
+
+Usage:
+    python apply_sensor_retention.py [--dry-run] [--sensor-config-id ID] [--no-compact]
+                                     [--chunk-size 500] [--enable-incremental-vacuum]
+"""
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.models, app.models.agenda  # noqa: F401 - registers every model with Base
+from app.database import SessionLocal, create_tables, engine
+from app.models.sensor import SensorData, SensorRollup
+from app.core.config import IOT_RETENTION_CHUNK_SIZE
+from app.services.sensor_retention_service import sensor_retention_service
+
+
+def database_size() -> int:
+    path = engine.url.database
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+def print_sizes(db):
+    print(f"   sensor_data rows: {db.query(SensorData).count()}, rollup rows: {db.query(SensorRollup).count()}, "
+          f"database size: {database_size() / 1e6:.1f} MB")
+
+
+def apply_sensor_retention():
+    parser = argparse.ArgumentParser(description="Expire and compact old sensor history")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted and archived")
+    parser.add_argument("--sensor-config-id", type=int, default=None, help="Only this sensor (default: all)")
+    parser.add_argument("--no-compact", action="store_true", help="Skip archiving readings into columnar blocks")
+    parser.add_argument("--chunk-size", type=int, default=IOT_RETENTION_CHUNK_SIZE,
+                        help=f"Rows deleted per transaction (default: {IOT_RETENTION_CHUNK_SIZE})")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Switch the database to auto_vacuum=INCREMENTAL first (one full VACUUM)")
+    args = parser.parse_args()
+
+    # Creates sensor_retention_policies if it doesn't exist yet
+    create_tables()
+    sensor_retention_service.chunk_size = max(1, args.chunk_size)
+
+    if args.enable_incremental_vacuum:
+        print("🧹 Enabling incremental vacuum (full VACUUM, may take a while)...")
+        sensor_retention_service.enable_incremental_vacuum()
+
+    db = SessionLocal()
+    try:
+        policies = sensor_retention_service.policies(db, args.sensor_config_id)
+        print(f"🚀 {'Previewing' if args.dry_run else 'Applying'} retention for {len(policies)} sensor(s)...")
+        for config_id, policy in policies.items():
+            days = ", ".join(f"{field}={value or 'forever'}" for field, value in policy.items() if field != "tier")
+            print(f"   sensor {config_id}: {policy['tier']} ({days})")
+        print_sizes(db)
+
+        result = sensor_retention_service.run(
+            db, dry_run=args.dry_run, sensor_config_id=args.sensor_config_id, compact=not args.no_compact
+        )
+        deleted = result["deleted"]
+        verb = "Would delete" if args.dry_run else "Deleted"
+        print(f"{'📝' if args.dry_run else '✅'} {verb} {deleted['sensor_data']} raw readings, "
+              f"{deleted['sensor_archive_blocks']} archive blocks ({deleted['archived_readings']} readings) "
+              f"and {deleted['sensor_rollups']} rollup rows")
+        print(f"   {'Would archive' if args.dry_run else 'Archived'} {result['archived']} readings")
+        if not args.dry_run:
+            print(f"   Freed {result['pages_freed']} pages in {result['duration_seconds']}s")
+            print_sizes(db)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Retention failed: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if apply_sensor_retention() else 1)
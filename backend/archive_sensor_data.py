@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Move old raw sensor readings into compressed per-sensor, per-day archive blocks.
+Rollups are left untouched, and range reads (/sensors/{id}/data, /series)
+merge the blocks back in, so this only changes where the readings are stored.
+
+Usage:
+    python archive_sensor_data.py [--older-than-days 30] [--sensor-config-id ID] [--dry-run] [--vacuum]
+"""
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.models, app.models.agenda  # noqa: F401 - registers every model with Base
+from app.database import SessionLocal, create_tables, engine
+from app.models.sensor import SensorData
+from app.core.config import IOT_ARCHIVE_AFTER_DAYS
+from app.services.sensor_archive_service import sensor_archive_service
+
+
+def database_size() -> int:
+    path = engine.url.database
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+def archive_sensor_data():
+    parser = argparse.ArgumentParser(description="Archive old sensor readings into columnar blocks")
+    parser.add_argument("--older-than-days", type=int, default=IOT_ARCHIVE_AFTER_DAYS,
+                        help=f"Archive whole days older than this (default: {IOT_ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--sensor-config-id", type=int, default=None, help="Only archive this sensor (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file actually shrinks")
+    args = parser.parse_args()
+
+    # Creates sensor_archive_blocks if it doesn't exist yet
+    create_tables()
+
+    db = SessionLocal()
+    try:
+        size_before = database_size()
+        print(f"🚀 Archiving sensor readings older than {args.older_than_days} days...")
+        print(f"   sensor_data rows: {db.query(SensorData).count()}, database size: {size_before / 1e6:.1f} MB")
+
+        started_at = time.perf_counter()
+        result = sensor_archive_service.archive(
+            db, older_than_days=args.older_than_days,
+            sensor_config_id=args.sensor_config_id, dry_run=args.dry_run
+        )
+        elapsed = time.perf_counter() - started_at
+
+        if args.dry_run:
+            print(f"📝 Would archive {result['readings']} readings into {result['blocks']} day blocks")
+            return True
+        print(f"✅ Archived {result['moved']} readings into {result['blocks']} day blocks in {elapsed:.1f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Archiving failed: {e}")
+        return False
+    finally:
+        db.close()
+
+    if args.vacuum:
+        print("🧹 Running VACUUM...")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("VACUUM")
+
+    db = SessionLocal()
+    try:
+        stats = sensor_archive_service.stats(db)
+        print(f"   sensor_data rows: {db.query(SensorData).count()}, database size: {database_size() / 1e6:.1f} MB")
+        print(f"   archive: {stats['readings']} readings in {stats['blocks']} blocks, "
+              f"{stats['bytes'] / 1e6:.2f} MB ({stats['bytes_per_reading']} bytes/reading)")
+    finally:
+        db.close()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if archive_sensor_data() else 1)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Rebuild the sensor_rollups table (1m / 1h / 1d buckets) from raw sensor_data.
+Run this once after upgrading, and again after writing readings outside the
+ingest service (e.g. generate_historical_data.py).
+
+Usage:
+    python backfill_sensor_rollups.py [--sensor-config-id ID] [--days N]
+"""
+import sys
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app.models, app.models.agenda  # noqa: F401 - registers every model with Base
+from app.database import SessionLocal, create_tables
+from app.models.sensor import SensorRollup
+from app.services.sensor_rollup_service import sensor_rollup_service
+
+
+def backfill_sensor_rollups():
+    parser = argparse.ArgumentParser(description="Rebuild sensor rollup buckets from raw readings")
+    parser.add_argument("--sensor-config-id", type=int, default=None, help="Only rebuild this sensor (default: all)")
+    parser.add_argument("--days", type=int, default=None, help="Only rebuild the last N days (default: everything)")
+    args = parser.parse_args()
+
+    # Creates sensor_rollups if it doesn't exist yet
+    create_tables()
+
+    start = datetime.now() - timedelta(days=args.days) if args.days else None
+    db = SessionLocal()
+    try:
+        print("🚀 Rebuilding sensor rollups...")
+        started_at = time.perf_counter()
+        processed = sensor_rollup_service.rebuild(db, sensor_config_id=args.sensor_config_id, start=start)
+        elapsed = time.perf_counter() - started_at
+        buckets = db.query(SensorRollup).count()
+        print(f"✅ Folded {processed} readings into {buckets} rollup rows in {elapsed:.1f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Rollup backfill failed: {e}")
+        return False
+    finally:
+        db.close()
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if backfill_sensor_rollups() else 1)
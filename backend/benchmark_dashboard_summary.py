@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /api/iot/dashboard/sensors summary work for 1 to 500 sensors per user.
+
+Compares the old per-sensor loop (latest row + 24h count query per sensor)
+with the set-based preload of the latest-reading store, cold (empty store)
+and warm. Runs against a scratch SQLite database.
+
+Usage:
+    python benchmark_dashboard_summary.py [--sensor-counts 1 10 100 500] [--readings 288] [--runs 20]
+"""
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import Base
+from app.models.sensor import SensorConfig, SensorData
+from app.services.sensor_latest_store import SensorLatestStore
+
+
+def seed(session, sensor_counts, readings: int):
+    """One user per sensor count, each with that many sensors and `readings` rows per sensor."""
+    now = datetime.now()
+    sensor_id = 0
+    for user_id in sensor_counts:
+        configs = []
+        for _ in range(user_id):
+            sensor_id += 1
+            configs.append({
+                "id": sensor_id, "sensor_id": f"SENSOR_{sensor_id}", "sensor_name": "bench",
+                "sensor_type": "DHT22", "user_id": user_id, "is_active": True
+            })
+        session.bulk_insert_mappings(SensorConfig, configs)
+        session.bulk_insert_mappings(SensorData, [
+            {
+                "sensor_config_id": config["id"],
+                "temperature": random.uniform(15, 40),
+                "device_status": "online" if random.random() > 0.1 else "offline",
+                "recorded_at": now - timedelta(minutes=5 * i, seconds=random.randint(0, 59)),
+                "received_at": now
+            }
+            for config in configs for i in range(readings)
+        ])
+        session.commit()
+    session.connection().exec_driver_sql("ANALYZE")
+
+
+def active_sensors(session, user_id: int):
+    return session.query(SensorConfig).filter(
+        SensorConfig.user_id == user_id,
+        SensorConfig.is_active == True
+    ).all()
+
+
+def per_sensor_summary(session, user_id: int):
+    """The dashboard loop before the store: two queries per sensor."""
+    since = datetime.now() - timedelta(hours=24)
+    summaries = []
+    for sensor in active_sensors(session, user_id):
+        latest = session.query(SensorData).filter(
+            SensorData.sensor_config_id == sensor.id
+        ).order_by(SensorData.recorded_at.desc()).first()
+        count = session.query(SensorData).filter(
+            SensorData.sensor_config_id == sensor.id,
+            SensorData.recorded_at >= since
+        ).count()
+        summaries.append((sensor.id, latest.id if latest else None, count))
+    return summaries
+
+
+def store_summary(session, store: SensorLatestStore, user_id: int):
+    """What get_dashboard_sensors does now."""
+    sensors = active_sensors(session, user_id)
+    store.preload(session, [sensor.id for sensor in sensors])
+    summaries = []
+    for sensor in sensors:
+        latest = store.latest(session, sensor.id)
+        summaries.append((sensor.id, latest.id if latest else None, store.count_24h(session, sensor.id)))
+    return summaries
+
+
+def measure(engine, session, run, runs: int, reset=None):
+    statements = []
+    listener = lambda *args: statements.append(1)  # noqa: E731
+    latencies = []
+    for _ in range(runs):
+        if reset:
+            reset()
+        session.expire_all()
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", listener)
+        started_at = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        event.remove(engine, "before_cursor_execute", listener)
+    return float(np.percentile(latencies, 50)), len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard sensor summaries")
+    parser.add_argument("--sensor-counts", type=int, nargs="+", default=[1, 10, 50, 100, 250, 500],
+                        help="Sensors per user to test")
+    parser.add_argument("--readings", type=int, default=288, help="Readings per sensor (5-minute interval)")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per configuration")
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'dashboard.db')}")
+        Base.metadata.create_all(engine, tables=[SensorConfig.__table__, SensorData.__table__])
+        session = sessionmaker(bind=engine)()
+
+        print(f"🌱 Seeding {sum(args.sensor_counts)} sensors x {args.readings} readings...")
+        seed(session, args.sensor_counts, args.readings)
+
+        print(f"\n{'sensors':>8} | {'per-sensor loop':>20} | {'store, cold':>20} | {'store, warm':>20}")
+        print("-" * 78)
+        for user_id in args.sensor_counts:
+            store = SensorLatestStore()
+            # Same latest rows either way (24h counts may differ at the window edge: the store counts by minute)
+            assert [row[:2] for row in per_sensor_summary(session, user_id)] == \
+                [row[:2] for row in store_summary(session, store, user_id)]
+
+            results = [
+                measure(engine, session, lambda: per_sensor_summary(session, user_id), args.runs),
+                measure(engine, session, lambda: store_summary(session, store, user_id), args.runs,
+                        reset=store.invalidate),
+                measure(engine, session, lambda: store_summary(session, store, user_id), args.runs),
+            ]
+            cells = " | ".join(f"{p50:>8.2f} ms {count:>4} SQL" for p50, count in results)
+            print(f"{user_id:>8} | {cells}")
+
+        session.close()
+        engine.dispose()
+
+    print("\nLatency is the median of the runs; SQL is statements issued per dashboard request.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark detection latency of the ultralytics and ONNX Runtime backends on CPU.
+
+Usage:
+    python benchmark_detection_backends.py [--images DIR] [--runs 50] [--batch-sizes 1 4] [--threads 4]
+
+Models that are missing (e.g. no int8 export yet) are skipped.
+"""
+import sys
+import os
+import glob
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+from app.core.config import DETECTION_MODEL_PATH, DETECTION_ONNX_MODEL_PATH
+from app.services.inference_backends import UltralyticsBackend, OnnxRuntimeBackend
+
+
+def load_images(image_dir: str, count: int = 8):
+    paths = sorted(
+        path for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(image_dir, pattern))
+    )
+    images = [image for image in (cv2.imread(path) for path in paths[:count]) if image is not None]
+    if not images:
+        # Fall back to synthetic frames so the benchmark still runs on a fresh checkout
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(count)]
+    return images
+
+
+def benchmark(backend, images, batch_size: int, runs: int, warmup: int = 3):
+    batch = [images[i % len(images)] for i in range(batch_size)]
+    for _ in range(warmup):
+        backend.predict(batch, 0.25)
+
+    latencies = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        backend.predict(batch, 0.25)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+
+    latencies = np.array(latencies)
+    return {
+        "mean_ms": latencies.mean(),
+        "p50_ms": np.percentile(latencies, 50),
+        "p95_ms": np.percentile(latencies, 95),
+        "images_per_second": batch_size * 1000 / latencies.mean()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection backends")
+    parser.add_argument("--images", default="uploads/images/detection", help="Directory of sample images")
+    parser.add_argument("--runs", type=int, default=50, help="Timed runs per configuration")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4], help="Batch sizes to test")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = all cores)")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    int8_path = os.path.splitext(DETECTION_ONNX_MODEL_PATH)[0] + ".int8.onnx"
+
+    candidates = [
+        ("ultralytics (.pt)", DETECTION_MODEL_PATH, lambda path: UltralyticsBackend(path)),
+        ("onnxruntime fp32", DETECTION_ONNX_MODEL_PATH, lambda path: OnnxRuntimeBackend(path, intra_op_threads=args.threads)),
+        ("onnxruntime int8", int8_path, lambda path: OnnxRuntimeBackend(path, intra_op_threads=args.threads)),
+    ]
+
+    print(f"⏱️  Benchmarking on {len(images)} images, {args.runs} runs each, CPU threads: {os.cpu_count()}")
+    print(f"{'backend':<22}{'batch':>6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'img/s':>9}")
+    print("-" * 67)
+
+    for label, model_path, factory in candidates:
+        if not os.path.exists(model_path):
+            print(f"{label:<22}  skipped (missing {model_path})")
+            continue
+        backend = factory(model_path)
+        for batch_size in args.batch_sizes:
+            result = benchmark(backend, images, batch_size, args.runs)
+            print(f"{label:<22}{batch_size:>6}{result['mean_ms']:>10.1f}{result['p50_ms']:>10.1f}"
+                  f"{result['p95_ms']:>10.1f}{result['images_per_second']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
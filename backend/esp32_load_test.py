@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Load-test the sensor ingest API with a simulated fleet of ESP32 devices.
+
+Every device drifts its readings like ESP32Simulator and sends one every
+--interval seconds (phases spread so the fleet doesn't fire in lockstep),
+either to /api/iot/sensor-data or, with --batch-size > 1, to
+/api/iot/sensor-data/batch once it has that many readings. On top of that:
+
+- reconnect storms: every --storm-every seconds a --storm-fraction of the
+  fleet drops off for --storm-outage seconds, buffering readings, then
+  reconnects at the same moment and flushes its backlog at once
+- out-of-order readings: --out-of-order of the readings carry a timestamp
+  one to five intervals in the past
+- 503 responses are retried after their Retry-After, like the firmware does
+
+The result (throughput, p50/p95/p99 latency, error rates by status) is
+printed and written as JSON to --output. --max-p99-ms and --max-error-rate
+turn it into a pass/fail check for catching regressions before rollout.
+
+Usage:
+    python esp32_load_test.py [--base-url http://localhost:8000] [--devices 1000] [--interval 5]
+                              [--duration 60] [--batch-size 1] [--concurrency 200]
+                              [--storm-every 20] [--storm-fraction 0.3] [--storm-outage 10]
+                              [--out-of-order 0.05] [--register-devices]
+                              [--output esp32_load_test_result.json] [--max-p99-ms 500] [--max-error-rate 0.01]
+"""
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+import numpy as np
+
+from esp32_realtime_simulator import ESP32Simulator
+
+DEVICE_PREFIX = "LOADTEST_"
+
+
+class LoadTestDevice(ESP32Simulator):
+    """One simulated ESP32: the simulator's drifting readings with a controllable timestamp."""
+
+    def __init__(self, base_url: str, device_id):
+        super().__init__(base_url=base_url, device_id=device_id)
+        # Start every device somewhere different
+        self.last_temp = random.uniform(20, 34)
+        self.last_humidity = random.uniform(45, 85)
+        self.last_soil = random.uniform(30, 80)
+        self.last_water = random.uniform(30, 95)
+        self.backlog = []
+        self.offline_until = 0.0
+
+    def reading(self, recorded_at: datetime):
+        data = self.generate_realistic_data()
+        data["timestamp"] = recorded_at.isoformat()
+        return data
+
+
+class LoadTestStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.requests = 0
+        self.readings_sent = 0
+        self.readings_accepted = 0
+        self.retries = 0
+        self.out_of_order = 0
+        self.storms = 0
+        self.storm_readings = 0
+
+    def record(self, latency: float, status, readings: int, accepted: int):
+        self.latencies.append(latency)
+        self.statuses[str(status)] += 1
+        self.requests += 1
+        self.readings_sent += readings
+        self.readings_accepted += accepted
+
+
+async def post_readings(client: httpx.AsyncClient, readings, stats: LoadTestStats, max_retries: int):
+    """Send readings (one, or a batch) and record latency and outcome; 503s are retried."""
+    batch = len(readings) > 1
+    url = "/api/iot/sensor-data/batch" if batch else "/api/iot/sensor-data"
+    body = readings if batch else readings[0]
+
+    for attempt in range(max_retries + 1):
+        started_at = time.perf_counter()
+        try:
+            response = await client.post(url, json=body)
+        except httpx.TimeoutException:
+            stats.record(time.perf_counter() - started_at, "timeout", len(readings), 0)
+            return
+        except httpx.HTTPError as e:
+            stats.record(time.perf_counter() - started_at, type(e).__name__, len(readings), 0)
+            return
+        latency = time.perf_counter() - started_at
+
+        if response.status_code == 503 and attempt < max_retries:
+            stats.retries += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+            continue
+
+        accepted = 0
+        if response.status_code < 300:
+            accepted = response.json().get("inserted", len(readings)) if batch else 1
+        stats.record(latency, response.status_code, len(readings), accepted)
+        return
+
+
+async def run_device(device: LoadTestDevice, client: httpx.AsyncClient, stats: LoadTestStats,
+                     args, deadline: float):
+    # Spread the fleet over the first interval
+    await asyncio.sleep(random.uniform(0, args.interval))
+    while time.monotonic() < deadline:
+        recorded_at = datetime.now(timezone.utc)
+        if random.random() < args.out_of_order:
+            recorded_at -= timedelta(seconds=args.interval * random.randint(1, 5))
+            stats.out_of_order += 1
+        device.backlog.append(device.reading(recorded_at))
+
+        # Offline devices keep buffering; the storm task reconnects them all at once
+        if time.monotonic() >= device.offline_until and len(device.backlog) >= args.batch_size:
+            readings, device.backlog = device.backlog, []
+            await post_readings(client, readings, stats, args.max_retries)
+        await asyncio.sleep(args.interval)
+
+
+async def run_storms(devices, client: httpx.AsyncClient, stats: LoadTestStats, args, deadline: float):
+    """Take part of the fleet offline, then reconnect it in one burst."""
+    while time.monotonic() + args.storm_every < deadline:
+        await asyncio.sleep(args.storm_every)
+        dropped = random.sample(devices, max(1, int(len(devices) * args.storm_fraction)))
+        reconnect_at = time.monotonic() + args.storm_outage
+        for device in dropped:
+            device.offline_until = reconnect_at
+        await asyncio.sleep(args.storm_outage)
+
+        stats.storms += 1
+        flushes = []
+        for device in dropped:
+            readings, device.backlog = device.backlog, []
+            stats.storm_readings += len(readings)
+            if not readings:
+                continue
+            if args.batch_size > 1:
+                flushes.append(post_readings(client, readings, stats, args.max_retries))
+            else:
+                flushes.extend(post_readings(client, [reading], stats, args.max_retries) for reading in readings)
+        await asyncio.gather(*flushes)
+
+
+def register_devices(count: int) -> bool:
+    """Create LOADTEST_ sensor configs in the local database (the server must use the same one)."""
+    import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+    from app.database import SessionLocal
+    from app.models.sensor import SensorConfig
+
+    db = SessionLocal()
+    try:
+        # Load test devices belong to the same user and farm as the default device
+        default_sensor = db.query(SensorConfig).filter(SensorConfig.sensor_id == "ESP32_DEFAULT").first()
+        if not default_sensor:
+            print("❌ No ESP32_DEFAULT sensor config, run init_default_sensor.py first")
+            return False
+        existing = {
+            sensor_id for (sensor_id,) in
+            db.query(SensorConfig.sensor_id).filter(SensorConfig.sensor_id.like(f"{DEVICE_PREFIX}%"))
+        }
+        missing = [
+            {
+                "sensor_id": f"{DEVICE_PREFIX}{index:05d}", "sensor_name": f"Load test {index}",
+                "sensor_type": "DHT22", "user_id": default_sensor.user_id, "farm_id": default_sensor.farm_id,
+                "is_active": True
+            }
+            for index in range(count) if f"{DEVICE_PREFIX}{index:05d}" not in existing
+        ]
+        db.bulk_insert_mappings(SensorConfig, missing)
+        db.commit()
+        print(f"📝 Registered {len(missing)} load test devices ({len(existing)} already existed)")
+        return True
+    finally:
+        db.close()
+
+
+def percentile_ms(latencies, q: float) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 2) if latencies else 0.0
+
+
+def build_result(stats: LoadTestStats, args, started_at: datetime, elapsed: float):
+    failed = sum(count for status, count in stats.statuses.items() if not status.isdigit() or int(status) >= 300)
+    return {
+        "benchmark": "esp32_ingest_load",
+        "started_at": started_at.isoformat(),
+        "duration_seconds": round(elapsed, 2),
+        "config": {
+            "base_url": args.base_url, "devices": args.devices, "interval_seconds": args.interval,
+            "batch_size": args.batch_size, "concurrency": args.concurrency,
+            "storm_every_seconds": args.storm_every, "storm_fraction": args.storm_fraction,
+            "storm_outage_seconds": args.storm_outage, "out_of_order_fraction": args.out_of_order,
+            "registered_devices": args.register_devices
+        },
+        "requests": stats.requests,
+        "readings_sent": stats.readings_sent,
+        "readings_accepted": stats.readings_accepted,
+        "throughput": {
+            "requests_per_second": round(stats.requests / elapsed, 2) if elapsed else 0.0,
+            "readings_per_second": round(stats.readings_accepted / elapsed, 2) if elapsed else 0.0
+        },
+        "latency_ms": {
+            "p50": percentile_ms(stats.latencies, 50),
+            "p95": percentile_ms(stats.latencies, 95),
+            "p99": percentile_ms(stats.latencies, 99),
+            "max": percentile_ms(stats.latencies, 100),
+            "mean": round(float(np.mean(stats.latencies)) * 1000, 2) if stats.latencies else 0.0
+        },
+        "errors": {
+            "failed_requests": failed,
+            "error_rate": round(failed / stats.requests, 4) if stats.requests else 0.0,
+            "retries": stats.retries,
+            "by_status": dict(stats.statuses)
+        },
+        "storms": {"count": stats.storms, "readings_flushed": stats.storm_readings},
+        "out_of_order_readings": stats.out_of_order
+    }
+
+
+async def load_test(args):
+    if args.register_devices and not register_devices(args.devices):
+        return None
+    devices = [
+        LoadTestDevice(args.base_url, f"{DEVICE_PREFIX}{index:05d}" if args.register_devices else None)
+        for index in range(args.devices)
+    ]
+    stats = LoadTestStats()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        try:
+            await client.get("/health")
+        except httpx.HTTPError as e:
+            print(f"❌ Cannot reach backend at {args.base_url}: {e}")
+            return None
+
+        print(f"🚀 {args.devices} devices, a reading every {args.interval}s each, for {args.duration}s")
+        started_at = datetime.now()
+        start = time.monotonic()
+        deadline = start + args.duration
+        tasks = [run_device(device, client, stats, args, deadline) for device in devices]
+        if args.storm_every > 0 and args.storm_fraction > 0:
+            tasks.append(run_storms(devices, client, stats, args, deadline))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    return build_result(stats, args, started_at, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test sensor ingest with a simulated ESP32 fleet")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--devices", type=int, default=1000, help="Simulated devices")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between readings per device")
+    parser.add_argument("--duration", type=float, default=60.0, help="Test length in seconds")
+    parser.add_argument("--batch-size", type=int, default=1, help="Readings per request (>1 uses the batch endpoint)")
+    parser.add_argument("--concurrency", type=int, default=200, help="Maximum open connections")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Request timeout in seconds")
+    parser.add_argument("--max-retries", type=int, default=3, help="Retries of a request answered with 503")
+    parser.add_argument("--storm-every", type=float, default=20.0, help="Seconds between reconnect storms (0 disables)")
+    parser.add_argument("--storm-fraction", type=float, default=0.3, help="Share of the fleet in each storm")
+    parser.add_argument("--storm-outage", type=float, default=10.0, help="Seconds storm devices stay offline")
+    parser.add_argument("--out-of-order", type=float, default=0.05, help="Share of readings with a past timestamp")
+    parser.add_argument("--register-devices", action="store_true",
+                        help="Create a sensor config per device in the local database; otherwise all post as the default device")
+    parser.add_argument("--output", default="esp32_load_test_result.json", help="Where to write the JSON result")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Fail if p99 latency is higher")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Fail if the error rate is higher")
+    args = parser.parse_args()
+    args.batch_size = max(1, args.batch_size)
+
+    result = asyncio.run(load_test(args))
+    if result is None:
+        return False
+
+    latency = result["latency_ms"]
+    print(f"✅ {result['requests']} requests, {result['readings_accepted']}/{result['readings_sent']} readings accepted "
+          f"in {result['duration_seconds']}s")
+    print(f"   throughput: {result['throughput']['requests_per_second']} req/s, "
+          f"{result['throughput']['readings_per_second']} readings/s")
+    print(f"   latency: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, max {latency['max']} ms")
+    print(f"   errors: {result['errors']['error_rate'] * 100:.2f}% {result['errors']['by_status']}, "
+          f"{result['errors']['retries']} retries")
+    print(f"   storms: {result['storms']['count']} ({result['storms']['readings_flushed']} backlogged readings), "
+          f"out-of-order readings: {result['out_of_order_readings']}")
+
+    with open(args.output, "w") as output:
+        json.dump(result, output, indent=2)
+    print(f"📝 Result written to {args.output}")
+
+    ok = True
+    if args.max_p99_ms is not None and latency["p99"] > args.max_p99_ms:
+        print(f"❌ p99 latency {latency['p99']} ms is over {args.max_p99_ms} ms")
+        ok = False
+    if args.max_error_rate is not None and result["errors"]["error_rate"] > args.max_error_rate:
+        print(f"❌ Error rate {result['errors']['error_rate']} is over {args.max_error_rate}")
+        ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
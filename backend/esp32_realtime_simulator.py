@@ -6,8 +6,9 @@ import random
 import math
 
 class ESP32Simulator:
-    def __init__(self, base_url="http://localhost:8000"):
+    def __init__(self, base_url="http://localhost:8000", device_id=None):
         self.base_url = base_url
+        self.device_id = device_id  # None posts as the default ESP32 device
         self.endpoint = f"{base_url}/api/iot/sensor-data/"
         self.running = False
         
@@ -42,7 +43,7 @@ class ESP32Simulator:
         # Calculate heat index (simplified)
         heat_index = self.last_temp + (self.last_humidity - 40) * 0.1
         
-        return {
+        data = {
             "timestamp": datetime.now().isoformat() + "Z",
             "temperature_c": round(self.last_temp, 1),
             "humidity_percent": round(self.last_humidity, 1),
@@ -52,6 +53,9 @@ class ESP32Simulator:
             "soil_moisture_raw": int(self.last_soil * 10),  # Convert to raw sensor reading
             "soil_moisture_percent": int(self.last_soil)
         }
+        if self.device_id:
+            data["device_id"] = self.device_id
+        return data
     
     def send_data(self, data):
         """Send sensor data to the backend"""
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Export the plant disease detector to ONNX for the CPU inference backend.
+
+Usage:
+    python export_detection_model.py                 # writes plantvillage.onnx next to the .pt
+    python export_detection_model.py --int8          # also writes plantvillage.int8.onnx
+    python export_detection_model.py --imgsz 512 --output /models/plantvillage.onnx
+
+Then run the API with DETECTION_BACKEND=onnxruntime (and DETECTION_ONNX_MODEL_PATH
+if the graph is not next to the .pt file).
+"""
+import sys
+import os
+import shutil
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import DETECTION_MODEL_PATH
+
+
+def export_onnx(model_path: str, output_path: str, imgsz: int, opset: int) -> str:
+    """Export .pt weights to ONNX with a dynamic batch dimension."""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task='detect')
+    # dynamic=True keeps the batch axis open so micro-batches run in one call
+    exported_path = model.export(format="onnx", imgsz=imgsz, opset=opset, dynamic=True, simplify=True)
+
+    if os.path.abspath(exported_path) != os.path.abspath(output_path):
+        shutil.move(exported_path, output_path)
+    return output_path
+
+
+def quantize_int8(onnx_path: str, output_path: str) -> str:
+    """Apply dynamic int8 weight quantization, keeping the class-name metadata."""
+    import onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8)
+
+    # The backend reads class names and input size from the model metadata
+    source = onnx.load(onnx_path)
+    quantized = onnx.load(output_path)
+    existing = {prop.key for prop in quantized.metadata_props}
+    for prop in source.metadata_props:
+        if prop.key not in existing:
+            quantized.metadata_props.append(prop)
+    onnx.save(quantized, output_path)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detection model to ONNX")
+    parser.add_argument("--model", default=DETECTION_MODEL_PATH, help="Path to the .pt weights")
+    parser.add_argument("--output", default=None, help="Output .onnx path (default: next to the weights)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--opset", type=int, default=12, help="ONNX opset version")
+    parser.add_argument("--int8", action="store_true", help="Also write a dynamically quantized int8 graph")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model file not found: {args.model}")
+        return 1
+
+    output_path = args.output or os.path.splitext(args.model)[0] + ".onnx"
+
+    print(f"📦 Exporting {args.model} -> {output_path} (imgsz={args.imgsz}, opset={args.opset})")
+    export_onnx(args.model, output_path, args.imgsz, args.opset)
+    print(f"✅ ONNX model written ({os.path.getsize(output_path) / (1024 * 1024):.1f} MB)")
+
+    if args.int8:
+        int8_path = os.path.splitext(output_path)[0] + ".int8.onnx"
+        print(f"📦 Quantizing to int8 -> {int8_path}")
+        quantize_int8(output_path, int8_path)
+        print(f"✅ int8 model written ({os.path.getsize(int8_path) / (1024 * 1024):.1f} MB)")
+
+    print("\nNext steps:")
+    print("  python test_onnx_parity.py        # compare against the .pt outputs")
+    print("  python benchmark_detection_backends.py")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
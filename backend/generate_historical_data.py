@@ -76,6 +76,7 @@ def generate_historical_data(days=7, readings_per_day=288):
     
     print(f"✅ Generated {total_readings} historical sensor readings over {days} days")
     print(f"📈 Data spans from {base_time.strftime('%Y-%m-%d %H:%M')} to {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    print("ℹ️  Run backfill_sensor_rollups.py to rebuild the rollup buckets for this data")
 
 if __name__ == "__main__":
     print("🚀 Generating realistic historical sensor data...")
@@ -5,7 +5,7 @@ from fastapi.responses import JSONResponse
 import uvicorn
 import os
 from app.api import form_data as form_data_router
-from app.core.config import APP_NAME, APP_VERSION, DEBUG, ALLOWED_ORIGINS
+from app.core.config import APP_NAME, APP_VERSION, DEBUG, ALLOWED_ORIGINS, DETECTION_MODEL_PATH, DETECTION_WARM_MODELS, IOT_INGEST_BUFFER_ENABLED, IOT_RETENTION_ENABLED
 from app.database import create_tables
 
 from app.api import (
@@ -128,10 +128,42 @@ async def startup_event():
     try:
         create_tables()
         
+        # Databases created before sensor readings were deduplicated need a one-off migration
+        from app.services.sensor_ingest_service import sensor_ingest_service
+        if not sensor_ingest_service.check_unique_index():
+            print("⚠️  sensor_data allows duplicate readings; run migrate_sensor_data_dedup.py to skip them at ingest")
+        
         # Initialize default sensor configuration
         from init_default_sensor import create_default_sensor_config
         create_default_sensor_config()
-        
+
+        # Load the detection model once so the first request doesn't pay for it
+        if DETECTION_WARM_MODELS:
+            try:
+                from app.services.model_registry import model_registry
+                for model_stats in model_registry.warm([DETECTION_MODEL_PATH]):
+                    print(f"🧠 Detection model loaded in {model_stats['load_time_seconds']}s ({model_stats['memory_mb']} MB)")
+            except Exception as e:
+                print(f"⚠️  Could not warm detection model: {e}")
+
+        # Replay journaled sensor readings and start the write-behind flusher
+        if IOT_INGEST_BUFFER_ENABLED:
+            from app.services.sensor_ingest_buffer import sensor_ingest_buffer
+            sensor_ingest_buffer.start()
+            if sensor_ingest_buffer.replayed_rows:
+                print(f"📡 Replaying {sensor_ingest_buffer.replayed_rows} buffered sensor reading(s)")
+
+        # Expire and compact old sensor history in the background
+        if IOT_RETENTION_ENABLED:
+            from app.services.sensor_retention_service import sensor_retention_service
+            sensor_retention_service.start()
+
+        # Resume video detection jobs interrupted by a restart
+        from app.services.video_job_service import video_job_manager
+        recovered_jobs = video_job_manager.recover_jobs()
+        if recovered_jobs:
+            print(f"🎬 Re-queued {recovered_jobs} video detection job(s)")
+
         print(f"✅ {APP_NAME} v{APP_VERSION} started successfully!")
         print(f"🗄️  Database initialized")
         print(f"🔗 API available at: http://localhost:8000")
@@ -140,6 +172,20 @@ async def startup_event():
         print(f"❌ Startup failed: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    from app.services.video_job_service import video_job_manager
+    video_job_manager.shutdown()
+
+    # Write out buffered sensor readings before exiting
+    from app.services.sensor_ingest_buffer import sensor_ingest_buffer
+    sensor_ingest_buffer.stop()
+
+    # A retention pass in progress stops after its current chunk
+    from app.services.sensor_retention_service import sensor_retention_service
+    sensor_retention_service.stop()
+
 @app.get("/")
 async def read_root():
     """Root endpoint with API information"""
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Migration to make sensor readings unique per (sensor_config_id, recorded_at).
+Removes the duplicate readings left by device retries from sensor_data and
+the archive blocks (the first stored copy is kept), rebuilds the rollup
+buckets of the affected days, and recreates ix_sensor_data_config_recorded_at
+as a unique index so ingest can skip duplicates. New databases get the unique
+index from the model definition.
+
+Usage:
+    python migrate_sensor_data_dedup.py [--dry-run]
+"""
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, inspect, text
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import SessionLocal, engine
+from app.models.sensor import SensorData, SensorArchiveBlock
+from app.services.sensor_archive_service import sensor_archive_service
+from app.services.sensor_rollup_service import sensor_rollup_service
+
+INDEX_NAME = "ix_sensor_data_config_recorded_at"
+
+# Every reading except the first stored one for its sensor and timestamp
+DELETE_DUPLICATES = """
+    DELETE FROM sensor_data
+    WHERE sensor_config_id IS NOT NULL AND recorded_at IS NOT NULL
+      AND id NOT IN (
+          SELECT MIN(id) FROM sensor_data
+          WHERE sensor_config_id IS NOT NULL AND recorded_at IS NOT NULL
+          GROUP BY sensor_config_id, recorded_at
+      )
+"""
+
+
+def duplicate_days(db):
+    """(sensor_config_id, day, extra copies) for every day with duplicate readings in sensor_data."""
+    groups = db.query(
+        SensorData.sensor_config_id,
+        SensorData.recorded_at,
+        func.count(SensorData.id).label("copies")
+    ).filter(
+        SensorData.sensor_config_id.isnot(None),
+        SensorData.recorded_at.isnot(None)
+    ).group_by(SensorData.sensor_config_id, SensorData.recorded_at).having(func.count(SensorData.id) > 1).subquery()
+
+    day_expr = func.date(groups.c.recorded_at)
+    return [
+        (config_id, datetime.fromisoformat(day), extra)
+        for config_id, day, extra in db.query(
+            groups.c.sensor_config_id, day_expr, func.sum(groups.c.copies - 1)
+        ).group_by(groups.c.sensor_config_id, day_expr).order_by(day_expr)
+    ]
+
+
+def archived_copies(db):
+    """ids of sensor_data readings also held by an archive block, and (sensor_config_id, day, count) per block."""
+    ids, days = [], []
+    for config_id, day in db.query(SensorArchiveBlock.sensor_config_id, SensorArchiveBlock.day).all():
+        rows = db.query(SensorData.id, SensorData.recorded_at).filter(
+            SensorData.sensor_config_id == config_id,
+            SensorData.recorded_at >= day,
+            SensorData.recorded_at < day + timedelta(days=1)
+        ).all()
+        if not rows:
+            continue
+        archived = sensor_archive_service.archived_keys(db, [(config_id, recorded_at) for _, recorded_at in rows])
+        copies = [row_id for row_id, recorded_at in rows if (config_id, recorded_at) in archived]
+        if copies:
+            ids.extend(copies)
+            days.append((config_id, day, len(copies)))
+    return ids, days
+
+
+def index_is_unique(connection):
+    for row in connection.exec_driver_sql("PRAGMA index_list('sensor_data')"):
+        if row[1] == INDEX_NAME:
+            return bool(row[2])
+    return None
+
+
+def deduplicate_sensor_data(db, dry_run: bool = False):
+    """Remove duplicate readings, refold the affected rollups and make the index unique."""
+    raw_days = duplicate_days(db)
+    print(f"   sensor_data: {sum(extra for _, _, extra in raw_days)} duplicate readings on {len(raw_days)} sensor-days")
+    copy_ids, copy_days = archived_copies(db)
+    print(f"   sensor_data: {len(copy_ids)} readings already in an archive block")
+    unique = index_is_unique(db.connection())
+    if dry_run:
+        print(f"📝 Dry run, nothing changed ({INDEX_NAME} is {'unique' if unique else 'missing' if unique is None else 'not unique'})")
+        return
+
+    deleted = db.execute(text(DELETE_DUPLICATES)).rowcount
+    for index in range(0, len(copy_ids), 500):
+        deleted += db.query(SensorData).filter(
+            SensorData.id.in_(copy_ids[index:index + 500])
+        ).delete(synchronize_session=False)
+    db.commit()
+    print(f"✅ Deleted {deleted} duplicate readings from sensor_data")
+
+    archive_days = sensor_archive_service.deduplicate(db)
+    print(f"✅ Removed {sum(removed for _, _, removed in archive_days)} duplicate readings "
+          f"from {len(archive_days)} archive blocks")
+
+    # Rollup buckets counted every copy; refold just the affected days
+    affected = sorted({(config_id, day) for config_id, day, _ in raw_days + copy_days + archive_days},
+                      key=lambda item: (item[1], item[0]))
+    for config_id, day in affected:
+        sensor_rollup_service.rebuild(db, sensor_config_id=config_id, start=day, end=day)
+    print(f"✅ Rebuilt rollups for {len(affected)} sensor-days")
+
+    if unique:
+        print(f"Index already unique: {INDEX_NAME}")
+        return
+    connection = db.connection()
+    if unique is not None:
+        connection.exec_driver_sql(f"DROP INDEX {INDEX_NAME}")
+    connection.exec_driver_sql(f"CREATE UNIQUE INDEX {INDEX_NAME} ON sensor_data (sensor_config_id, recorded_at)")
+    # Refresh planner statistics so the new index is picked up
+    connection.exec_driver_sql("ANALYZE sensor_data")
+    db.commit()
+    print(f"✅ Created unique index: {INDEX_NAME}")
+
+
+def migrate_sensor_data_dedup():
+    parser = argparse.ArgumentParser(description="Remove duplicate sensor readings and add the unique index")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the duplicates")
+    args = parser.parse_args()
+
+    if not inspect(engine).has_table("sensor_data"):
+        print("sensor_data table does not exist yet; it will be created with its unique index on startup")
+        return True
+
+    db = SessionLocal()
+    try:
+        print("🚀 Looking for duplicate sensor readings...")
+        deduplicate_sensor_data(db, dry_run=args.dry_run)
+        print("Migration completed successfully!")
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Migration failed: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if migrate_sensor_data_dedup() else 1)
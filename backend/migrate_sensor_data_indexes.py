@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the sensor_data indexes used by the IoT read paths
+Run this once to update your existing database schema (new databases get the
+indexes from the model definition)
+"""
+
+import sqlite3
+
+INDEXES = [
+    # Latest reading / time range for one sensor
+    "CREATE INDEX IF NOT EXISTS ix_sensor_data_config_recorded_at ON sensor_data (sensor_config_id, recorded_at)",
+    # Latest reading / time range across all sensors
+    "CREATE INDEX IF NOT EXISTS ix_sensor_data_recorded_at ON sensor_data (recorded_at)",
+]
+
+def migrate_sensor_data_indexes():
+    # Connect to database
+    conn = sqlite3.connect('krishi_sahay.db')
+    cursor = conn.cursor()
+    
+    try:
+        print("Starting sensor_data index migration...")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sensor_data'")
+        if not cursor.fetchone():
+            print("sensor_data table does not exist yet; it will be created with its indexes on startup")
+            return
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='sensor_data'")
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        for index_sql in INDEXES:
+            name = index_sql.split(" ON ")[0].split(" ")[-1]
+            if name in existing:
+                print(f"Index already exists: {name}")
+                continue
+            cursor.execute(index_sql)
+            print(f"Created index: {name}")
+        
+        # Refresh planner statistics so the new indexes are picked up
+        cursor.execute("ANALYZE sensor_data")
+        
+        # Commit changes
+        conn.commit()
+        print("Migration completed successfully!")
+        
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_sensor_data_indexes()
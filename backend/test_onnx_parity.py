@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Parity test: ONNX Runtime backend vs the ultralytics .pt model.
+
+Runs both backends on sample images and checks that every detection has a
+counterpart with the same class, overlapping box and close confidence.
+
+Usage:
+    python test_onnx_parity.py [--images DIR] [--onnx PATH] [--score-tol 0.05] [--iou 0.9]
+"""
+import sys
+import os
+import glob
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+from app.core.config import DETECTION_MODEL_PATH, DETECTION_ONNX_MODEL_PATH
+from app.services.inference_backends import UltralyticsBackend, OnnxRuntimeBackend
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def compare(reference, candidate, iou_threshold: float, score_tol: float):
+    """Greedily match candidate detections to reference ones; return (matched, problems)."""
+    ref_boxes, ref_scores, ref_classes = reference
+    cand_boxes, cand_scores, cand_classes = candidate
+    used = set()
+    problems = []
+
+    for i in range(len(ref_boxes)):
+        best, best_iou = None, 0.0
+        for j in range(len(cand_boxes)):
+            if j in used or cand_classes[j] != ref_classes[i]:
+                continue
+            iou = box_iou(ref_boxes[i], cand_boxes[j])
+            if iou > best_iou:
+                best, best_iou = j, iou
+
+        if best is None or best_iou < iou_threshold:
+            problems.append(f"class {int(ref_classes[i])} @ {ref_scores[i]:.3f} has no match (best IoU {best_iou:.2f})")
+            continue
+        used.add(best)
+        if abs(ref_scores[i] - cand_scores[best]) > score_tol:
+            problems.append(f"class {int(ref_classes[i])} score {ref_scores[i]:.3f} vs {cand_scores[best]:.3f}")
+
+    for j in range(len(cand_boxes)):
+        if j not in used:
+            problems.append(f"extra class {int(cand_classes[j])} @ {cand_scores[j]:.3f}")
+
+    return len(used), problems
+
+
+def test_onnx_parity(images: str = "uploads/images/detection", model: str = DETECTION_MODEL_PATH,
+                     onnx: str = DETECTION_ONNX_MODEL_PATH, conf: float = 0.25,
+                     iou: float = 0.9, score_tol: float = 0.05):
+    """Compare both backends on every sample image; skipped when weights or images aren't available."""
+    image_paths = sorted(
+        path for pattern in ("*.jpg", "*.jpeg", "*.png")
+        for path in glob.glob(os.path.join(images, pattern))
+        if not os.path.basename(path).startswith("processed_")
+    )
+    missing = [path for path in (model, onnx) if not os.path.exists(path)]
+    if missing:
+        print(f"⚠️  Skipping ONNX parity, model not found: {', '.join(missing)}")
+        return True
+    if not image_paths:
+        print(f"⚠️  Skipping ONNX parity, no sample images in {images}")
+        return True
+
+    print("🧪 Testing ONNX parity...")
+    print(f"   Reference: {model}")
+    print(f"   Candidate: {onnx}")
+    print(f"   Images:    {len(image_paths)}")
+
+    try:
+        reference_backend = UltralyticsBackend(model)
+        onnx_backend = OnnxRuntimeBackend(onnx)
+    except ImportError as e:
+        print(f"⚠️  Skipping ONNX parity: {e}")
+        return True
+
+    if reference_backend.names != onnx_backend.names:
+        print("❌ Class names differ between the .pt and ONNX models")
+        return False
+
+    failures = 0
+    total_matched = 0
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        reference = reference_backend.predict([image], conf)[0]
+        candidate = onnx_backend.predict([image], conf)[0]
+        matched, problems = compare(reference, candidate, iou, score_tol)
+        total_matched += matched
+
+        status = "✅ PASS" if not problems else "❌ FAIL"
+        print(f"{status} {os.path.basename(path)}: {len(reference[0])} reference / {len(candidate[0])} onnx detections")
+        for problem in problems:
+            print(f"      - {problem}")
+        failures += bool(problems)
+
+    print("\n" + "=" * 50)
+    print(f"Matched detections: {total_matched}")
+    print(f"Images with differences: {failures}/{len(image_paths)}")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ONNX and .pt detection outputs")
+    parser.add_argument("--images", default="uploads/images/detection", help="Directory of sample images")
+    parser.add_argument("--model", default=DETECTION_MODEL_PATH, help="Reference .pt weights")
+    parser.add_argument("--onnx", default=DETECTION_ONNX_MODEL_PATH, help="Exported ONNX graph")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--iou", type=float, default=0.9, help="Minimum IoU for a box to count as matching")
+    parser.add_argument("--score-tol", type=float, default=0.05, help="Allowed confidence difference (use ~0.1 for int8)")
+    args = parser.parse_args()
+    sys.exit(0 if test_onnx_parity(args.images, args.model, args.onnx, args.conf, args.iou, args.score_tol) else 1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Checks for the streaming sensor alert engine: debouncing, hysteresis,
+late readings, persisted transitions and restoring state after a restart.
+
+Usage:
+    python test_sensor_alert_engine.py
+"""
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import Base
+from app.models.sensor import SensorConfig, SensorAlertEvent
+from app.services.sensor_alert_engine import SensorAlertEngine
+from app.services.sensor_config_cache import sensor_config_cache
+
+THRESHOLDS = {"temperature": {"min": 10, "max": 35, "hysteresis": 2, "debounce": 2, "severity": "critical"}}
+
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{'✅ PASS' if condition else '❌ FAIL'} {name}")
+    return condition
+
+
+def test_sensor_alert_engine():
+    print("🧪 Testing sensor alert engine...")
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'alerts.db')}")
+        Base.metadata.create_all(engine, tables=[SensorConfig.__table__, SensorAlertEvent.__table__])
+        session = sessionmaker(bind=engine)()
+        session.add(SensorConfig(
+            id=1, sensor_id="ALERT_TEST", sensor_name="test", sensor_type="DHT22",
+            is_active=True, alert_thresholds=json.dumps(THRESHOLDS)
+        ))
+        session.commit()
+        sensor_config_cache.invalidate()
+
+        start = datetime.now() - timedelta(hours=1)
+        minute = [0]
+
+        def feed(alerts, *temperatures, at=None):
+            rows = []
+            for temperature in temperatures:
+                minute[0] += 1
+                rows.append({
+                    "sensor_config_id": 1, "temperature": temperature,
+                    "recorded_at": at or start + timedelta(minutes=minute[0])
+                })
+            return [(event["transition"], event["alert_type"]) for event in alerts.evaluate(session, rows)]
+
+        def active(alerts):
+            return [(alert.alert_type, alert.value) for alert in alerts.active_alerts(session, [1])]
+
+        alerts = SensorAlertEngine()
+        ok &= check("single spike is debounced", feed(alerts, 30, 36, 30) == [] and active(alerts) == [])
+        ok &= check("raised after 2 readings over max", feed(alerts, 36, 37) == [("raised", "temperature_high")])
+        ok &= check("active alert tracks the latest value", active(alerts) == [("temperature_high", 37)])
+        ok &= check("stays raised inside the hysteresis band", feed(alerts, 34, 33.5, 34) == [])
+        ok &= check("late reading is ignored", feed(alerts, 20, 20, at=start) == [] and alerts.skipped_late == 2)
+        ok &= check("clears after 2 readings below max - hysteresis", feed(alerts, 32, 33) == [("cleared", "temperature_high")])
+        ok &= check("low alert raised below min", feed(alerts, 5, 4) == [("raised", "temperature_low")])
+        ok &= check("readings without the metric are skipped", feed(alerts, None) == [])
+
+        events = session.query(SensorAlertEvent).order_by(SensorAlertEvent.id).all()
+        ok &= check("transitions persisted", [event.transition for event in events] == ["raised", "cleared", "raised"])
+
+        restarted = SensorAlertEngine()
+        ok &= check("active alerts restored after restart", active(restarted) == [("temperature_low", 4)])
+        ok &= check("restored alert clears normally", feed(restarted, 15, 15) == [("cleared", "temperature_low")])
+
+        feed(restarted, 4, 4)
+        session.query(SensorConfig).filter(SensorConfig.id == 1).update({"alert_thresholds": json.dumps({
+            "humidity": {"max": 90}
+        })})
+        session.commit()
+        sensor_config_cache.invalidate()
+        ok &= check("removing a threshold clears its alert", feed(restarted, 4) == [("cleared", "temperature_low")])
+        ok &= check("no alerts left", active(restarted) == [])
+
+        session.close()
+        engine.dispose()
+
+    print("\n" + "=" * 50)
+    print("All checks passed" if ok else "Some checks failed")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_sensor_alert_engine() else 1)
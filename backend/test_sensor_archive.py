@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Checks for the columnar sensor archive: lossless block round trip,
+compression, and range reads that merge archive blocks with sensor_data.
+
+Usage:
+    python test_sensor_archive.py
+"""
+import sys
+import os
+import math
+import random
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import Base
+from app.models.sensor import SensorConfig, SensorData, SensorArchiveBlock, SensorRollup
+from app.services.sensor_archive_service import sensor_archive_service, encode_block, decode_block, _decoded_rows
+from app.services.sensor_rollup_service import sensor_rollup_service
+
+DAYS = 10
+READINGS_PER_DAY = 288
+
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{'✅ PASS' if condition else '❌ FAIL'} {name}")
+    return condition
+
+
+def make_rows(sensor_config_id: int, start: datetime, first_id: int):
+    """Five-minute readings with a daily cycle, like generate_historical_data.py."""
+    rows = []
+    for i in range(DAYS * READINGS_PER_DAY):
+        recorded_at = start + timedelta(minutes=5 * i, seconds=random.randint(0, 3), microseconds=random.randint(0, 999999))
+        hour = recorded_at.hour
+        rows.append({
+            "id": first_id + i,
+            "sensor_config_id": sensor_config_id,
+            "temperature": round(22 + 8 * math.sin((hour - 6) * math.pi / 12) + random.uniform(-2, 2), 2),
+            "humidity": round(random.uniform(40, 90), 2),
+            "soil_moisture": round(random.uniform(20, 80), 2) if i % 7 else None,
+            "water_level": round(random.uniform(10, 100), 2),
+            "device_status": "online" if i % 50 else "offline",
+            "data_quality": "good",
+            "error_message": None,
+            "recorded_at": recorded_at,
+            "received_at": recorded_at + timedelta(seconds=2)
+        })
+    return rows
+
+
+def rollup_totals(session):
+    # Sums rounded: the rebuild folds archived and live readings in a different order
+    return sorted(
+        (bucket.sensor_config_id, bucket.resolution, bucket.metric, bucket.bucket_start, bucket.count, round(bucket.sum_value, 6))
+        for bucket in session.query(SensorRollup)
+    )
+
+
+def all_rows(session):
+    return [dict(row) for row in session.execute(select(SensorData.__table__).order_by(SensorData.id)).mappings()]
+
+
+def test_sensor_archive():
+    print("🧪 Testing sensor archive...")
+    random.seed(0)
+    ok = True
+
+    # Block round trip
+    start = (datetime.now() - timedelta(days=DAYS + 5)).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_rows = make_rows(1, start, 1)[:READINGS_PER_DAY]
+    block = encode_block(day_rows)
+    decoded = _decoded_rows(decode_block(block), 1)
+    ok &= check("block round trip is lossless", decoded == [{key: row.get(key) for key in decoded[0]} for row in day_rows])
+    ok &= check("all-None columns read back as None", all(row["light_intensity"] is None for row in decoded))
+    partial = decode_block(block, ["recorded_at", "temperature"])
+    ok &= check("column projection decodes only what was asked", set(partial) == {"recorded_at", "temperature"})
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'archive.db')}")
+        Base.metadata.create_all(engine, tables=[
+            SensorConfig.__table__, SensorData.__table__, SensorArchiveBlock.__table__, SensorRollup.__table__
+        ])
+        session = sessionmaker(bind=engine)()
+        for sensor_config_id in (1, 2):
+            session.add(SensorConfig(id=sensor_config_id, sensor_id=f"ARCHIVE_{sensor_config_id}", sensor_name="test", sensor_type="MULTI"))
+        rows = make_rows(1, start, 1) + make_rows(2, start, 100000)
+        session.bulk_insert_mappings(SensorData, rows)
+        session.commit()
+        sensor_rollup_service.rebuild(session)
+        rollups_before = rollup_totals(session)
+
+        range_start = start + timedelta(days=2, hours=5)
+        range_end = start + timedelta(days=DAYS - 1, hours=3)
+        rows_before = sensor_archive_service.read_rows(session, range_start, range_end, 1)
+        columns_before = sensor_archive_service.read_columns(session, range_start, range_end, None, ["temperature", "soil_moisture"])
+        raw_size = sum(len(repr(tuple(row.values()))) for row in all_rows(session))
+
+        # Archive everything older than 8 days ago: the first DAYS - 3 whole days
+        result = sensor_archive_service.archive(session, older_than_days=8)
+        remaining = session.query(SensorData).count()
+        ok &= check(f"archived {result['moved']} readings into {result['blocks']} blocks",
+                    result["moved"] + remaining == len(rows) and result["blocks"] > 0)
+
+        stats = sensor_archive_service.stats(session)
+        ok &= check(f"archive is compact ({stats['bytes_per_reading']} bytes/reading vs ~{raw_size // len(rows)} raw)",
+                    stats["bytes_per_reading"] * 5 < raw_size / len(rows))
+
+        ok &= check("row reads merge blocks and sensor_data", sensor_archive_service.read_rows(session, range_start, range_end, 1) == rows_before)
+        newest = sensor_archive_service.read_rows(session, range_start, range_end, 1, limit=5, newest_first=True)
+        ok &= check("newest_first with limit", newest == rows_before[::-1][:5])
+        columns_after = sensor_archive_service.read_columns(session, range_start, range_end, None, ["temperature", "soil_moisture"])
+        ok &= check("column reads merge blocks and sensor_data", all(
+            np.array_equal(columns_before[name], columns_after[name], equal_nan=True) for name in columns_before
+        ))
+
+        # A late reading for an archived day is merged into its block
+        late = dict(rows[5], id=500000, recorded_at=rows[5]["recorded_at"] + timedelta(seconds=30))
+        session.bulk_insert_mappings(SensorData, [late])
+        session.commit()
+        sensor_archive_service.archive(session, older_than_days=8)
+        block = session.query(SensorArchiveBlock).filter(SensorArchiveBlock.sensor_config_id == 1).order_by(SensorArchiveBlock.day).first()
+        ok &= check("late reading merged into the existing block", block.row_count == READINGS_PER_DAY + 1 and session.get(SensorData, 500000) is None)
+
+        # Rebuilding rollups still sees the archived readings
+        session.query(SensorData).filter(SensorData.id == 500000).delete()
+        session.commit()
+        block_rows = _decoded_rows(decode_block(block.data), 1)
+        block.data = encode_block([row for row in block_rows if row["id"] != 500000])
+        block.row_count -= 1
+        session.commit()
+        sensor_rollup_service.rebuild(session)
+        ok &= check("rollup rebuild includes archived readings", rollup_totals(session) == rollups_before)
+
+        session.close()
+        engine.dispose()
+
+    print("\n" + "=" * 50)
+    print("All checks passed" if ok else "Some checks failed")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_sensor_archive() else 1)
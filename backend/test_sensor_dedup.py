@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Checks for idempotent sensor ingest: device timestamp parsing, duplicate
+readings skipped by the recent-keys cache and the unique index (also for
+archived days), rollups counting each reading once, and the migration that
+cleans up an existing database.
+
+Usage:
+    python test_sensor_dedup.py
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import Base
+from app.models.sensor import SensorConfig, SensorData, SensorArchiveBlock, SensorRollup, SensorAlertEvent
+from app.services.sensor_ingest_service import (
+    sensor_ingest_service, parse_device_timestamp, esp32_payload_to_reading
+)
+from app.services.sensor_dedup_cache import sensor_dedup_cache, SensorDedupCache
+from app.services.sensor_archive_service import sensor_archive_service, decode_block
+from app.services.sensor_rollup_service import sensor_rollup_service
+from migrate_sensor_data_dedup import deduplicate_sensor_data, index_is_unique, INDEX_NAME
+
+TABLES = [
+    SensorConfig.__table__, SensorData.__table__, SensorArchiveBlock.__table__,
+    SensorRollup.__table__, SensorAlertEvent.__table__
+]
+
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{'✅ PASS' if condition else '❌ FAIL'} {name}")
+    return condition
+
+
+def readings(sensor_config_id: int, start: datetime, count: int, minutes: int = 5):
+    return [{
+        "sensor_config_id": sensor_config_id,
+        "temperature": 20.0 + i % 7,
+        "device_status": "online",
+        "data_quality": "good",
+        "recorded_at": start + timedelta(minutes=minutes * i),
+        "received_at": datetime.now()
+    } for i in range(count)]
+
+
+def rollup_count(session, sensor_config_id: int) -> int:
+    return session.query(func.sum(SensorRollup.count)).filter(
+        SensorRollup.sensor_config_id == sensor_config_id,
+        SensorRollup.resolution == "1d",
+        SensorRollup.metric == "temperature"
+    ).scalar() or 0
+
+
+def esp32_payload(timestamp, device_id="DEDUP_1"):
+    return {
+        "device_id": device_id, "timestamp": timestamp, "temperature_c": 24.5, "humidity_percent": 60.0,
+        "heat_index_c": 25.0, "water_level_raw": 1800, "water_level_percent": 70,
+        "soil_moisture_raw": 2100, "soil_moisture_percent": 55
+    }
+
+
+def test_timestamps() -> bool:
+    ok = True
+    utc = datetime(2025, 3, 1, 6, 30, tzinfo=timezone.utc)
+    ok &= check("ISO 8601 with Z", parse_device_timestamp("2025-03-01T06:30:00Z") == utc)
+    ok &= check("ISO 8601 with offset", parse_device_timestamp("2025-03-01T12:30:00+06:00") == utc)
+    ok &= check("space separated, naive stays local", parse_device_timestamp("2025-03-01 06:30:00") == datetime(2025, 3, 1, 6, 30))
+    ok &= check("epoch seconds, number or string",
+                parse_device_timestamp(utc.timestamp()) == utc and parse_device_timestamp(str(int(utc.timestamp()))) == utc)
+    ok &= check("epoch milliseconds", parse_device_timestamp(int(utc.timestamp() * 1000)) == utc)
+    ok &= check("unset clock (millis since boot) rejected", parse_device_timestamp("123456") is None)
+    ok &= check("far future rejected", parse_device_timestamp((datetime.now() + timedelta(days=2)).isoformat()) is None)
+    ok &= check("garbage rejected", parse_device_timestamp("not a time") is None and parse_device_timestamp("nan") is None)
+
+    fallback = esp32_payload_to_reading(esp32_payload("garbage"))
+    ok &= check("unusable timestamp flagged, not silently replaced",
+                fallback["data_quality"] == "warning" and "garbage" in fallback["error_message"])
+    return ok
+
+
+def check_ingest(session) -> bool:
+    ok = True
+    sensor_dedup_cache.clear()
+    session.add(SensorConfig(id=1, sensor_id="DEDUP_1", sensor_name="test", sensor_type="MULTI", is_active=True))
+    session.commit()
+
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=6)
+    rows = readings(1, start, 50)
+    ids = sensor_ingest_service.insert_rows(session, [dict(row) for row in rows])
+    ok &= check("first delivery inserted", None not in ids and session.query(SensorData).count() == 50)
+
+    # A device resending everything plus five new readings
+    sensor_dedup_cache.clear()
+    before = sensor_dedup_cache.stats()["insert_duplicates"]
+    resent = [dict(row) for row in rows] + readings(1, start + timedelta(minutes=250), 5)
+    ids = sensor_ingest_service.insert_rows(session, resent)
+    ok &= check("unique index skips resent readings", ids[:50] == [None] * 50 and None not in ids[50:])
+    ok &= check("in-batch repeat skipped", sensor_ingest_service.insert_rows(
+        session, readings(1, start + timedelta(hours=5), 1) * 2)[1] is None)
+    ok &= check("duplicates counted", sensor_dedup_cache.stats()["insert_duplicates"] - before == 51)
+    ok &= check("rollups count each reading once", rollup_count(session, 1) == 56 == session.query(SensorData).count())
+
+    # Batch endpoint path: cache answers retries without touching the database
+    payloads = [esp32_payload((start + timedelta(hours=6, seconds=i)).isoformat()) for i in range(3)]
+    first = sensor_ingest_service.ingest(session, payloads)
+    retry = sensor_ingest_service.ingest(session, payloads + [esp32_payload("1970-01-01T00:00:00")])
+    ok &= check("batch reports duplicates, not failures", first["inserted"] == 3 and
+                retry["inserted"] == 1 and retry["duplicates"] == 3 and retry["failed"] == 0 and
+                [result["status"] for result in retry["results"]] == ["duplicate"] * 3 + ["created"])
+    ok &= check("retries answered by the recent-keys cache", sensor_dedup_cache.stats()["cache_duplicates"] >= 3)
+    ok &= check("timestamp fallback counted", sensor_ingest_service.timestamp_fallbacks >= 1)
+
+    # Late retry of a reading that was already moved to an archive block
+    old = readings(1, (datetime.now() - timedelta(days=5)).replace(hour=8, minute=0, second=0, microsecond=0), 10)
+    sensor_ingest_service.insert_rows(session, [dict(row) for row in old])
+    sensor_archive_service.archive(session, older_than_days=2)
+    sensor_dedup_cache.clear()
+    ids = sensor_ingest_service.insert_rows(session, [dict(row) for row in old[:3]])
+    ok &= check("archived readings not stored twice", ids == [None] * 3 and session.query(SensorData).filter(
+        SensorData.recorded_at < datetime.now() - timedelta(days=2)).count() == 0)
+
+    # The cache is bounded
+    small = SensorDedupCache(max_keys=3)
+    small.add([(1, start + timedelta(minutes=i)) for i in range(5)])
+    ok &= check("LRU evicts the oldest keys", not small.seen((1, start)) and small.seen((1, start + timedelta(minutes=4)))
+                and small.stats()["evictions"] == 2)
+    return ok
+
+
+def check_migration(session) -> bool:
+    ok = True
+    connection = session.connection()
+    connection.exec_driver_sql(f"DROP INDEX {INDEX_NAME}")
+    connection.exec_driver_sql(f"CREATE INDEX {INDEX_NAME} ON sensor_data (sensor_config_id, recorded_at)")
+    session.add(SensorConfig(id=2, sensor_id="DEDUP_2", sensor_name="test", sensor_type="MULTI"))
+    session.commit()
+    ok &= check("unmigrated database detected", not sensor_ingest_service.check_unique_index(session.get_bind()))
+    ok &= check("ingest still works before migrating", None not in sensor_ingest_service.insert_rows(
+        session, readings(2, datetime.now().replace(microsecond=0) - timedelta(minutes=30), 2)))
+
+    # Every reading stored twice, some three times; old days then archived with their duplicates
+    start = (datetime.now() - timedelta(days=4)).replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = readings(2, start, 4 * 288)
+    session.bulk_insert_mappings(SensorData, rows + rows + rows[::10])
+    session.commit()
+    sensor_rollup_service.rebuild(session)
+    sensor_archive_service.archive(session, older_than_days=2)
+    late = [row for row in rows if row["recorded_at"] < start + timedelta(days=1)][:5]
+    session.bulk_insert_mappings(SensorData, late)
+    session.commit()
+    ok &= check("setup has duplicates", rollup_count(session, 2) > len(rows))
+
+    deduplicate_sensor_data(session)
+    raw = session.query(SensorData.recorded_at).filter(SensorData.sensor_config_id == 2).all()
+    archived = [decode_block(block.data, ["recorded_at"])["recorded_at"] for block in session.query(SensorArchiveBlock).filter(
+        SensorArchiveBlock.sensor_config_id == 2)]
+    archived_count = sum(len(values) for values in archived)
+    ok &= check("sensor_data deduplicated", len(raw) == len(set(raw)))
+    ok &= check("archive blocks deduplicated", all(len(values) == len(set(values.tolist())) for values in archived))
+    ok &= check("every reading kept once", len(raw) + archived_count == len(rows) + 2)
+    ok &= check("rollups refolded", rollup_count(session, 2) == len(rows) + 2)
+    ok &= check("index is unique", index_is_unique(session.connection()) is True and
+                sensor_ingest_service.check_unique_index(session.get_bind()))
+    ok &= check("ingest skips duplicates after migrating",
+                sensor_ingest_service.insert_rows(session, [dict(rows[-1])]) == [None])
+    return ok
+
+
+def test_sensor_dedup():
+    print("🧪 Testing sensor reading deduplication...")
+    ok = test_timestamps()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'dedup.db')}")
+        Base.metadata.create_all(engine, tables=TABLES)
+        session = sessionmaker(bind=engine)()
+        ok &= check_ingest(session)
+        ok &= check_migration(session)
+        session.close()
+        engine.dispose()
+
+    print("\n" + "=" * 50)
+    print("All checks passed" if ok else "Some checks failed")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_sensor_dedup() else 1)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression test for the hot sensor_data reads.
+
+Builds a scratch SQLite database from the models, runs EXPLAIN QUERY PLAN on
+the queries the IoT endpoints and agent tools issue, and fails if any of them
+scans sensor_data without an index or sorts it in a temporary B-tree.
+
+Usage:
+    python test_sensor_query_plans.py
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import Base
+from app.models.sensor import SensorConfig, SensorData
+
+
+def explain(session, query):
+    """Return the EXPLAIN QUERY PLAN detail lines for an ORM query."""
+    compiled = query.statement.compile(dialect=session.bind.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def seed(session, sensors: int = 5, readings: int = 20000):
+    now = datetime.now()
+    for sensor_id in range(1, sensors + 1):
+        session.add(SensorConfig(id=sensor_id, sensor_id=f"SENSOR_{sensor_id}", sensor_name="test", sensor_type="DHT22"))
+    session.bulk_insert_mappings(SensorData, [
+        {
+            "sensor_config_id": random.randint(1, sensors),
+            "temperature": random.uniform(15, 40),
+            "recorded_at": now - timedelta(minutes=i),
+            "received_at": now
+        }
+        for i in range(readings)
+    ])
+    session.commit()
+    session.connection().exec_driver_sql("ANALYZE")
+
+
+def test_sensor_query_plans():
+    print("🧪 Testing sensor_data query plans...")
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'plans.db')}")
+        Base.metadata.create_all(engine, tables=[SensorConfig.__table__, SensorData.__table__])
+        session = sessionmaker(bind=engine)()
+        seed(session)
+
+        since = datetime.now() - timedelta(hours=24)
+        queries = {
+            "latest reading for a sensor (/sensors/{id}/latest)": session.query(SensorData).filter(
+                SensorData.sensor_config_id == 1
+            ).order_by(SensorData.recorded_at.desc()).limit(1),
+            "time range for a sensor (/sensors/{id}/data)": session.query(SensorData).filter(
+                SensorData.sensor_config_id == 1,
+                SensorData.recorded_at >= since
+            ).order_by(SensorData.recorded_at.desc()).limit(100),
+            "24h count for a sensor (/sensors/{id}/summary)": session.query(func.count(SensorData.id)).filter(
+                SensorData.sensor_config_id == 1,
+                SensorData.recorded_at >= since
+            ),
+            "latest reading overall (/get-latest-data)": session.query(SensorData).order_by(
+                SensorData.recorded_at.desc()
+            ).limit(1),
+            "last N readings (/get-data-history)": session.query(SensorData).order_by(
+                SensorData.recorded_at.desc()
+            ).limit(50),
+            "time range overall (/series, agent tools)": session.query(SensorData).filter(
+                SensorData.recorded_at >= since
+            ).order_by(SensorData.recorded_at),
+        }
+
+        failures = 0
+        for name, query in queries.items():
+            plan = explain(session, query)
+            problems = []
+            for line in plan:
+                if "sensor_data" in line and line.startswith("SCAN") and "INDEX" not in line:
+                    problems.append("full table scan")
+                if "TEMP B-TREE" in line:
+                    problems.append("sorts in a temporary B-tree")
+            if not any("ix_sensor_data_" in line for line in plan):
+                problems.append("no sensor_data index used")
+
+            print(f"{'✅ PASS' if not problems else '❌ FAIL'} {name}")
+            for line in plan:
+                print(f"      {line}")
+            for problem in problems:
+                print(f"      - {problem}")
+            failures += bool(problems)
+
+        session.close()
+        engine.dispose()
+
+    print("\n" + "=" * 50)
+    print(f"Queries with bad plans: {failures}/{len(queries)}")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_sensor_query_plans() else 1)
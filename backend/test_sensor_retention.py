@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Checks for sensor retention: tier and per-sensor policies, dry runs, chunked
+deletes across sensor_data, archive blocks and rollups, compaction of what
+is left, and incremental vacuum shrinking the database file.
+
+Usage:
+    python test_sensor_retention.py
+"""
+import sys
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+import app.models, app.models.agenda, app.models.form_data  # noqa: F401 - registers every model with Base
+from app.database import Base
+from app.models.sensor import (
+    SensorConfig, SensorData, SensorArchiveBlock, SensorRollup, SensorRetentionPolicy
+)
+from app.core.config import IOT_ARCHIVE_AFTER_DAYS
+from app.services.sensor_retention_service import SensorRetentionService
+from app.services.sensor_rollup_service import sensor_rollup_service
+from app.services.sensor_archive_service import sensor_archive_service
+
+DAYS = 60
+READINGS_PER_DAY = 96  # every 15 minutes
+
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{'✅ PASS' if condition else '❌ FAIL'} {name}")
+    return condition
+
+
+def oldest(session, sensor_config_id: int):
+    return session.query(func.min(SensorData.recorded_at)).filter(
+        SensorData.sensor_config_id == sensor_config_id
+    ).scalar()
+
+
+def test_sensor_retention():
+    print("🧪 Testing sensor retention...")
+    random.seed(0)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "retention.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine, tables=[
+            SensorConfig.__table__, SensorData.__table__, SensorArchiveBlock.__table__,
+            SensorRollup.__table__, SensorRetentionPolicy.__table__
+        ])
+        SensorRetentionService.enable_incremental_vacuum(engine)
+        session = sessionmaker(bind=engine)()
+
+        # Sensor 1 follows the default tier, sensor 2 keeps 20 days of raw readings
+        # and 10 days of hourly rollups, sensor 3 is on the "long" tier
+        now = datetime.now()
+        for sensor_config_id in (1, 2, 3):
+            session.add(SensorConfig(id=sensor_config_id, sensor_id=f"RETENTION_{sensor_config_id}",
+                                     sensor_name="test", sensor_type="MULTI"))
+        session.add(SensorRetentionPolicy(sensor_config_id=2, raw_days=20, rollup_1h_days=10))
+        session.add(SensorRetentionPolicy(sensor_config_id=3, tier="long"))
+        session.commit()
+
+        rows = [{
+            "sensor_config_id": sensor_config_id,
+            "temperature": round(random.uniform(15, 35), 2),
+            "soil_moisture": round(random.uniform(20, 80), 2),
+            "error_message": "x" * 200,
+            "recorded_at": now - timedelta(days=DAYS) + timedelta(minutes=15 * i)
+        } for sensor_config_id in (1, 2, 3) for i in range(DAYS * READINGS_PER_DAY)]
+        session.bulk_insert_mappings(SensorData, rows)
+        session.commit()
+        sensor_rollup_service.rebuild(session)
+        # Earlier passes already archived the oldest two weeks
+        sensor_archive_service.archive(session, older_than_days=DAYS - 14)
+        ok &= check("archive blocks to expire", session.query(SensorArchiveBlock).filter(
+            SensorArchiveBlock.sensor_config_id == 2).count() > 0)
+
+        service = SensorRetentionService(chunk_size=200, chunk_pause=0)
+        policies = service.policies(session)
+        ok &= check("default tier for sensors without a policy", policies[1]["tier"] == "standard")
+        ok &= check("per-sensor overrides on top of the tier",
+                    policies[2]["raw_days"] == 20 and policies[2]["rollup_1h_days"] == 10 and policies[2]["rollup_1m_days"] == 14)
+        ok &= check("tier only", policies[3]["tier"] == "long" and policies[3]["raw_days"] == 0)
+
+        counts_before = (session.query(SensorData).count(), session.query(SensorRollup).count())
+        preview = service.run(session, dry_run=True)
+        ok &= check("dry run changes nothing",
+                    (session.query(SensorData).count(), session.query(SensorRollup).count()) == counts_before)
+        size_before = os.path.getsize(path)
+
+        result = service.run(session)
+        ok &= check("dry run matches the real pass",
+                    preview["deleted"] == result["deleted"] and preview["archived"] == result["archived"])
+        ok &= check(f"deleted in chunks ({service.chunks} chunks)", service.chunks > result["deleted"]["sensor_data"] // 200)
+
+        cutoff = now - timedelta(days=20)
+        ok &= check("sensor 2 raw readings kept 20 days",
+                    oldest(session, 2) is None or oldest(session, 2) >= cutoff)
+        ok &= check("sensor 1 raw readings untouched", session.query(SensorData).filter(
+            SensorData.sensor_config_id == 1).count() + session.query(func.sum(SensorArchiveBlock.row_count)).filter(
+            SensorArchiveBlock.sensor_config_id == 1).scalar() == DAYS * READINGS_PER_DAY)
+        ok &= check("sensor 2 archive blocks past retention dropped", session.query(SensorArchiveBlock).filter(
+            SensorArchiveBlock.sensor_config_id == 2, SensorArchiveBlock.day < cutoff - timedelta(days=1)).count() == 0
+            and result["deleted"]["sensor_archive_blocks"] > 0)
+        ok &= check("compaction archived what is left past the archive age", session.query(SensorData).filter(
+            SensorData.recorded_at < now - timedelta(days=IOT_ARCHIVE_AFTER_DAYS + 1)).count() == 0 and result["archived"] > 0)
+
+        def oldest_rollup(sensor_config_id, resolution):
+            return session.query(func.min(SensorRollup.bucket_start)).filter(
+                SensorRollup.sensor_config_id == sensor_config_id, SensorRollup.resolution == resolution
+            ).scalar()
+        ok &= check("1m rollups kept 14 days", oldest_rollup(1, "1m") >= now - timedelta(days=14, minutes=1))
+        ok &= check("sensor 2 hourly rollups kept 10 days", oldest_rollup(2, "1h") >= now - timedelta(days=10, hours=1))
+        ok &= check("daily rollups kept", oldest_rollup(2, "1d") <= now - timedelta(days=DAYS - 1))
+        ok &= check("long tier keeps hourly rollups", oldest_rollup(3, "1h") <= now - timedelta(days=DAYS - 1))
+
+        size_after = os.path.getsize(path)
+        ok &= check(f"incremental vacuum shrank the file ({size_before / 1e6:.1f} -> {size_after / 1e6:.1f} MB, "
+                    f"{result['pages_freed']} pages)", result["pages_freed"] > 0 and size_after < size_before)
+
+        again = service.run(session)
+        ok &= check("second pass has nothing left to do",
+                    sum(again["deleted"].values()) == 0 and again["archived"] == 0)
+        ok &= check("metrics recorded", service.stats()["runs"] == 2 and service.stats()["deleted_total"]["sensor_data"] > 0)
+
+        session.close()
+        engine.dispose()
+
+    print("\n" + "=" * 50)
+    print("All checks passed" if ok else "Some checks failed")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_sensor_retention() else 1)
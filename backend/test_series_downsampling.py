@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Checks for the LTTB and min/max downsampling used by /api/iot/series.
+
+Usage:
+    python test_series_downsampling.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from app.services.sensor_series_service import lttb_indices, minmax_indices
+
+
+def make_series(n: int = 20000, seed: int = 0):
+    """A week of 30-second readings: daily cycle, noise and one short spike."""
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64) * 30_000
+    y = 25 + 6 * np.sin(2 * np.pi * x / 86_400_000) + rng.normal(0, 0.3, n)
+    y[12345] = 60.0
+    return x, y
+
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{'✅ PASS' if condition else '❌ FAIL'} {name}")
+    return condition
+
+
+def test_series_downsampling():
+    print("🧪 Testing series downsampling...")
+    x, y = make_series()
+    ok = True
+
+    for label, select in (("lttb", lttb_indices), ("minmax", minmax_indices)):
+        keep = select(x, y, 500)
+        ok &= check(f"{label}: at most 500 points ({len(keep)})", len(keep) <= 500)
+        ok &= check(f"{label}: indices strictly increasing", bool(np.all(np.diff(keep) > 0)))
+        ok &= check(f"{label}: keeps first and last point", keep[0] == 0 and keep[-1] == len(x) - 1)
+        ok &= check(f"{label}: keeps the spike", 12345 in keep)
+        ok &= check(f"{label}: short series returned unchanged", len(select(x[:100], y[:100], 500)) == 100)
+
+    # Min/max per bucket must preserve the exact extremes
+    keep = minmax_indices(x, y, 500)
+    ok &= check("minmax: global min and max preserved", y[keep].min() == y.min() and y[keep].max() == y.max())
+
+    # Downsampled LTTB curve should still follow the daily cycle
+    keep = lttb_indices(x, y, 500)
+    reconstructed = np.interp(x, x[keep], y[keep])
+    mask = np.abs(np.arange(len(x)) - 12345) > 50
+    error = np.abs(reconstructed - y)[mask].mean()
+    ok &= check(f"lttb: mean reconstruction error below noise level ({error:.3f})", error < 0.5)
+
+    print("\n" + "=" * 50)
+    print("All checks passed" if ok else "Some checks failed")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_series_downsampling() else 1)
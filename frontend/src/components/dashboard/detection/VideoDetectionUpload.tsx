@@ -286,12 +286,29 @@ const VideoDetectionUpload = ({ onSwitchToHistory }) => {
         liveVideoRef.current.play();
       }
 
-      // Connect to WebSocket
-      const wsUrl = `${process.env.NEXT_PUBLIC_API_URL}/api/detection/stream-camera?confidence_threshold=${confidenceThreshold}`;
+      // Connect to WebSocket; the browser pushes JPEG frames and the server answers
+      // each one with a binary message: [4-byte header length][JSON header][annotated JPEG]
+      const wsUrl = `${process.env.NEXT_PUBLIC_API_URL}/api/detection/stream-camera?mode=push&confidence_threshold=${confidenceThreshold}`;
       
       const ws = new WebSocket(wsUrl);
+      ws.binaryType = 'arraybuffer';
       setWebsocket(ws);
 
+      const frameCanvas = document.createElement('canvas');
+      const sendFrame = () => {
+        const video = liveVideoRef.current;
+        if (!video || ws.readyState !== WebSocket.OPEN) return;
+        
+        frameCanvas.width = video.videoWidth || 640;
+        frameCanvas.height = video.videoHeight || 480;
+        frameCanvas.getContext('2d')?.drawImage(video, 0, 0, frameCanvas.width, frameCanvas.height);
+        frameCanvas.toBlob((blob) => {
+          if (blob && ws.readyState === WebSocket.OPEN) {
+            ws.send(blob);
+          }
+        }, 'image/jpeg', 0.7);
+      };
+
       ws.onopen = () => {
         setIsLiveStreaming(true);
         setError(null);
@@ -299,7 +316,19 @@ const VideoDetectionUpload = ({ onSwitchToHistory }) => {
 
       ws.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data);
+          if (typeof event.data === 'string') {
+            const data = JSON.parse(event.data);
+            if (data.status === 'stream_started') {
+              sendFrame();
+            } else if (data.status === 'error') {
+              setError(data.error);
+            }
+            return;
+          }
+
+          const view = new DataView(event.data);
+          const headerLength = view.getUint32(0);
+          const data = JSON.parse(new TextDecoder().decode(new Uint8Array(event.data, 4, headerLength)));
           
           if (data.status === 'detection') {
             setLiveDetections(prev => [
@@ -308,11 +337,16 @@ const VideoDetectionUpload = ({ onSwitchToHistory }) => {
                 timestamp: new Date().toLocaleTimeString(),
                 detections: data.detections,
                 detection_count: data.detection_count,
-                frame_b64: data.frame_b64
+                latency_ms: data.latency_ms
               }
             ]);
-          } else if (data.status === 'error') {
-            setError(data.error);
+          }
+
+          // Keep one frame in flight: send the next frame once this result is back
+          if (data.status === 'busy') {
+            setTimeout(sendFrame, 250);
+          } else {
+            sendFrame();
           }
         } catch (e) {
           console.error('WebSocket message parsing error:', e);